@@ -4,13 +4,21 @@ GestioStock - Point d'entrée principal de l'application
 """
 
 import os
-from flask import Flask, render_template, jsonify, redirect, url_for, session, request, flash
+import sys
+from flask import Flask, Response, render_template, jsonify, redirect, url_for, session, request, flash
 from flask_login import LoginManager, login_required
 from flask_cors import CORS
 from config import Config
-from models import db, User
+from models import db, User, Vente, VenteJour, Caisse
 
 from utils.demo_data import init_demo_data
+from utils.migrations import appliquer_migrations
+from utils.identites import charger_identite
+from utils.sauvegarde import demarrer_planification
+from utils.moteur import configurer_moteur
+from utils.serveur import preparer, servir
+from utils.profilage import installer_profilage
+from utils import metriques
 
 
 # -------------------------
@@ -30,6 +38,7 @@ def register_blueprints(app):
         from routes.api import api_bp
         from routes.exporter import exporter_bp
         from routes.depenses import depenses_bp
+        from routes.exports import exports_bp
 
         # Enregistrer les blueprints
         app.register_blueprint(auth_bp)
@@ -42,6 +51,7 @@ def register_blueprints(app):
         app.register_blueprint(exporter_bp, url_prefix='/exporter')
         app.register_blueprint(api_bp, url_prefix='/api')
         app.register_blueprint(depenses_bp)
+        app.register_blueprint(exports_bp)
 
         print("✅ Tous les blueprints ont été enregistrés avec succès !")
 
@@ -60,6 +70,12 @@ def create_app():
 
     # Initialisation des extensions
     db.init_app(app)
+    # PRAGMA SQLite (WAL...) sur chaque connexion
+    configurer_moteur(app)
+    # Compteurs SQL et temps par requête (Server-Timing, /api/system/perf)
+    installer_profilage(app)
+    # Latences, pool et compteurs métier agrégés entre workers (/metrics)
+    metriques.installer_metriques(app)
 
     # Configuration Login Manager
     login_manager = LoginManager()
@@ -68,7 +84,7 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return charger_identite(user_id)
 
     @login_manager.unauthorized_handler
     def unauthorized():
@@ -109,6 +125,19 @@ def create_app():
     def parametres_page():
         return render_template('parametres.html')
 
+    @app.route('/metrics')
+    def metrics():
+        """Métriques Prometheus de tous les workers (jeton METRIQUES_JETON, admin connecté ou METRIQUES_LOCAL)"""
+        if not metriques.ACTIF:
+            return jsonify({'error': 'Métriques désactivées'}), 404
+        if not metriques.acces_autorise():
+            return jsonify({'error': 'Accès non autorisé'}), 403
+        try:
+            return Response(metriques.exposer(), content_type='text/plain; version=0.0.4; charset=utf-8')
+        except Exception as e:
+            print(f"❌ Erreur metrics: {e}")
+            return jsonify({'error': str(e)}), 500
+
     # -------------------------
     # API DASHBOARD
     # -------------------------
@@ -213,6 +242,14 @@ def create_app():
 def init_database(app):
     with app.app_context():
         db.create_all()
+        migrations = appliquer_migrations()
+        if migrations['colonnes'] or migrations['index'] or migrations['recherche']:
+            print(f"✅ Schéma mis à jour : {migrations}")
+        # Base existante sans agrégat journalier : le construire depuis l'historique
+        if VenteJour.query.first() is None and Vente.query.first() is not None:
+            nb_jours = VenteJour.reconstruire()
+            print(f"✅ Agrégat ventes_jour reconstruit ({nb_jours} lignes)")
+        Caisse.initialiser()
         if User.query.first() is None:
             init_demo_data()
             print("✅ Base de données initialisée avec succès!")
@@ -226,8 +263,17 @@ def init_database(app):
 def main():
     print("🚀 Démarrage de GestioStock...")
 
+    # Production (python app.py --production ou PRODUCTION=1) : gunicorn / waitress, sans navigateur ni debug
+    if '--production' in sys.argv[1:] or os.environ.get('PRODUCTION', '').lower() in ('1', 'true'):
+        app = create_app()
+        preparer(app, init_database)
+        servir(app)
+        return
+
     app = create_app()
     init_database(app)
+    # Sauvegardes périodiques si SAUVEGARDE_INTERVALLE_HEURES est défini
+    demarrer_planification(app)
 
     host = os.environ.get('HOST', '127.0.0.1')
     port = int(os.environ.get('PORT', 5000))
@@ -250,4 +296,7 @@ def main():
 
 
 if __name__ == '__main__':
+    # Exécutable PyInstaller (Windows) : les processus du pool de rendu des factures démarrent par ici
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -1,10 +1,44 @@
 import os
 from datetime import timedelta
 
+
+def options_moteur(uri):
+    """Options du moteur SQLAlchemy selon la base (pool de connexions pour PostgreSQL)"""
+    if uri.startswith('postgres'):
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            # Connexions coupées par le serveur ou un pare-feu : détectées avant usage
+            'pool_pre_ping': True,
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        }
+    return {}
+
+
+def pragmas_sqlite():
+    """
+    PRAGMA appliqués à chaque connexion SQLite, dans cet ordre.
+    WAL : les lectures (tableaux de bord) ne bloquent plus les ventes et inversement.
+    SQLITE_JOURNAL_MODE=delete pour une base sur un partage réseau (WAL y est déconseillé).
+    """
+    return {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+        # NORMAL est sûr en WAL : une coupure peut perdre les dernières transactions, pas corrompre la base
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_KO', 64000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_MO', 256)) * 1024 * 1024,
+        'temp_store': 'memory',
+    }
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'votre-cle-secrete-super-securisee-2024'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///gestiostock.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = options_moteur(SQLALCHEMY_DATABASE_URI)
+    SQLITE_PRAGMAS = pragmas_sqlite()
     
     # Configuration multi-devises
     CURRENCIES = {
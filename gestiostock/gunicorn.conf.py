@@ -0,0 +1,14 @@
+"""
+Configuration gunicorn, lue automatiquement depuis le dossier gestiostock :
+    gunicorn wsgi:app
+Réglages par variables d'environnement : HOST, PORT, WEB_WORKERS, WEB_THREADS, WEB_TIMEOUT, WEB_GRACEFUL_TIMEOUT
+(voir utils/serveur.py)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.serveur import options_gunicorn
+
+globals().update(options_gunicorn())
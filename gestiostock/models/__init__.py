@@ -8,14 +8,17 @@ from .categorie import Categorie
 from .produit import Produit
 from .client import Client
 from .vente import Vente, VenteItem
+from .vente_jour import VenteJour
 from .paiement import Paiement
 from .mouvement_caisse import MouvementCaisse
+from .caisse import Caisse, PointageCaisse
 from .mouvement_stock import MouvementStock
 from .fournisseur import Fournisseur
 from .depense import Depense
 from .commande import Commande, CommandeItem
 from .notification import Notification
-from .parametre_systeme import ParametreSysteme
+from .export_job import ExportJob
+from .parametre_systeme import ParametreSysteme, ParametresVersion
 # Configuration des relations
 from .relations import configure_relationships
 
@@ -24,7 +27,7 @@ configure_relationships()
 
 __all__ = [
     'db',
-    'User', 'Categorie','Depense', 'Produit', 'Client', 'Vente', 'VenteItem',
+    'User', 'Categorie','Depense', 'Produit', 'Client', 'Vente', 'VenteItem', 'VenteJour',
     'Paiement', 'MouvementStock', 'Fournisseur', 'Commande', 'CommandeItem',
-    'Notification', 'ParametreSysteme', 'MouvementCaisse'
+    'Notification', 'ExportJob', 'ParametreSysteme', 'ParametresVersion', 'MouvementCaisse', 'Caisse', 'PointageCaisse'
 ]
\ No newline at end of file
@@ -0,0 +1,130 @@
+from datetime import datetime
+from sqlalchemy import func, case
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .mouvement_caisse import MouvementCaisse
+from .parametre_systeme import ParametreSysteme
+
+
+class Caisse(db.Model):
+    """Solde courant de la caisse (ligne unique), modifié uniquement par incréments atomiques"""
+    __tablename__ = 'caisse'
+
+    # Un point de contrôle est enregistré tous les INTERVALLE_POINTAGE mouvements
+    INTERVALLE_POINTAGE = 500
+
+    id = db.Column(db.Integer, primary_key=True)
+    solde = db.Column(db.Float, nullable=False, default=0.0)
+    nb_mouvements = db.Column(db.Integer, nullable=False, default=0)
+    date_maj = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def initialiser(cls):
+        """Crée la ligne de caisse si besoin (au démarrage)"""
+        if db.session.get(cls, 1) is None:
+            cls._creer()
+            db.session.commit()
+
+    @classmethod
+    def _creer(cls):
+        """
+        Ligne de caisse reprenant l'ancien solde de ParametreSysteme.solde_caisse, avec un premier
+        point de contrôle après le dernier mouvement existant. Ne fait pas de commit.
+        """
+        solde = float(ParametreSysteme.get_value('solde_caisse', 0) or 0)
+        dernier = db.session.query(func.max(MouvementCaisse.id)).scalar() or 0
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(id=1, solde=solde, nb_mouvements=0))
+                db.session.add(PointageCaisse(mouvement_id=dernier, solde=solde, nb_mouvements=0))
+        except IntegrityError:
+            # Créée au même moment par un autre processus
+            pass
+
+    @classmethod
+    def solde_actuel(cls):
+        """Solde courant, en O(1)"""
+        solde = db.session.query(cls.solde).filter(cls.id == 1).scalar()
+        return float(solde or 0)
+
+    @classmethod
+    def mouvement(cls, type, montant, controle_fonds=False, **champs):
+        """
+        Enregistre un mouvement ('encaisse' ou 'decaisse') : incrément atomique du solde
+        puis écriture du MouvementCaisse avec les soldes avant / après réellement appliqués.
+        controle_fonds : un décaissement supérieur au solde est refusé (retourne None).
+        Ne fait pas de commit : le mouvement part dans la transaction de l'appelant.
+        """
+        montant = float(montant or 0)
+        delta = montant if type == 'encaisse' else -montant
+
+        requete = db.update(cls).where(cls.id == 1)
+        if controle_fonds and delta < 0:
+            requete = requete.where(cls.solde >= montant)
+        requete = requete.values(
+            solde=cls.solde + delta,
+            nb_mouvements=cls.nb_mouvements + 1,
+            date_maj=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+
+        if db.engine.dialect.update_returning:
+            ligne = db.session.execute(requete.returning(cls.solde, cls.nb_mouvements)).first()
+        else:
+            # La ligne est verrouillée par l'UPDATE jusqu'au commit : la relecture est cohérente
+            ligne = db.session.query(cls.solde, cls.nb_mouvements).filter(cls.id == 1).first() \
+                if db.session.execute(requete).rowcount else None
+
+        if ligne is None:
+            if db.session.query(cls.id).filter(cls.id == 1).first() is not None:
+                return None  # fonds insuffisants
+            # Première utilisation (base créée avant la table caisse)
+            cls._creer()
+            return cls.mouvement(type, montant, controle_fonds=controle_fonds, **champs)
+
+        solde_apres = float(ligne.solde)
+        mouvement = MouvementCaisse(
+            type=type,
+            montant=montant,
+            solde_avant=solde_apres - delta,
+            solde_apres=solde_apres,
+            **champs
+        )
+        db.session.add(mouvement)
+
+        if ligne.nb_mouvements % cls.INTERVALLE_POINTAGE == 0:
+            db.session.flush()
+            db.session.add(PointageCaisse(mouvement_id=mouvement.id, solde=solde_apres, nb_mouvements=ligne.nb_mouvements))
+        return mouvement
+
+    @classmethod
+    def verifier(cls):
+        """
+        Recalcule le solde depuis le dernier point de contrôle (et non depuis l'origine)
+        et le compare au solde courant. Retourne (solde courant, solde recalculé).
+        """
+        pointage = PointageCaisse.query.order_by(PointageCaisse.mouvement_id.desc()).first()
+        depuis = pointage.mouvement_id if pointage else 0
+        base = pointage.solde if pointage else 0
+
+        signe = case((MouvementCaisse.type == 'encaisse', 1), else_=-1)
+        variation = db.session.query(func.coalesce(func.sum(signe * MouvementCaisse.montant), 0))\
+            .filter(MouvementCaisse.id > depuis).scalar()
+        return cls.solde_actuel(), float(base) + float(variation or 0)
+
+    def to_dict(self):
+        return {
+            'solde': self.solde,
+            'nb_mouvements': self.nb_mouvements,
+            'date_maj': self.date_maj.isoformat() if self.date_maj else None
+        }
+
+
+class PointageCaisse(db.Model):
+    """Point de contrôle : solde de la caisse après le mouvement mouvement_id (0 : avant tout mouvement)"""
+    __tablename__ = 'caisse_pointages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    mouvement_id = db.Column(db.Integer, nullable=False, index=True)
+    solde = db.Column(db.Float, nullable=False)
+    nb_mouvements = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -25,16 +25,32 @@ class Client(db.Model):
     
     # Relations
     
+    @staticmethod
+    def totaux_achats():
+        """
+        Sous-requête (client_id, total, nombre) des ventes confirmées par client,
+        à joindre à une liste de clients pour éviter de charger leurs ventes
+        """
+        from .vente import Vente
+        return db.session.query(
+            Vente.client_id.label('client_id'),
+            db.func.coalesce(db.func.sum(Vente.montant_total), 0.0).label('total'),
+            db.func.count(Vente.id).label('nombre')
+        ).filter(Vente.statut == 'confirmée').group_by(Vente.client_id).subquery()
+
+    def _totaux(self):
+        from .vente import Vente
+        return db.session.query(
+            db.func.coalesce(db.func.sum(Vente.montant_total), 0.0), db.func.count(Vente.id)
+        ).filter(Vente.client_id == self.id, Vente.statut == 'confirmée').one()
+
     @property
     def total_achats(self):
-        try:
-            return sum(v.montant_total for v in self.ventes if v.statut == 'confirmée')
-        except (TypeError, AttributeError):
-            return 0.0
+        return float(self._totaux()[0] or 0)
     
     @property
     def nombre_achats(self):
-        return len([v for v in self.ventes if v.statut == 'confirmée'])
+        return self._totaux()[1]
     
 
     __table_args__ = (
@@ -43,7 +59,9 @@ class Client(db.Model):
         db.Index('idx_client_entreprise', 'entreprise'),
         db.Index('idx_client_actif', 'actif'),
     )
-    def to_dict(self):
+    def to_dict(self, totaux=None):
+        """totaux : (total, nombre) déjà calculés, sinon une requête d'agrégat"""
+        total, nombre = totaux if totaux is not None else self._totaux()
         return {
             'id': self.id,
             'nom': self.nom,
@@ -55,7 +73,7 @@ class Client(db.Model):
             'ville': self.ville,
             'type_client': self.type_client,
             'remise_defaut': self.remise_defaut,
-            'total_achats': self.total_achats,
-            'nombre_achats': self.nombre_achats,
+            'total_achats': float(total or 0),
+            'nombre_achats': nombre or 0,
             'actif': self.actif
         }
\ No newline at end of file
@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+from . import db
+
+
+class ExportJob(db.Model):
+    """Export exécuté en arrière-plan : suivi de l'avancement et fichier produit à télécharger"""
+    __tablename__ = 'export_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)  # ventes_excel, produits_excel, complet_excel, sauvegarde
+    parametres = db.Column(db.Text)  # JSON
+    statut = db.Column(db.String(20), default='en_attente')  # en_attente, en_cours, termine, erreur
+    progression = db.Column(db.Integer, default=0)  # lignes traitées
+    total = db.Column(db.Integer)  # lignes attendues (si connues)
+    erreur = db.Column(db.Text)
+    fichier = db.Column(db.String(255))  # chemin local du fichier produit
+    nom_fichier = db.Column(db.String(255))  # nom proposé au téléchargement
+    mimetype = db.Column(db.String(100))
+    taille = db.Column(db.Integer)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+    date_debut = db.Column(db.DateTime)
+    date_fin = db.Column(db.DateTime)
+    date_expiration = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Exports d'un utilisateur, les plus récents d'abord
+        db.Index('idx_export_job_user_date', 'user_id', 'date_creation'),
+        # Nettoyage des fichiers expirés
+        db.Index('idx_export_job_expiration', 'date_expiration'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'parametres': json.loads(self.parametres) if self.parametres else {},
+            'statut': self.statut,
+            'progression': self.progression or 0,
+            'total': self.total,
+            'pourcentage': round(100 * (self.progression or 0) / self.total, 1) if self.total else None,
+            'erreur': self.erreur,
+            'nom_fichier': self.nom_fichier,
+            'taille': self.taille,
+            'date_creation': self.date_creation.isoformat() if self.date_creation else None,
+            'date_debut': self.date_debut.isoformat() if self.date_debut else None,
+            'date_fin': self.date_fin.isoformat() if self.date_fin else None,
+            'date_expiration': self.date_expiration.isoformat() if self.date_expiration else None,
+            'telechargement': f'/api/exports/{self.id}/fichier' if self.statut == 'termine' else None
+        }
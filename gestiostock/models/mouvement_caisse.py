@@ -17,6 +17,12 @@ class MouvementCaisse(db.Model):
     solde_apres = db.Column(db.Float)
     notes = db.Column(db.Text)
 
+    __table_args__ = (
+        db.Index('idx_mouvement_caisse_date', 'date'),
+        db.Index('idx_mouvement_caisse_vente', 'vente_id'),
+        db.Index('idx_mouvement_caisse_paiement', 'paiement_id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -14,6 +14,12 @@ class MouvementStock(db.Model):
     reference_document = db.Column(db.String(100))
     date_mouvement = db.Column(db.DateTime, default=datetime.utcnow)
     utilisateur = db.Column(db.String(100))
+
+    __table_args__ = (
+        # Historique d'un produit trié par date
+        db.Index('idx_mouvement_stock_produit_date', 'produit_id', 'date_mouvement'),
+        db.Index('idx_mouvement_stock_date', 'date_mouvement'),
+    )
     
     def to_dict(self):
         return {
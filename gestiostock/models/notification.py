@@ -10,6 +10,11 @@ class Notification(db.Model):
     message = db.Column(db.Text)
     lue = db.Column(db.Boolean, default=False)
     date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Notifications (non lues) d'un utilisateur, les plus récentes d'abord
+        db.Index('idx_notification_user_lue_date', 'user_id', 'lue', 'date_creation'),
+    )
     
     def to_dict(self):
         return {
@@ -11,6 +11,11 @@ class Paiement(db.Model):
     reference = db.Column(db.String(100))
     date_paiement = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('idx_paiement_vente', 'vente_id'),
+        db.Index('idx_paiement_commande', 'commande_id'),
+    )
     
     def to_dict(self):
         return {
@@ -1,6 +1,21 @@
+import copy
 import json
+import time
+from sqlalchemy.exc import IntegrityError
 from . import db
 
+# Cache des paramètres par URL de base : {'valeurs': {cle: (type, valeur)}, 'version': n, 'verifie_a': t}
+_caches = {}
+_INVALIDE = object()
+
+
+class ParametresVersion(db.Model):
+    """Compteur incrémenté à chaque écriture de paramètre : signale aux autres processus de recharger leur cache"""
+    __tablename__ = 'parametres_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 class ParametreSysteme(db.Model):
     __tablename__ = 'parametres_systeme'
     id = db.Column(db.Integer, primary_key=True)
@@ -8,27 +23,71 @@ class ParametreSysteme(db.Model):
     valeur = db.Column(db.Text)
     description = db.Column(db.Text)
     type_valeur = db.Column(db.String(20), default='string')  # string, number, boolean, json
-    
+
+    # Délai (secondes) entre deux vérifications du compteur de version
+    VERIFICATION_VERSION = 2.0
+
+    @staticmethod
+    def _convertir(valeur, type_valeur):
+        """Valeur typée, ou _INVALIDE si elle ne peut pas être convertie"""
+        if valeur is None:
+            return None
+        if type_valeur == 'json':
+            return json.loads(valeur)
+        elif type_valeur == 'boolean':
+            return valeur.lower() == 'true'
+        elif type_valeur == 'number':
+            try:
+                return float(valeur)
+            except (TypeError, ValueError):
+                return _INVALIDE
+        return valeur
+
+    @classmethod
+    def _version(cls):
+        return db.session.query(ParametresVersion.version).filter(ParametresVersion.id == 1).scalar() or 0
+
+    @classmethod
+    def _valeurs(cls):
+        """
+        Tous les paramètres typés, chargés en une requête et gardés en mémoire (par base).
+        Le compteur de version est relu au plus toutes les VERIFICATION_VERSION secondes.
+        """
+        url = str(db.engine.url)
+        cache = _caches.get(url)
+        maintenant = time.monotonic()
+        if cache and maintenant - cache['verifie_a'] < cls.VERIFICATION_VERSION:
+            return cache['valeurs']
+
+        version = cls._version()
+        if cache and cache['version'] == version:
+            cache['verifie_a'] = maintenant
+            return cache['valeurs']
+
+        valeurs = {}
+        for cle, valeur, type_valeur in db.session.query(cls.cle, cls.valeur, cls.type_valeur):
+            try:
+                valeurs[cle] = (type_valeur, cls._convertir(valeur, type_valeur))
+            except ValueError:
+                valeurs[cle] = (type_valeur, _INVALIDE)
+        # Remplacement d'un bloc : les lectures concurrentes voient l'ancien ou le nouveau dict, jamais un mélange
+        _caches[url] = {'valeurs': valeurs, 'version': version, 'verifie_a': maintenant}
+        return valeurs
+
     @classmethod
     def get_value(cls, cle, default=None):
-        param = cls.query.filter_by(cle=cle).first()
-        if not param:
+        entree = cls._valeurs().get(cle)
+        if entree is None:
             return default
-        
-        if param.type_valeur == 'json':
-            return json.loads(param.valeur)
-        
-        elif param.type_valeur == 'boolean':
-            return param.valeur.lower() == 'true'
-        
-        elif param.type_valeur == 'number':
-            try:
-                return float(param.valeur)
-            except:
-                return default
 
-        return param.valeur
-    
+        type_valeur, valeur = entree
+        if valeur is None or valeur is _INVALIDE:
+            return default
+        if type_valeur == 'json':
+            # Copie : l'appelant ne doit pas modifier la valeur en cache
+            return copy.deepcopy(valeur)
+        return valeur
+
     @classmethod
     def set_value(cls, cle, valeur, type_valeur='string'):
         param = cls.query.filter_by(cle=cle).first()
@@ -44,8 +103,29 @@ class ParametreSysteme(db.Model):
         else:
             param = cls(cle=cle, valeur=valeur_formatee, type_valeur=type_valeur)
             db.session.add(param)
+
+        # Nouvelle version dans la même transaction que la valeur
+        cls.nouvelle_version()
         
         db.session.commit()
+        _caches.pop(str(db.engine.url), None)
+
+    @classmethod
+    def nouvelle_version(cls):
+        """
+        Incrémente le compteur de version et vide le cache de ce processus, sans commit :
+        à appeler dans toute transaction qui écrit des paramètres sans passer par set_value.
+        """
+        incremente = db.session.query(ParametresVersion).filter(ParametresVersion.id == 1)\
+            .update({ParametresVersion.version: ParametresVersion.version + 1}, synchronize_session=False)
+        if not incremente:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ParametresVersion(id=1, version=1))
+            except IntegrityError:
+                db.session.query(ParametresVersion).filter(ParametresVersion.id == 1)\
+                    .update({ParametresVersion.version: ParametresVersion.version + 1}, synchronize_session=False)
+        _caches.pop(str(db.engine.url), None)
 
 
 # 🟦 IMPORTANT : initialiser la caisse si elle n'existe pas
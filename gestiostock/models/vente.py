@@ -19,6 +19,15 @@ class Vente(db.Model):
     statut_paiement = db.Column(db.String(20), default='payé')
     notes = db.Column(db.Text)
 
+    __table_args__ = (
+        # Tableau de bord / statistiques : statut = 'confirmée' AND date_vente >= ...
+        db.Index('idx_vente_statut_date', 'statut', 'date_vente'),
+        # Liste des ventes et exports : filtre / tri sur la date seule
+        db.Index('idx_vente_date', 'date_vente'),
+        # Historique client, top clients, filtre client_id de /api/ventes
+        db.Index('idx_vente_client_date', 'client_id', 'date_vente'),
+    )
+
     def to_dict(self):
         """Retourne un dict complet de la vente avec les items"""
         try:
@@ -57,6 +66,14 @@ class VenteItem(db.Model):
     remise = db.Column(db.Float, default=0.0)
     tva = db.Column(db.Float, default=0.0)
     montant_total = db.Column(db.Float, nullable=False)
+    cout_unitaire = db.Column(db.Float)  # prix d'achat du produit au moment de la vente
+
+    __table_args__ = (
+        # Index couvrant pour les calculs de marge : lu sans toucher à la table
+        db.Index('idx_vente_item_marge', 'vente_id', 'produit_id', 'quantite', 'prix_unitaire', 'remise', 'cout_unitaire'),
+        # Top produits et historique d'un produit
+        db.Index('idx_vente_item_produit', 'produit_id'),
+    )
 
     def to_dict(self):
         """Retourne un dict détaillé de l'article de vente"""
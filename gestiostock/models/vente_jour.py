@@ -0,0 +1,86 @@
+from datetime import datetime, date
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .vente import Vente
+
+
+class VenteJour(db.Model):
+    """Agrégat journalier des ventes confirmées (une ligne par jour et par mode de paiement)"""
+    __tablename__ = 'ventes_jour'
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    mode_paiement = db.Column(db.String(20), nullable=False, default='')
+    chiffre_affaires = db.Column(db.Float, nullable=False, default=0.0)
+    nb_ventes = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('date', 'mode_paiement', name='uq_vente_jour_date_mode'),
+    )
+
+    @classmethod
+    def enregistrer(cls, vente, signe=1):
+        """Répercute une vente (signe=1) ou son annulation (signe=-1) dans l'agrégat.
+        Ne fait pas de commit : la mise à jour part dans la transaction de la vente."""
+        jour = (vente.date_vente or datetime.utcnow()).date()
+        mode = vente.mode_paiement or ''
+        montant = float(vente.montant_total or 0) * signe
+
+        def incrementer():
+            return cls.query.filter_by(date=jour, mode_paiement=mode).update({
+                cls.chiffre_affaires: cls.chiffre_affaires + montant,
+                cls.nb_ventes: cls.nb_ventes + signe
+            }, synchronize_session=False)
+
+        if incrementer():
+            return
+
+        # Première vente du jour pour ce mode : une autre caisse peut créer la ligne en même temps
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(date=jour, mode_paiement=mode, chiffre_affaires=montant, nb_ventes=signe))
+        except IntegrityError:
+            incrementer()
+
+    @classmethod
+    def reconstruire(cls, depuis=None):
+        """Recalcule l'agrégat à partir de la table ventes (historique existant).
+        depuis: date de début optionnelle, sinon tout l'historique est reconstruit."""
+        jour = func.date(Vente.date_vente)
+        query = db.session.query(
+            jour.label('jour'),
+            func.coalesce(Vente.mode_paiement, '').label('mode'),
+            func.sum(Vente.montant_total).label('total'),
+            func.count(Vente.id).label('nb')
+        ).filter(Vente.statut == 'confirmée')
+
+        suppression = cls.query
+        if depuis:
+            query = query.filter(Vente.date_vente >= datetime.combine(depuis, datetime.min.time()))
+            suppression = suppression.filter(cls.date >= depuis)
+
+        lignes = []
+        for r in query.group_by(jour, func.coalesce(Vente.mode_paiement, '')).all():
+            # SQLite renvoie la date sous forme de texte, PostgreSQL sous forme de date
+            jour_vente = r.jour if isinstance(r.jour, date) else datetime.strptime(r.jour, '%Y-%m-%d').date()
+            lignes.append({
+                'date': jour_vente,
+                'mode_paiement': r.mode,
+                'chiffre_affaires': float(r.total or 0),
+                'nb_ventes': r.nb
+            })
+
+        suppression.delete(synchronize_session=False)
+        if lignes:
+            db.session.execute(db.insert(cls), lignes)
+        db.session.commit()
+        return len(lignes)
+
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat() if self.date else None,
+            'mode_paiement': self.mode_paiement,
+            'chiffre_affaires': self.chiffre_affaires,
+            'nb_ventes': self.nb_ventes
+        }
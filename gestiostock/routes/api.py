@@ -4,15 +4,24 @@ Routes API supplémentaires
 from flask import Blueprint, request, jsonify, send_file, current_app
 from flask_login import login_required, current_user
 from models import Notification, User, db, Vente
-from utils.export import exporter_ventes_pdf, exporter_produits_excel
+from utils.export import (exporter_ventes_pdf, charger_ventes_pdf, exporter_produits_excel,
+                          classeur_ventes, classeur_complet,
+                          lignes_ventes_detail, lignes_produits, lignes_utilisateurs, lignes_produits_complet,
+                          ENTETES_VENTES_DETAIL, ENTETES_PRODUITS, ENTETES_UTILISATEURS, ENTETES_PRODUITS_COMPLET,
+                          CLES_VENTES_DETAIL, CLES_PRODUITS, CLES_UTILISATEURS, CLES_PRODUITS_COMPLET)
+from utils import flux
+from utils import excel
 from utils.helpers import convertir_devise, get_system_parameter, set_system_parameter
+from utils.catalogue import invalider_produits
+from utils.identites import invalider_identite
+from utils.moteur import etat_moteur
+from utils import profilage
+from utils.sauvegarde import chemin_base, creer_sauvegarde, nom_sauvegarde, FichierTemporaire
+from utils.import_produits import ImportProduits, lire_lignes, VALEURS_VRAI
 from datetime import datetime, timedelta
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
 from io import BytesIO
 import os
 import json
-import shutil
 import tempfile
 
 api_bp = Blueprint('api', __name__)
@@ -139,7 +148,7 @@ def export_ventes_pdf():
     if date_fin:
         query = query.filter(Vente.date_vente <= datetime.fromisoformat(date_fin))
     
-    ventes = query.order_by(Vente.date_vente.desc()).all()
+    ventes = charger_ventes_pdf(query.order_by(Vente.date_vente.desc())).all()
     pdf_buffer = exporter_ventes_pdf(ventes)
     
     return send_file(
@@ -152,11 +161,20 @@ def export_ventes_pdf():
 @api_bp.route('/export/produits/excel')
 @login_required
 def export_produits_excel():
-    """Exporte les produits en Excel"""
-    from models import Produit
+    """Exporte les produits en Excel, ou en flux avec format=csv|ndjson"""
+    try:
+        format = flux.lire_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if format in flux.FORMATS_FLUX:
+        from models import Produit
+        return flux.reponse(format, f'produits_{datetime.now().strftime("%Y%m%d_%H%M")}', flux.generer(
+            format, ENTETES_PRODUITS, CLES_PRODUITS, lignes_produits(Produit.actif == True),
+            separateur=flux.lire_separateur(request.args.get('separateur'))
+        ))
     
-    produits = Produit.query.filter_by(actif=True).all()
-    excel_buffer = exporter_produits_excel(produits)
+    # Produits actifs lus par lots, classeur écrit en flux
+    excel_buffer = exporter_produits_excel()
     
     return send_file(
         excel_buffer,
@@ -260,6 +278,7 @@ def ajouter_utilisateur_api():
         
         db.session.add(new_user)
         db.session.commit()
+        invalider_identite(new_user.id)
         
         print(f"✅ Utilisateur créé: {new_user.username}")
         return jsonify({
@@ -279,6 +298,7 @@ def toggle_user_status(user_id):
         user = User.query.get_or_404(user_id)
         user.actif = not user.actif
         db.session.commit()
+        invalider_identite(user.id)
         
         return jsonify({
             'message': f'Utilisateur {"activé" if user.actif else "désactivé"} avec succès',
@@ -294,11 +314,15 @@ def toggle_user_status(user_id):
 @api_bp.route('/api/export/ventes/excel', methods=['GET'])
 @login_required
 def export_ventes_excel_route():
-    """Exporte les ventes en Excel (version sans pandas)"""
+    """Exporte les ventes en Excel (version sans pandas), ou en flux avec format=csv|ndjson"""
     try:
         # Récupérer les paramètres de date
         date_debut = request.args.get('date_debut')
         date_fin = request.args.get('date_fin')
+        try:
+            format = flux.lire_format(request.args.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Valider les paramètres
         if not date_debut or not date_fin:
@@ -314,81 +338,19 @@ def export_ventes_excel_route():
         
         print(f"🔍 Recherche ventes du {date_debut} au {date_fin}")
         
-        # Récupérer les ventes dans la période
-        ventes = Vente.query.filter(
-            Vente.date_vente >= date_debut_obj,
-            Vente.date_vente < date_fin_obj
-        ).all()
+        if format in flux.FORMATS_FLUX:
+            lignes = lignes_ventes_detail(Vente.date_vente >= date_debut_obj, Vente.date_vente < date_fin_obj)
+            return flux.reponse(format, f"ventes_{date_debut}_a_{date_fin}", flux.generer(
+                format, ENTETES_VENTES_DETAIL, CLES_VENTES_DETAIL, lignes,
+                separateur=flux.lire_separateur(request.args.get('separateur'))
+            ))
         
-        print(f"📊 {len(ventes)} ventes trouvées")
-        
-        # Créer le fichier Excel avec openpyxl
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Ventes"
-        
-        # Style des en-têtes
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # En-têtes
-        headers = [
-            'ID', 'Numéro Facture', 'Date', 'Client', 'Produit', 
-            'Quantité', 'Prix Unitaire', 'Remise', 'Montant Total', 
-            'Devise', 'Mode Paiement', 'Statut', 'Statut Paiement'
-        ]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Données des ventes
-        for row, vente in enumerate(ventes, 2):
-            vente_data = vente.to_dict()
-            ws.cell(row=row, column=1, value=vente.id)
-            ws.cell(row=row, column=2, value=vente.numero_facture)
-            ws.cell(row=row, column=3, value=vente.date_vente.strftime('%Y-%m-%d %H:%M') if vente.date_vente else '')
-            ws.cell(row=row, column=4, value=vente_data.get('client', 'Client anonyme'))
-            ws.cell(row=row, column=5, value=vente_data.get('produit', 'Produit inconnu'))
-            ws.cell(row=row, column=6, value=vente.quantite)
-            ws.cell(row=row, column=7, value=float(vente.prix_unitaire))
-            ws.cell(row=row, column=8, value=float(vente.remise))
-            ws.cell(row=row, column=9, value=float(vente.montant_total))
-            ws.cell(row=row, column=10, value=vente.devise)
-            ws.cell(row=row, column=11, value=vente.mode_paiement)
-            ws.cell(row=row, column=12, value=vente.statut)
-            ws.cell(row=row, column=13, value=vente.statut_paiement)
-        
-        # Ajuster la largeur des colonnes
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Sauvegarder dans le buffer
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        wb = classeur_ventes(date_debut_obj, date_fin_obj)
         
         filename = f"ventes_{date_debut}_a_{date_fin}.xlsx"
         print(f"✅ Export Excel réussi: {filename}")
         
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        return excel.envoyer(wb, filename)
         
     except Exception as e:
         print(f"❌ Erreur export Excel: {str(e)}")
@@ -445,166 +407,45 @@ def preview_ventes_export():
 @api_bp.route('/api/export/all-data', methods=['GET'])
 @login_required
 def export_all_data():
-    """Exporte toutes les données de l'application en Excel (sans pandas)"""
+    """
+    Exporte toutes les données de l'application en Excel (sans pandas).
+    format=ndjson : un objet par ligne, avec sa feuille ("feuille": utilisateurs, ventes ou produits) ;
+    format=csv : une feuille à la fois, choisie par le paramètre feuille.
+    """
     try:
         # Vérifier les permissions admin
         if current_user.role != 'admin':
             return jsonify({'message': 'Accès non autorisé'}), 403
         
-        print("🔄 Début de l'export de toutes les données...")
-        
-        # Créer un fichier Excel avec openpyxl
-        wb = openpyxl.Workbook()
-        
-        # Supprimer la feuille par défaut si elle existe
-        if 'Sheet' in wb.sheetnames:
-            del wb['Sheet']
-        
-        # Style des en-têtes
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        
-        # === FEUILLE 1: UTILISATEURS ===
-        users = User.query.all()
-        if users:
-            ws_users = wb.create_sheet("Utilisateurs")
-            headers_users = [
-                'ID', 'Username', 'Email', 'Nom', 'Prénom', 'Rôle', 
-                'Téléphone', 'Actif', 'Date Création', 'Dernier Login'
-            ]
-            
-            # En-têtes
-            for col, header in enumerate(headers_users, 1):
-                cell = ws_users.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-            
-            # Données
-            for row, user in enumerate(users, 2):
-                ws_users.cell(row=row, column=1, value=user.id)
-                ws_users.cell(row=row, column=2, value=user.username)
-                ws_users.cell(row=row, column=3, value=user.email)
-                ws_users.cell(row=row, column=4, value=user.nom or '')
-                ws_users.cell(row=row, column=5, value=user.prenom or '')
-                ws_users.cell(row=row, column=6, value=user.role)
-                ws_users.cell(row=row, column=7, value=user.telephone or '')
-                ws_users.cell(row=row, column=8, value='Oui' if user.actif else 'Non')
-                ws_users.cell(row=row, column=9, value=user.date_creation.strftime('%Y-%m-%d %H:%M') if user.date_creation else '')
-                ws_users.cell(row=row, column=10, value=user.dernier_login.strftime('%Y-%m-%d %H:%M') if user.dernier_login else '')
-            
-            print(f"✅ {len(users)} utilisateurs exportés")
-        
-        # === FEUILLE 2: VENTES ===
-        ventes = Vente.query.all()
-        if ventes:
-            ws_ventes = wb.create_sheet("Ventes")
-            headers_ventes = [
-                'ID', 'Numéro Facture', 'Date', 'Client', 'Produit', 
-                'Quantité', 'Prix Unitaire', 'Remise', 'Montant Total', 
-                'Devise', 'Mode Paiement', 'Statut', 'Statut Paiement'
-            ]
-            
-            # En-têtes
-            for col, header in enumerate(headers_ventes, 1):
-                cell = ws_ventes.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-            
-            # Données
-            for row, vente in enumerate(ventes, 2):
-                vente_data = vente.to_dict()
-                ws_ventes.cell(row=row, column=1, value=vente.id)
-                ws_ventes.cell(row=row, column=2, value=vente.numero_facture)
-                ws_ventes.cell(row=row, column=3, value=vente.date_vente.strftime('%Y-%m-%d %H:%M') if vente.date_vente else '')
-                ws_ventes.cell(row=row, column=4, value=vente_data.get('client', 'Client anonyme'))
-                ws_ventes.cell(row=row, column=5, value=vente_data.get('produit', 'Produit inconnu'))
-                ws_ventes.cell(row=row, column=6, value=vente.quantite)
-                ws_ventes.cell(row=row, column=7, value=float(vente.prix_unitaire))
-                ws_ventes.cell(row=row, column=8, value=float(vente.remise))
-                ws_ventes.cell(row=row, column=9, value=float(vente.montant_total))
-                ws_ventes.cell(row=row, column=10, value=vente.devise)
-                ws_ventes.cell(row=row, column=11, value=vente.mode_paiement)
-                ws_ventes.cell(row=row, column=12, value=vente.statut)
-                ws_ventes.cell(row=row, column=13, value=vente.statut_paiement)
+        try:
+            format = flux.lire_format(request.args.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if format in flux.FORMATS_FLUX:
+            feuilles = {
+                'utilisateurs': (ENTETES_UTILISATEURS, CLES_UTILISATEURS, lignes_utilisateurs),
+                'ventes': (ENTETES_VENTES_DETAIL, CLES_VENTES_DETAIL, lignes_ventes_detail),
+                'produits': (ENTETES_PRODUITS_COMPLET, CLES_PRODUITS_COMPLET, lignes_produits_complet)
+            }
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if format == 'ndjson':
+                def generer_tout():
+                    for nom, (_, cles, lignes) in feuilles.items():
+                        yield from flux.flux_ndjson(cles, lignes(), feuille=nom)
+                return flux.reponse(format, f"export_complet_{timestamp}", generer_tout())
             
-            print(f"✅ {len(ventes)} ventes exportées")
+            feuille = request.args.get('feuille')
+            if feuille not in feuilles:
+                return jsonify({'error': f"Paramètre feuille requis en CSV : {', '.join(feuilles)}"}), 400
+            entetes, cles, lignes = feuilles[feuille]
+            return flux.reponse(format, f"export_{feuille}_{timestamp}", flux.flux_csv(
+                entetes, lignes(), separateur=flux.lire_separateur(request.args.get('separateur'))
+            ))
         
-        # === FEUILLE 3: PRODUITS ===
-        try:
-            from models.produit import Produit
-            produits = Produit.query.all()
-            if produits:
-                ws_produits = wb.create_sheet("Produits")
-                headers_produits = [
-                    'ID', 'Nom', 'Référence', 'Description', 'Prix Achat', 
-                    'Prix Vente', 'Stock Actuel', 'Stock Min', 'Catégorie', 
-                    'Fournisseur', 'Actif'
-                ]
-                
-                # En-têtes
-                for col, header in enumerate(headers_produits, 1):
-                    cell = ws_produits.cell(row=1, column=col, value=header)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                
-                # Données
-                for row, produit in enumerate(produits, 2):
-                    produit_data = produit.to_dict()
-                    ws_produits.cell(row=row, column=1, value=produit.id)
-                    ws_produits.cell(row=row, column=2, value=produit.nom)
-                    ws_produits.cell(row=row, column=3, value=produit.reference)
-                    ws_produits.cell(row=row, column=4, value=produit.description or '')
-                    ws_produits.cell(row=row, column=5, value=float(produit.prix_achat))
-                    ws_produits.cell(row=row, column=6, value=float(produit.prix_vente))
-                    ws_produits.cell(row=row, column=7, value=produit.stock_actuel)
-                    ws_produits.cell(row=row, column=8, value=produit.stock_min)
-                    ws_produits.cell(row=row, column=9, value=produit_data.get('categorie', ''))
-                    ws_produits.cell(row=row, column=10, value=produit_data.get('fournisseur', ''))
-                    ws_produits.cell(row=row, column=11, value='Oui' if produit.actif else 'Non')
-                
-                print(f"✅ {len(produits)} produits exportés")
-        except Exception as e:
-            print(f"⚠️ Erreur export produits: {e}")
-        
-        # === FEUILLE 4: STATISTIQUES ===
-        ws_stats = wb.create_sheet("Statistiques")
-        
-        stats_data = [
-            ['Statistique', 'Valeur'],
-            ['Date de génération', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-            ['Total Utilisateurs', len(users)],
-            ['Total Ventes', len(ventes)],
-            ['Total Produits', len(produits) if 'produits' in locals() else 'N/A'],
-            ['Chiffre d\'affaires total', f"{sum([v.montant_total for v in ventes]):.2f} XOF" if ventes else '0.00 XOF']
-        ]
-        
-        for row, (stat, valeur) in enumerate(stats_data, 1):
-            ws_stats.cell(row=row, column=1, value=stat)
-            ws_stats.cell(row=row, column=2, value=valeur)
-            if row == 1:  # En-tête
-                ws_stats.cell(row=row, column=1).font = header_font
-                ws_stats.cell(row=row, column=1).fill = header_fill
-                ws_stats.cell(row=row, column=2).font = header_font
-                ws_stats.cell(row=row, column=2).fill = header_fill
-        
-        # Ajuster toutes les colonnes
-        for ws in wb.worksheets:
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Sauvegarder
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        print("🔄 Début de l'export de toutes les données...")
+        
+        wb = classeur_complet()
         
         # Nom du fichier
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -612,12 +453,7 @@ def export_all_data():
         
         print(f"✅ Export complet réussi: {filename}")
         
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        return excel.envoyer(wb, filename)
         
     except Exception as e:
         print(f"❌ Erreur export complet: {str(e)}")
@@ -706,48 +542,54 @@ def system_status():
         return jsonify({'message': 'Accès non autorisé'}), 403
 
     status = ParametreSysteme.get_value('system_status', default='stopped')
-    return jsonify({'status': status})
+    return jsonify({'status': status, 'base': etat_moteur()})
 
 from utils.export import exporter_facture_pdf
 
+@api_bp.route('/system/perf', methods=['GET', 'DELETE'])
+@login_required
+def system_perf():
+    """
+    Profil des requêtes de ce processus : par endpoint, appels, temps moyen / max, temps en base
+    et nombre de requêtes SQL ; dernières requêtes SQL lentes avec leur origine.
+    tri=total|moyenne|requetes|appels. DELETE remet les compteurs à zéro.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Accès non autorisé'}), 403
+
+    if request.method == 'DELETE':
+        profilage.reinitialiser()
+        return jsonify({'success': True})
+    return jsonify(profilage.rapport(request.args.get('tri', 'total')))
+
+
 @api_bp.route('/api/export/backup', methods=['GET'])
 @login_required
 def export_backup():
-    """Exporte une sauvegarde de la base de données"""
+    """
+    Exporte une sauvegarde de la base de données (instantané SQLite cohérent, envoyé depuis le disque).
+    compresser=1 : fichier gzip (.db.gz)
+    """
     try:
         if current_user.role != 'admin':
             return jsonify({'message': 'Accès non autorisé'}), 403
-        
-        # Essayer d'utiliser le fichier SQLite
-        from flask import current_app
-        
-        db_uri = current_app.config.get('SQLALCHEMY_DATABASE_URI', 'sqlite:///instance/gestiostock.db')
-        
-        # Parser l'URI pour obtenir le chemin
-        if db_uri.startswith('sqlite:///'):
-            db_path = db_uri.replace('sqlite:///', '')
-        else:
-            db_path = None
-        
-        if db_path and os.path.exists(db_path):
-            # Copier le fichier de base de données
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
-                shutil.copy2(db_path, tmp.name)
-                tmp_name = tmp.name
-            
-            with open(tmp_name, 'rb') as f:
-                buffer = BytesIO(f.read())
-            
-            os.unlink(tmp_name)
-            buffer.seek(0)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
+
+        if chemin_base():
+            compresser = request.args.get('compresser', '').lower() in ('1', 'true', 'oui')
+            nom = nom_sauvegarde(compresser)
+            fd, chemin = tempfile.mkstemp(prefix='sauvegarde_', suffix='.gz' if compresser else '.db')
+            os.close(fd)
+            try:
+                creer_sauvegarde(chemin, compresser=compresser)
+            except Exception:
+                os.remove(chemin)
+                raise
+            # Envoyé depuis le disque, le fichier temporaire est supprimé à la fin de l'envoi
             return send_file(
-                buffer,
+                FichierTemporaire(chemin),
                 as_attachment=True,
-                download_name=f"backup_{timestamp}.db",
-                mimetype='application/octet-stream'
+                download_name=nom,
+                mimetype='application/gzip' if compresser else 'application/octet-stream'
             )
         else:
             # Si ce n'est pas SQLite, exporter les données en JSON
@@ -774,13 +616,14 @@ def export_backup():
         print(f"❌ Erreur backup: {e}")
         return jsonify({'error': str(e)}), 500
 
-
 @api_bp.route('/api/import/produits', methods=['POST'])
 @login_required
 def import_produits():
     """Importe des produits depuis un fichier CSV ou XLSX (admin uniquement)
     Attendu: fichier uploadé dans le champ 'file'.
     Cols supportées (en-têtes) : reference, nom, description, prix_achat, prix_vente, tva, stock_actuel, stock_min, categorie, fournisseur, unite_mesure, emplacement, actif
+    dry_run=1 (paramètre ou champ de formulaire) : valide le fichier et compte créations / mises à jour sans rien écrire.
+    Les lignes invalides sont ignorées et listées dans errors ; les autres sont écrites en une transaction.
     """
     try:
         if current_user.role != 'admin':
@@ -790,139 +633,17 @@ def import_produits():
         if not file:
             return jsonify({'error': 'Aucun fichier fourni'}), 400
 
-        filename = file.filename.lower()
-        created = 0
-        updated = 0
-        errors = []
-
-        from models.produit import Produit
-        from models.categorie import Categorie
-        from models.fournisseur import Fournisseur
-
-        # Helper to parse a row dict and create/update product
-        def process_row(row, row_num=None):
-            nonlocal created, updated, errors
-
-            # Normalize keys to lower
-            data = {k.strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in row.items()}
-
-            ref = data.get('reference') or data.get('ref')
-            nom = data.get('nom') or data.get('name')
-            if not ref or not nom:
-                errors.append({'row': row_num, 'error': 'reference ou nom manquant'})
-                return
-
-            try:
-                prix_achat = float(data.get('prix_achat') or data.get('cost') or 0)
-            except Exception:
-                prix_achat = 0
-            try:
-                prix_vente = float(data.get('prix_vente') or data.get('price') or 0)
-            except Exception:
-                prix_vente = 0
-
-            # Find or create category/fournisseur
-            categorie_name = data.get('categorie')
-            categorie = None
-            if categorie_name:
-                categorie = Categorie.query.filter_by(nom=categorie_name).first()
-
-            fournisseur_name = data.get('fournisseur')
-            fournisseur = None
-            if fournisseur_name:
-                fournisseur = Fournisseur.query.filter_by(nom=fournisseur_name).first()
-
-            # Look for existing product by reference
-            produit = Produit.query.filter_by(reference=ref).first()
-            if produit:
-                # Update fields
-                produit.nom = nom
-                if data.get('description') is not None:
-                    produit.description = data.get('description')
-                if prix_achat:
-                    produit.prix_achat = prix_achat
-                if prix_vente:
-                    produit.prix_vente = prix_vente
-                if data.get('tva'):
-                    try:
-                        produit.tva = float(data.get('tva'))
-                    except Exception:
-                        pass
-                if data.get('stock_actuel'):
-                    try:
-                        produit.stock_actuel = int(float(data.get('stock_actuel')))
-                    except Exception:
-                        pass
-                if data.get('stock_min'):
-                    try:
-                        produit.stock_min = int(float(data.get('stock_min')))
-                    except Exception:
-                        pass
-                if categorie:
-                    produit.categorie_id = categorie.id
-                if fournisseur:
-                    produit.fournisseur_id = fournisseur.id
-                if data.get('unite_mesure'):
-                    produit.unite_mesure = data.get('unite_mesure')
-                if data.get('emplacement'):
-                    produit.emplacement = data.get('emplacement')
-                if data.get('actif') is not None:
-                    actif_val = str(data.get('actif')).lower()
-                    produit.actif = actif_val in ['1', 'true', 'oui', 'yes']
-
-                db.session.add(produit)
-                updated += 1
-            else:
-                # Create new product
-                try:
-                    p = Produit(
-                        reference=ref,
-                        nom=nom,
-                        description=data.get('description') or None,
-                        prix_achat=prix_achat or 0.0,
-                        prix_vente=prix_vente or 0.0,
-                        tva=float(data.get('tva')) if data.get('tva') else 0.0,
-                        stock_actuel=int(float(data.get('stock_actuel'))) if data.get('stock_actuel') else 0,
-                        stock_min=int(float(data.get('stock_min'))) if data.get('stock_min') else 0,
-                        unite_mesure=data.get('unite_mesure') or None,
-                        emplacement=data.get('emplacement') or None,
-                        actif=(str(data.get('actif')).lower() in ['1', 'true', 'oui', 'yes']) if data.get('actif') is not None else True,
-                    )
-
-                    if categorie:
-                        p.categorie_id = categorie.id
-                    if fournisseur:
-                        p.fournisseur_id = fournisseur.id
-
-                    db.session.add(p)
-                    created += 1
-                except Exception as e:
-                    errors.append({'row': row_num, 'error': str(e)})
-
-        # Determine type
-        if filename.endswith('.csv'):
-            import csv
-            import io
-            stream = io.TextIOWrapper(file.stream, encoding='utf-8')
-            reader = csv.DictReader(stream)
-            for i, row in enumerate(reader, start=2):
-                process_row(row, row_num=i)
-
-        elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            wb = openpyxl.load_workbook(filename=BytesIO(file.read()), data_only=True)
-            ws = wb.active
-            # read header
-            rows = list(ws.rows)
-            if not rows:
-                return jsonify({'error': 'Fichier Excel vide'}), 400
-            headers = [str(cell.value).strip() if cell.value is not None else '' for cell in rows[0]]
-            for idx, row in enumerate(rows[1:], start=2):
-                row_values = [cell.value for cell in row]
-                row_dict = {headers[i].strip().lower(): (row_values[i] if row_values[i] is not None else '') for i in range(len(headers))}
-                process_row(row_dict, row_num=idx)
+        dry_run = str(request.values.get('dry_run', '')).lower() in VALEURS_VRAI
+        try:
+            lignes = lire_lignes(file.stream, file.filename)
+            resultat = ImportProduits(dry_run=dry_run).importer(lignes)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
 
-        else:
-            return jsonify({'error': 'Format de fichier non supporté. Utilisez CSV ou XLSX.'}), 400
+        if dry_run:
+            db.session.rollback()
+            return jsonify(resultat.rapport()), 200
 
         # Commit once
         try:
@@ -930,8 +651,9 @@ def import_produits():
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': 'Erreur en sauvegardant en base: ' + str(e)}), 500
+        invalider_produits()
 
-        return jsonify({'success': True, 'created': created, 'updated': updated, 'errors': errors, 'message': f'Import terminé. Créés: {created}, Mis à jour: {updated}'}), 200
+        return jsonify(resultat.rapport()), 200
 
     except Exception as e:
         db.session.rollback()
@@ -16,7 +16,11 @@ def get_clients():
     search = request.args.get('search', '')
     type_client = request.args.get('type')
     
-    query = Client.query.filter_by(actif=True)
+    # Totaux d'achats joints en une seule requête (aucune vente chargée)
+    totaux = Client.totaux_achats()
+    query = db.session.query(Client, totaux.c.total, totaux.c.nombre)\
+        .outerjoin(totaux, totaux.c.client_id == Client.id)\
+        .filter(Client.actif == True)
     
     if search:
         query = query.filter(or_(
@@ -27,10 +31,10 @@ def get_clients():
         ))
     
     if type_client:
-        query = query.filter_by(type_client=type_client)
+        query = query.filter(Client.type_client == type_client)
     
     clients = query.all()
-    return jsonify([c.to_dict() for c in clients])
+    return jsonify([c.to_dict(totaux=(total, nombre)) for c, total, nombre in clients])
 
 @clients_bp.route('/api/clients', methods=['POST'])
 @login_required
@@ -56,7 +60,7 @@ def create_client():
     db.session.add(client)
     db.session.commit()
     
-    return jsonify(client.to_dict()), 201
+    return jsonify(client.to_dict(totaux=(0.0, 0))), 201
 
 @clients_bp.route('/api/clients/<int:id>', methods=['PUT'])
 @login_required
@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify, render_template
 from flask_login import login_required, current_user
-from sqlalchemy import or_
+from sqlalchemy import or_, func
 from models import Commande, CommandeItem, Fournisseur, Produit, MouvementStock, db
 from datetime import datetime
 import random
+from utils.catalogue import invalider_produits
+from utils.pagination import lire_limite, decoder_curseur, apres_curseur, page_suivante
 
 commandes_bp = Blueprint('commandes', __name__)
 
@@ -16,26 +18,56 @@ def commandes_page():
 @commandes_bp.route('/api/commandes', methods=['GET'])
 @login_required
 def get_commandes():
+    """
+    Liste des commandes fournisseurs, de la plus récente à la plus ancienne, en une requête :
+    nom du fournisseur joint, nombre et montant des lignes par sous-requête agrégée.
+    Paramètres : fournisseur_id, statut ; limit / cursor pour paginer sur (date_commande, id)
+    (en-tête X-Next-Cursor) ; details=1 ajoute les lignes de chaque commande (une requête de plus).
+    """
     try:
         fournisseur_id = request.args.get('fournisseur_id')
         statut = request.args.get('statut')
-        
-        query = Commande.query
-        
+
+        lignes = db.session.query(
+            CommandeItem.commande_id.label('commande_id'),
+            func.count(CommandeItem.id).label('nb_items'),
+            func.coalesce(func.sum(CommandeItem.montant_total), 0.0).label('montant_items')
+        ).group_by(CommandeItem.commande_id).subquery()
+
+        query = db.session.query(
+            Commande,
+            Fournisseur.nom.label('fournisseur_nom'),
+            func.coalesce(lignes.c.nb_items, 0).label('nb_items'),
+            func.coalesce(lignes.c.montant_items, 0.0).label('montant_items')
+        ).outerjoin(Fournisseur, Fournisseur.id == Commande.fournisseur_id)\
+         .outerjoin(lignes, lignes.c.commande_id == Commande.id)
+
         if fournisseur_id:
             query = query.filter(Commande.fournisseur_id == fournisseur_id)
         if statut:
             query = query.filter(Commande.statut == statut)
-        
-        commandes = query.order_by(Commande.date_commande.desc()).all()
-        
+
+        # Sans limit ni cursor : liste complète (page commandes et ses statistiques)
+        pagine = bool(request.args.get('limit') or request.args.get('cursor'))
+        try:
+            limite = lire_limite(request.args.get('limit'))
+            if request.args.get('cursor'):
+                query = apres_curseur(query, (Commande.date_commande, Commande.id),
+                                      decoder_curseur(request.args['cursor'], datetime, int))
+        except ValueError as e:
+            return jsonify({'error': f'Paramètre de pagination invalide: {e}'}), 400
+
+        query = query.order_by(Commande.date_commande.desc(), Commande.id.desc())
+        suivant = None
+        if pagine:
+            resultats, suivant = page_suivante(query.limit(limite + 1).all(), limite,
+                                               lambda r: (r.Commande.date_commande, r.Commande.id))
+        else:
+            resultats = query.all()
+
         commandes_data = []
-        for c in commandes:
-            # Récupérer le fournisseur
-            fournisseur = Fournisseur.query.get(c.fournisseur_id)
-            
-            # Construire les données de commande
-            commande_data = {
+        for c, fournisseur_nom, nb_items, montant_items in resultats:
+            commandes_data.append({
                 'id': c.id,
                 'numero_commande': c.numero_commande,
                 'date_commande': c.date_commande.isoformat() if c.date_commande else None,
@@ -48,28 +80,34 @@ def get_commandes():
                 'statut_paiement': c.statut_paiement,
                 'notes': c.notes,
                 'fournisseur_id': c.fournisseur_id,
-                'fournisseur': fournisseur.nom if fournisseur else 'Fournisseur inconnu',
-                'nb_items': len(c.items) if hasattr(c, 'items') else 0,
-                'items': []
-            }
-            
-            # Ajouter les items de la commande
-            if hasattr(c, 'items'):
-                for item in c.items:
-                    produit_nom = item.produit.nom if hasattr(item, 'produit') and item.produit else f"Produit ID:{item.produit_id}"
-                    commande_data['items'].append({
-                        'id': item.id,
-                        'produit_id': item.produit_id,
-                        'produit': produit_nom,
-                        'quantite_commandee': item.quantite_commandee,
-                        'quantite_recue': item.quantite_recue,
-                        'prix_unitaire': float(item.prix_unitaire),
-                        'montant_total': float(item.montant_total)
-                    })
-            
-            commandes_data.append(commande_data)
-        
-        return jsonify(commandes_data)
+                'fournisseur': fournisseur_nom or 'Fournisseur inconnu',
+                'nb_items': nb_items,
+                'montant_items': float(montant_items or 0)
+            })
+
+        if request.args.get('details') == '1' and commandes_data:
+            # Lignes de toutes les commandes de la page en une requête
+            items_par_commande = {}
+            for item, produit_nom in db.session.query(CommandeItem, Produit.nom)\
+                    .outerjoin(Produit, Produit.id == CommandeItem.produit_id)\
+                    .filter(CommandeItem.commande_id.in_([c['id'] for c in commandes_data]))\
+                    .order_by(CommandeItem.id):
+                items_par_commande.setdefault(item.commande_id, []).append({
+                    'id': item.id,
+                    'produit_id': item.produit_id,
+                    'produit': produit_nom or f"Produit ID:{item.produit_id}",
+                    'quantite_commandee': item.quantite_commandee,
+                    'quantite_recue': item.quantite_recue,
+                    'prix_unitaire': float(item.prix_unitaire),
+                    'montant_total': float(item.montant_total)
+                })
+            for c in commandes_data:
+                c['items'] = items_par_commande.get(c['id'], [])
+
+        reponse = jsonify(commandes_data)
+        if suivant:
+            reponse.headers['X-Next-Cursor'] = suivant
+        return reponse
     
     except Exception as e:
         print(f"❌ Erreur get_commandes: {e}")
@@ -186,6 +224,7 @@ def recevoir_commande(id):
         commande.statut_paiement = 'payé'
         
         db.session.commit()
+        invalider_produits(*[item.produit_id for item in commande.items])
         
         print(f"✅ Commande {commande.numero_commande} réceptionnée avec succès")
         return jsonify({'message': 'Commande réceptionnée avec succès'})
@@ -1,5 +1,5 @@
 from flask import request, redirect, url_for, flash, render_template, jsonify, Blueprint
-from models import db, Depense, ParametreSysteme, MouvementCaisse
+from models import db, Depense, Caisse
 from flask_login import current_user, login_required
 from datetime import datetime
 
@@ -10,7 +10,7 @@ depenses_bp = Blueprint('depenses', __name__, url_prefix='/depenses')
 @login_required
 def depenses():
     liste = Depense.query.order_by(Depense.date.desc()).all()
-    solde = ParametreSysteme.get_value("solde_caisse", 0)
+    solde = Caisse.solde_actuel()
     return render_template("depenses.html", depenses=liste, solde=solde)
 
 
@@ -39,40 +39,34 @@ def depenses_add():
         flash(msg, "danger")
         return redirect(url_for("depenses.depenses"))
 
-    solde = float(ParametreSysteme.get_value("solde_caisse", 0) or 0)
-
-    # Vérification fonds disponibles
-    if montant > solde:
-        msg = "Fonds insuffisants pour effectuer cette dépense."
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return jsonify({'error': msg}), 400
-        flash(f"❌ {msg}", "danger")
-        return redirect(url_for("depenses.depenses"))
-
     try:
         # Ajouter dépense
         dep = Depense(libelle=libelle, montant=montant, description=description)
         db.session.add(dep)
         db.session.flush()
 
-        # Mise à jour caisse
-        nouveau_solde = solde - montant
-        ParametreSysteme.set_value("solde_caisse", nouveau_solde, type_valeur="number")
-
-        # Historiser mouvement caisse
+        # Débit de la caisse : décrément atomique, refusé si le solde ne couvre pas la dépense
         utilisateur = getattr(current_user, 'username', None) if current_user and hasattr(current_user, 'username') else None
-        mouvement = MouvementCaisse(
-            type='decaisse',
-            montant=montant,
+        mouvement = Caisse.mouvement(
+            'decaisse',
+            montant,
+            controle_fonds=True,
             vente_id=None,
             paiement_id=None,
             utilisateur=utilisateur,
-            solde_avant=solde,
-            solde_apres=nouveau_solde,
             notes=f'Dépense: {libelle}',
             date=datetime.utcnow()
         )
-        db.session.add(mouvement)
+
+        # Vérification fonds disponibles
+        if mouvement is None:
+            db.session.rollback()
+            msg = "Fonds insuffisants pour effectuer cette dépense."
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return jsonify({'error': msg}), 400
+            flash(f"❌ {msg}", "danger")
+            return redirect(url_for("depenses.depenses"))
+        nouveau_solde = mouvement.solde_apres
 
         db.session.commit()
 
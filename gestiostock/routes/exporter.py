@@ -1,11 +1,9 @@
 # routes/exporter.py
-from flask import Blueprint, request, send_file, jsonify
+from flask import Blueprint, request, jsonify
 from flask_login import login_required
-from models import Vente
 from datetime import datetime, timedelta
-from io import BytesIO
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+from utils import excel
+from utils.export import classeur_ventes
 
 exporter_bp = Blueprint('exporter', __name__, url_prefix='/routes/exporter')
 
@@ -26,120 +24,41 @@ def export_ventes_excel():
     except ValueError:
         return jsonify({'error': 'Format de date invalide. Utilisez YYYY-MM-DD'}), 400
     
-    ventes = Vente.query.filter(
-        Vente.date_vente >= date_debut_obj,
-        Vente.date_vente < date_fin_obj
-    ).all()
+    # Classeur écrit en flux : une ligne par article vendu, lue par lots
+    wb = classeur_ventes(date_debut_obj, date_fin_obj)
     
-    # Création du fichier Excel
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Ventes"
-    
-    # Style des en-têtes
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    headers = ['ID', 'Numéro Facture', 'Date', 'Client', 'Produit', 'Quantité',
-               'Prix Unitaire', 'Remise', 'Montant Total', 'Devise', 'Mode Paiement',
-               'Statut', 'Statut Paiement']
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    for row, vente in enumerate(ventes, 2):
-        v = vente.to_dict()
-        ws.cell(row=row, column=1, value=vente.id)
-        ws.cell(row=row, column=2, value=vente.numero_facture)
-        ws.cell(row=row, column=3, value=vente.date_vente.strftime('%Y-%m-%d %H:%M') if vente.date_vente else '')
-        ws.cell(row=row, column=4, value=v.get('client', 'Client anonyme'))
-        ws.cell(row=row, column=5, value=v.get('produit', 'Produit inconnu'))
-        ws.cell(row=row, column=6, value=vente.quantite)
-        ws.cell(row=row, column=7, value=float(vente.prix_unitaire))
-        ws.cell(row=row, column=8, value=float(vente.remise))
-        ws.cell(row=row, column=9, value=float(vente.montant_total))
-        ws.cell(row=row, column=10, value=vente.devise)
-        ws.cell(row=row, column=11, value=vente.mode_paiement)
-        ws.cell(row=row, column=12, value=vente.statut)
-        ws.cell(row=row, column=13, value=vente.statut_paiement)
-    
-    # Ajuster la largeur des colonnes
-    for col in ws.columns:
-        max_len = max((len(str(c.value)) for c in col if c.value), default=0)
-        ws.column_dimensions[col[0].column_letter].width = min(max_len + 2, 50)
-    
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    filename = f"ventes_{date_debut}_a_{date_fin}.xlsx"
-    
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    return excel.envoyer(wb, f"ventes_{date_debut}_a_{date_fin}.xlsx")
 
 
 
 
-from flask import Blueprint, send_file, make_response
-from io import BytesIO
-from openpyxl import Workbook
-from sqlalchemy.inspection import inspect
+from flask import Blueprint
 from models import db  # ton objet SQLAlchemy
 
 export_api_bp = Blueprint('export_api', __name__)
 
 @export_api_bp.route('/all-data', methods=['GET'])
 def export_all_data():
-    wb = Workbook()
-    # Supprimer la feuille par défaut
-    wb.remove(wb.active)
+    wb = excel.classeur()
 
     # Parcourir toutes les classes de modèles
     for cls in db.Model.__subclasses__():
-        table_name = cls.__tablename__
-        ws = wb.create_sheet(title=table_name)
-
-        # Récupérer les colonnes
-        mapper = inspect(cls)
-        columns = [col.key for col in mapper.columns]
-
-        # Écrire l'entête
-        ws.append(columns)
-
-        # Remplir les données
-        for row in cls.query.all():
-            values = [getattr(row, col) for col in columns]
-            ws.append(values)
-
-        # Ajuster largeur colonnes (optionnel)
-        for col_cells in ws.columns:
-            max_len = max((len(str(c.value)) for c in col_cells if c.value), default=0)
-            ws.column_dimensions[col_cells[0].column_letter].width = min(max_len + 2, 50)
-
-    # Générer fichier en mémoire
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+        table = cls.__table__
 
-    response = make_response(output.read())
-    response.headers["Content-Disposition"] = 'attachment; filename="export_complet.xlsx"'
-    response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        # Lignes lues par lots directement depuis la table (sans objets ORM)
+        lignes = db.session.execute(
+            db.select(*table.columns).execution_options(yield_per=excel.LOT_LECTURE)
+        )
+        excel.ajouter_feuille(wb, cls.__tablename__, [col.key for col in table.columns], lignes, style_entete=None)
 
-    return response
+    return excel.envoyer(wb, "export_complet.xlsx")
 
 
 # routes/users.py
 from flask import Blueprint, jsonify
 from flask_login import login_required
 from models import db, User
+from utils.identites import invalider_identite
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
 
@@ -153,6 +72,7 @@ def toggle_user_status(user_id):
     # Inverse le statut
     user.active = not user.active
     db.session.commit()
+    invalider_identite(user.id)
     
     status = 'activé' if user.active else 'désactivé'
     return jsonify({'success': True, 'message': f'Utilisateur {status}.'})
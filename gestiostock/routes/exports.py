@@ -0,0 +1,72 @@
+import os
+from flask import Blueprint, request, jsonify, send_file
+from flask_login import login_required, current_user
+from models import ExportJob
+from utils.taches_export import soumettre, etat, nettoyer_exports
+
+exports_bp = Blueprint('exports', __name__)
+
+
+def _export_autorise(job):
+    return job.user_id == current_user.id or current_user.role == 'admin'
+
+
+@exports_bp.route('/api/exports', methods=['POST'])
+@login_required
+def creer_export():
+    """
+    Met un export en file : {"type": "ventes_excel" | "produits_excel" | "complet_excel" | "factures"
+    | "sauvegarde", "parametres": {...}}. Répond 202 avec l'export ; suivre l'avancement sur /api/exports/<id>.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        job = soumettre(data.get('type'), data.get('parametres'), current_user)
+        return jsonify(etat(job)), 202
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
+    except Exception as e:
+        print(f"❌ Erreur création export: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@exports_bp.route('/api/exports', methods=['GET'])
+@login_required
+def liste_exports():
+    """Exports de l'utilisateur (tous pour un administrateur), les plus récents d'abord"""
+    try:
+        nettoyer_exports()
+        query = ExportJob.query
+        if current_user.role != 'admin':
+            query = query.filter(ExportJob.user_id == current_user.id)
+        jobs = query.order_by(ExportJob.date_creation.desc()).limit(50).all()
+        return jsonify([etat(j) for j in jobs])
+
+    except Exception as e:
+        print(f"❌ Erreur liste exports: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@exports_bp.route('/api/exports/<int:id>', methods=['GET'])
+@login_required
+def get_export(id):
+    job = ExportJob.query.get_or_404(id)
+    if not _export_autorise(job):
+        return jsonify({'message': 'Accès non autorisé'}), 403
+    return jsonify(etat(job))
+
+
+@exports_bp.route('/api/exports/<int:id>/fichier', methods=['GET'])
+@login_required
+def telecharger_export(id):
+    job = ExportJob.query.get_or_404(id)
+    if not _export_autorise(job):
+        return jsonify({'message': 'Accès non autorisé'}), 403
+    if job.statut != 'termine':
+        return jsonify({'error': f'Export non disponible (statut : {job.statut})', 'statut': job.statut}), 409
+    if not job.fichier or not os.path.exists(job.fichier):
+        return jsonify({'error': 'Fichier expiré ou supprimé'}), 410
+
+    return send_file(job.fichier, as_attachment=True, download_name=job.nom_fichier, mimetype=job.mimetype)
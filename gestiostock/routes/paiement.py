@@ -1,6 +1,6 @@
 from flask import request, redirect, url_for, flash
 from app import app, db
-from models import Paiement, ParametreSysteme, MouvementCaisse
+from models import Paiement, Caisse
 from flask_login import current_user
 
 
@@ -19,24 +19,16 @@ def paiement_add():
         db.session.add(p)
         db.session.flush()  # obtenir p.id avant commit
 
-        # Créditer la caisse automatiquement
-        solde_avant = ParametreSysteme.get_value("solde_caisse", 0)
-        solde_apres = solde_avant + montant
-        ParametreSysteme.set_value("solde_caisse", solde_apres, type_valeur="number")
-
-        # Historiser le mouvement de caisse
+        # Créditer la caisse (incrément atomique) et historiser le mouvement
         utilisateur = getattr(current_user, 'username', None) if current_user and hasattr(current_user, 'username') else None
-        mouvement = MouvementCaisse(
-            type='encaisse',
-            montant=montant,
+        Caisse.mouvement(
+            'encaisse',
+            montant,
             paiement_id=p.id,
             vente_id=vente_id,
             utilisateur=utilisateur,
-            solde_avant=solde_avant,
-            solde_apres=solde_apres,
             notes='Paiement enregistré via formulaire'
         )
-        db.session.add(mouvement)
 
         db.session.commit()
 
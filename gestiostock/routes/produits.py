@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, render_template
 from flask_login import login_required, current_user
-from sqlalchemy import or_
+from sqlalchemy import or_, func
 from models import Produit, Categorie, MouvementStock, db, Fournisseur  # ✅ Bon import
 from datetime import datetime
+from utils.pagination import lire_limite, decoder_curseur, apres_curseur, page_suivante
+from utils.catalogue import compteurs_produits, invalider_produits, produit_par_code
+from utils.recherche import filtre_recherche, rechercher_produits
 
 produits_bp = Blueprint('produits', __name__)
 
@@ -13,78 +16,142 @@ def produits_page():
 
 # === PRODUITS ===
 
+def _champ_texte(valeur):
+    return valeur or ''
+
+
+def _champ_float(valeur):
+    return float(valeur) if valeur else 0.0
+
+
+# Champs exposés par /api/produits : nom → (expression SQL, conversion JSON)
+CHAMPS_PRODUIT = {
+    'id': (Produit.id, None),
+    'reference': (Produit.reference, None),
+    'code_barre': (Produit.code_barre, _champ_texte),
+    'nom': (Produit.nom, None),
+    'description': (Produit.description, _champ_texte),
+    'prix_achat': (Produit.prix_achat, _champ_float),
+    'prix_vente': (Produit.prix_vente, _champ_float),
+    'tva': (Produit.tva, _champ_float),
+    'stock_actuel': (Produit.stock_actuel, None),
+    'stock_min': (Produit.stock_min, None),
+    'stock_max': (Produit.stock_max, None),
+    'unite_mesure': (Produit.unite_mesure, lambda v: v or 'unité'),
+    'emplacement': (Produit.emplacement, _champ_texte),
+    'categorie_id': (Produit.categorie_id, None),
+    'fournisseur_id': (Produit.fournisseur_id, None),
+    'actif': (Produit.actif, None),
+    'valeur_stock': (Produit.prix_achat * Produit.stock_actuel, _champ_float),
+    'stock_faible': (Produit.stock_actuel <= Produit.stock_min, bool),
+    'categorie': (Categorie.nom, None),
+    'fournisseur': (Fournisseur.nom, None),
+}
+
+
 @produits_bp.route('/api/produits', methods=['GET'])
 @login_required
 def get_produits():
+    """
+    Produits actifs en une seule requête projetée (noms de catégorie et fournisseur par jointure externe).
+    Paramètres : search, categorie_id, stock_faible, fields (liste de champs séparés par des virgules).
+    Pagination par curseur sur id si limit ou cursor est fourni : en-têtes X-Next-Cursor et X-Total-Count.
+    """
     try:
         search = request.args.get('search', '')
         categorie_id = request.args.get('categorie_id')
         stock_faible = request.args.get('stock_faible')
-        
-        # ✅ CORRECTION: Utiliser Produit.query, pas Fournisseur.query
-        query = Produit.query.filter_by(actif=True)
-        
+
+        champs = list(CHAMPS_PRODUIT)
+        if request.args.get('fields'):
+            demandes = [c.strip() for c in request.args['fields'].split(',') if c.strip()]
+            inconnus = [c for c in demandes if c not in CHAMPS_PRODUIT]
+            if inconnus:
+                return jsonify({'error': f"Champs inconnus: {', '.join(inconnus)}"}), 400
+            # id toujours présent : clé du curseur
+            champs = ['id'] + [c for c in demandes if c != 'id']
+
+        query = db.session.query(*[CHAMPS_PRODUIT[c][0].label(c) for c in champs])\
+            .select_from(Produit).filter(Produit.actif == True)
+        if 'categorie' in champs:
+            query = query.outerjoin(Categorie, Categorie.id == Produit.categorie_id)
+        if 'fournisseur' in champs:
+            query = query.outerjoin(Fournisseur, Fournisseur.id == Produit.fournisseur_id)
+
+        filtres = []
         if search:
-            query = query.filter(or_(
-                Produit.nom.ilike(f'%{search}%'),
-                Produit.reference.ilike(f'%{search}%'),
-                Produit.code_barre.ilike(f'%{search}%')
-            ))
-        
+            filtres.append(filtre_recherche(search))
         if categorie_id:
-            query = query.filter_by(categorie_id=categorie_id)
-        
+            filtres.append(Produit.categorie_id == categorie_id)
         if stock_faible == 'true':
-            query = query.filter(Produit.stock_actuel <= Produit.stock_min)
-        
-        produits = query.all()
-        
-        # ✅ FORMATAGE MANUEL SANS to_dict()
-        produits_data = []
-        for p in produits:
-            produit_data = {
-                'id': p.id,
-                'reference': p.reference,
-                'code_barre': p.code_barre or '',
-                'nom': p.nom,
-                'description': p.description or '',
-                'prix_achat': float(p.prix_achat),
-                'prix_vente': float(p.prix_vente),
-                'tva': float(p.tva) if p.tva else 0.0,
-                'stock_actuel': p.stock_actuel,
-                'stock_min': p.stock_min,
-                'stock_max': p.stock_max,
-                'unite_mesure': p.unite_mesure or 'unité',
-                'emplacement': p.emplacement or '',
-                'categorie_id': p.categorie_id,
-                'fournisseur_id': p.fournisseur_id,
-                'actif': p.actif,
-                'valeur_stock': float(p.prix_achat * p.stock_actuel),
-                'stock_faible': p.stock_actuel <= p.stock_min
-            }
-            
-            # Ajouter les noms des relations
-            if p.categorie:
-                produit_data['categorie'] = p.categorie.nom
-            else:
-                produit_data['categorie'] = None
-                
-            if p.fournisseur:
-                produit_data['fournisseur'] = p.fournisseur.nom
-            else:
-                produit_data['fournisseur'] = None
-                
-            produits_data.append(produit_data)
-        
-        print(f"✅ {len(produits_data)} produits chargés")
-        return jsonify(produits_data)
-    
+            filtres.append(Produit.stock_actuel <= Produit.stock_min)
+        query = query.filter(*filtres).order_by(Produit.id)
+
+        pagine = bool(request.args.get('limit') or request.args.get('cursor'))
+        if pagine:
+            try:
+                limite = lire_limite(request.args.get('limit'))
+                if request.args.get('cursor'):
+                    query = apres_curseur(query, (Produit.id,), decoder_curseur(request.args['cursor'], int), descendant=False)
+            except ValueError as e:
+                return jsonify({'error': f'Paramètre de pagination invalide: {e}'}), 400
+            lignes, suivant = page_suivante(query.limit(limite + 1).all(), limite, lambda l: (l.id,))
+        else:
+            lignes, suivant = query.all(), None
+
+        conversions = [(c, CHAMPS_PRODUIT[c][1]) for c in champs]
+        produits_data = [
+            {c: (conv(ligne[i]) if conv else ligne[i]) for i, (c, conv) in enumerate(conversions)}
+            for ligne in lignes
+        ]
+
+        reponse = jsonify(produits_data)
+        if pagine:
+            cle = (search, categorie_id, stock_faible)
+            total = compteurs_produits.get_or_set(
+                cle, lambda: db.session.query(func.count(Produit.id)).filter(Produit.actif == True, *filtres).scalar()
+            )
+            reponse.headers['X-Total-Count'] = str(total)
+            if suivant:
+                reponse.headers['X-Next-Cursor'] = suivant
+        return reponse
+
     except Exception as e:
         print(f"❌ Erreur get_produits: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@produits_bp.route('/api/produits/search', methods=['GET'])
+@login_required
+def search_produits():
+    """Recherche rapide (caisse) : q = début de mots du nom, de la référence ou du code-barre, sans accents"""
+    try:
+        q = request.args.get('q', '').strip()
+        try:
+            limite = lire_limite(request.args.get('limit'), defaut=20, maximum=100)
+        except ValueError:
+            return jsonify({'error': 'Paramètre limit invalide'}), 400
+        return jsonify(rechercher_produits(q, limite))
+
+    except Exception as e:
+        print(f"❌ Erreur search_produits: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@produits_bp.route('/api/produits/by-code/<path:code>', methods=['GET'])
+@login_required
+def get_produit_par_code(code):
+    """Lecture caisse : produit actif par code-barre exact ou, à défaut, par référence exacte"""
+    try:
+        produit = produit_par_code(code.strip())
+        if produit is None:
+            return jsonify({'error': 'Produit introuvable'}), 404
+        return jsonify(produit)
+
+    except Exception as e:
+        print(f"❌ Erreur get_produit_par_code: {e}")
+        return jsonify({'error': str(e)}), 500
+
 # === CATÉGORIES ===
 
 
@@ -278,6 +345,7 @@ def create_produit():
         
         db.session.add(produit)
         db.session.commit()
+        invalider_produits()
         
         # Créer mouvement initial
         if produit.stock_actuel > 0:
@@ -331,6 +399,7 @@ def modifier_produit(id):
                 setattr(produit, key, data[key])
 
         db.session.commit()
+        invalider_produits(produit.id)
         return jsonify({'message': 'Produit modifié avec succès', 'produit_id': produit.id})
 
     except Exception as e:
@@ -348,6 +417,7 @@ def delete_produit(id):
         produit = Produit.query.get_or_404(id)
         produit.actif = False
         db.session.commit()
+        invalider_produits(id)
         
         print(f"✅ Produit {id} désactivé")
         return jsonify({'message': 'Produit désactivé'}), 200
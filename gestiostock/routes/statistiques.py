@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify, render_template
 from flask_login import login_required, current_user
-from sqlalchemy import func
+from sqlalchemy import func, case
 from models import db, User, Fournisseur  # Ajouter cette ligne
 from datetime import datetime, timedelta
-from models import Vente, Produit, Client, Categorie, VenteItem, Commande, Depense
+from models import Vente, Produit, Client, Categorie, VenteItem, Commande, Depense, VenteJour
+from utils.agregation import agreger_par_periode, reculer_mois
+from utils.rapports import calculer_rentabilite
 import json
 
 statistiques_bp = Blueprint('statistiques', __name__)
@@ -18,7 +20,6 @@ def statistiques_page():
 def dashboard_data():
     """Données du tableau de bord avec analyse avancée"""
     today = datetime.now().date()
-    start_of_day = datetime.combine(today, datetime.min.time())
     start_of_month = datetime(today.year, today.month, 1)
     start_of_year = datetime(today.year, 1, 1)
     
@@ -26,21 +27,16 @@ def dashboard_data():
     user_prefs = json.loads(current_user.preferences) if current_user.preferences else {}
     devise = user_prefs.get('devise', 'XOF')
     
-    # Ventes
-    ventes_jour = db.session.query(func.sum(Vente.montant_total)).filter(
-        Vente.date_vente >= start_of_day,
-        Vente.statut == 'confirmée'
-    ).scalar() or 0
-    
-    ventes_mois = db.session.query(func.sum(Vente.montant_total)).filter(
-        Vente.date_vente >= start_of_month,
-        Vente.statut == 'confirmée'
-    ).scalar() or 0
-    
-    ventes_annee = db.session.query(func.sum(Vente.montant_total)).filter(
-        Vente.date_vente >= start_of_year,
-        Vente.statut == 'confirmée'
-    ).scalar() or 0
+    # Ventes : lues dans l'agrégat journalier ventes_jour (quelques lignes au lieu de la table ventes)
+    totaux = db.session.query(
+        func.sum(case((VenteJour.date >= today, VenteJour.chiffre_affaires), else_=0)),
+        func.sum(case((VenteJour.date >= start_of_month.date(), VenteJour.chiffre_affaires), else_=0)),
+        func.sum(VenteJour.chiffre_affaires)
+    ).filter(VenteJour.date >= start_of_year.date()).first()
+
+    ventes_jour = totaux[0] or 0
+    ventes_mois = totaux[1] or 0
+    ventes_annee = totaux[2] or 0
     
     # Commandes fournisseurs
     commandes_en_cours = Commande.query.filter(
@@ -81,25 +77,12 @@ def dashboard_data():
     .all()
 )
     # Ventes par mois (12 derniers mois)
-    ventes_mensuelles = []
-    for i in range(11, -1, -1):
-        date = datetime.now() - timedelta(days=30*i)
-        debut_mois = datetime(date.year, date.month, 1)
-        if date.month == 12:
-            fin_mois = datetime(date.year + 1, 1, 1)
-        else:
-            fin_mois = datetime(date.year, date.month + 1, 1)
-        
-        total = db.session.query(func.sum(Vente.montant_total)).filter(
-            Vente.date_vente >= debut_mois,
-            Vente.date_vente < fin_mois,
-            Vente.statut == 'confirmée'
-        ).scalar() or 0
-        
-        ventes_mensuelles.append({
-            'mois': debut_mois.strftime('%b %Y'),
-            'montant': total
-        })
+    ventes_mensuelles = [
+        {'mois': debut_mois.strftime('%b %Y'), 'montant': montant}
+        for debut_mois, montant in agreger_par_periode(
+            VenteJour.date, func.sum(VenteJour.chiffre_affaires), reculer_mois(today, 11), today, 'mois'
+        )
+    ]
     
     # Statistiques clients
     nb_clients = Client.query.filter_by(actif=True).count()
@@ -179,23 +162,22 @@ def stats_ventes_complete():
         nb_ventes = ventes_totales.nb or 0
         panier_moyen = ca_total / nb_ventes if nb_ventes else 0
 
-        # Évolution jour par jour (30 derniers jours)
-        evolution = []
-        for i in range(29, -1, -1):
-            date_i = datetime.now() - timedelta(days=i)
-            date_debut_jour = datetime(date_i.year, date_i.month, date_i.day)
-            date_fin_jour = date_debut_jour + timedelta(days=1)
-            
-            total_jour = db.session.query(func.sum(Vente.montant_total)).filter(
-                Vente.date_vente >= date_debut_jour,
-                Vente.date_vente < date_fin_jour,
-                Vente.statut == 'confirmée'
-            ).scalar() or 0
-            
-            evolution.append({
-                "date": date_i.strftime("%d %b"),
-                "montant": total_jour
-            })
+        # Évolution (30 derniers jours par défaut), une seule requête groupée sur ventes_jour
+        granularite = request.args.get('granularite', 'jour')
+        if granularite == 'semaine':
+            debut_evolution, format_periode = now.date() - timedelta(weeks=11), "%d %b"
+        elif granularite == 'mois':
+            debut_evolution, format_periode = reculer_mois(now.date(), 11), "%b %Y"
+        else:
+            granularite = 'jour'
+            debut_evolution, format_periode = now.date() - timedelta(days=29), "%d %b"
+
+        evolution = [
+            {"date": periode.strftime(format_periode), "montant": montant}
+            for periode, montant in agreger_par_periode(
+                VenteJour.date, func.sum(VenteJour.chiffre_affaires), debut_evolution, now.date(), granularite
+            )
+        ]
 
         # Ventes par catégorie - CORRIGÉ
         ventes_par_categorie = db.session.query(
@@ -253,64 +235,25 @@ def stats_ventes_complete():
 @statistiques_bp.route('/api/rapport/rentabilite')
 @login_required
 def rapport_rentabilite():
-    """Analyse de rentabilité globale pour ventes multi-produits"""
+    """Analyse de rentabilité globale pour ventes multi-produits
+    Paramètres optionnels : date_debut, date_fin (YYYY-MM-DD), categorie_id, top (défaut 5)"""
     try:
-        ventes = Vente.query.filter_by(statut='confirmée').all()
-        
-        ca_total = 0
-        cout_total = 0
-        produits_data = {}
-
-        for vente in ventes:
-            for item in vente.items:  # Boucler sur tous les items de la vente
-                produit = item.produit  # Relation vers Produit
-                if not produit:
-                    continue
-                
-                montant_item = item.prix_unitaire * item.quantite * (1 - (item.remise or 0)/100)
-                ca_total += montant_item
-                cout_vente = item.quantite * produit.prix_achat
-                cout_total += cout_vente
-
-                # Collecte par produit pour le top rentable
-                if produit.id not in produits_data:
-                    produits_data[produit.id] = {
-                        'nom': produit.nom,
-                        'quantite': 0,
-                        'ca': 0,
-                        'cout': 0
-                    }
-                produits_data[produit.id]['quantite'] += item.quantite
-                produits_data[produit.id]['ca'] += montant_item
-                produits_data[produit.id]['cout'] += cout_vente
-        
-        benefice_brut = ca_total - cout_total
-        marge_brute_pct = (benefice_brut / ca_total * 100) if ca_total else 0
-
-        top_rentables = sorted(
-            [
-                {
-                    'nom': p['nom'],
-                    'quantite': p['quantite'],
-                    'ca': p['ca'],
-                    'cout': p['cout'],
-                    'benefice': p['ca'] - p['cout'],
-                    'marge': ((p['ca'] - p['cout']) / p['ca'] * 100) if p['ca'] else 0
-                } for p in produits_data.values() if p['quantite'] > 0
-            ],
-            key=lambda x: x['benefice'],
-            reverse=True
-        )[:5]
-
-        return jsonify({
-            'resume': {
-                'ca_total': round(ca_total, 2),
-                'cout_total': round(cout_total, 2),
-                'benefice_brut': round(benefice_brut, 2),
-                'marge_brute': round(marge_brute_pct, 2)
-            },
-            'top_rentables': top_rentables
-        })
+        date_debut = request.args.get('date_debut')
+        date_fin = request.args.get('date_fin')
+        try:
+            debut = datetime.strptime(date_debut, '%Y-%m-%d') if date_debut else None
+            fin = datetime.strptime(date_fin, '%Y-%m-%d') + timedelta(days=1) if date_fin else None
+        except ValueError:
+            return jsonify({'error': 'Format de date invalide. Utilisez YYYY-MM-DD'}), 400
+
+        top = min(max(request.args.get('top', 5, type=int), 1), 100)
+
+        return jsonify(calculer_rentabilite(
+            date_debut=debut,
+            date_fin=fin,
+            categorie_id=request.args.get('categorie_id', type=int),
+            top=top
+        ))
     
     except Exception as e:
         print(f"Erreur dans rapport rentabilité: {e}")
@@ -418,24 +361,13 @@ def stats_clients():
         ]
 
         # Nouveaux clients par mois (6 derniers mois)
-        nouveaux_par_mois = []
-        for i in range(5, -1, -1):
-            date_mois = datetime.now() - timedelta(days=30*i)
-            debut_mois = datetime(date_mois.year, date_mois.month, 1)
-            if date_mois.month == 12:
-                fin_mois = datetime(date_mois.year + 1, 1, 1)
-            else:
-                fin_mois = datetime(date_mois.year, date_mois.month + 1, 1)
-            
-            nb_nouveaux = db.session.query(func.count(Client.id)).filter(
-                Client.date_creation >= debut_mois,
-                Client.date_creation < fin_mois
-            ).scalar() or 0
-            
-            nouveaux_par_mois.append({
-                "mois": debut_mois.strftime("%m/%Y"),
-                "nombre": nb_nouveaux
-            })
+        aujourd_hui = datetime.now().date()
+        nouveaux_par_mois = [
+            {"mois": debut_mois.strftime("%m/%Y"), "nombre": nombre}
+            for debut_mois, nombre in agreger_par_periode(
+                Client.date_creation, func.count(Client.id), reculer_mois(aujourd_hui, 5), aujourd_hui, 'mois'
+            )
+        ]
 
         return jsonify({
             "top_clients": top_clients_list,
@@ -540,10 +472,8 @@ def stats_top_produits():
         }), 500
     
 
-from flask import send_file
-from io import BytesIO
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.styles import Alignment
+from utils import excel
 
 @statistiques_bp.route('/api/export/ventes/excel', methods=['GET'])
 @login_required
@@ -562,43 +492,26 @@ def export_ventes_stats_excel():
         else:
             debut = datetime(now.year, now.month, 1)
 
-        ventes = Vente.query.filter(
+        query = db.session.query(
+            Vente.id, Vente.numero_facture, Vente.date_vente, Client.nom, Client.prenom,
+            Vente.montant_total, Vente.mode_paiement, Vente.devise
+        ).outerjoin(Client, Client.id == Vente.client_id).filter(
             Vente.statut == 'confirmée',
             Vente.date_vente >= debut
-        ).all()
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Ventes Stats"
-
-        headers = ['ID', 'Facture', 'Date', 'Client', 'Montant', 'Mode Paiement', 'Devise']
-        for col, h in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=h)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-
-        for row, vente in enumerate(ventes, 2):
-            ws.cell(row=row, column=1, value=vente.id)
-            ws.cell(row=row, column=2, value=vente.numero_facture)
-            ws.cell(row=row, column=3, value=vente.date_vente.strftime('%Y-%m-%d %H:%M') if vente.date_vente else '')
-            ws.cell(row=row, column=4, value=f"{vente.client.nom} {vente.client.prenom}" if vente.client else "Client anonyme")
-            ws.cell(row=row, column=5, value=float(vente.montant_total))
-            ws.cell(row=row, column=6, value=vente.mode_paiement)
-            ws.cell(row=row, column=7, value=vente.devise)
-
-        # Sauvegarde dans un buffer
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=f"ventes_stats_{periode}.xlsx",
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        ).order_by(Vente.date_vente, Vente.id)
+
+        lignes = (
+            (v.id, v.numero_facture, excel.date_texte(v.date_vente),
+             f"{v.nom} {v.prenom}" if v.nom else "Client anonyme", float(v.montant_total), v.mode_paiement, v.devise)
+            for v in excel.lire_par_lots(query)
         )
 
+        wb = excel.classeur()
+        excel.ajouter_feuille(wb, "Ventes Stats", ['ID', 'Facture', 'Date', 'Client', 'Montant', 'Mode Paiement', 'Devise'],
+                              lignes, style_entete=dict(excel.STYLE_ENTETE, alignment=Alignment(horizontal="center")))
+
+        return excel.envoyer(wb, f"ventes_stats_{periode}.xlsx")
+
     except Exception as e:
         print(f"❌ Erreur export ventes stats: {e}")
         return jsonify({'error': str(e)}), 500
@@ -624,32 +537,12 @@ def export_top_produits_excel():
             .all()
         )
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Top Produits"
-
-        headers = ['Produit', 'Quantité Vendue', 'Chiffre Affaires']
-        for col, h in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=h)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-
-        for row, p in enumerate(top_produits, 2):
-            ws.cell(row=row, column=1, value=p[0])
-            ws.cell(row=row, column=2, value=int(p[1] or 0))
-            ws.cell(row=row, column=3, value=float(p[2] or 0))
-
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name="top_produits.xlsx",
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        wb = excel.classeur()
+        excel.ajouter_feuille(wb, "Top Produits", ['Produit', 'Quantité Vendue', 'Chiffre Affaires'],
+                              ((p[0], int(p[1] or 0), float(p[2] or 0)) for p in top_produits),
+                              style_entete=dict(excel.STYLE_ENTETE, alignment=Alignment(horizontal="center")))
+
+        return excel.envoyer(wb, "top_produits.xlsx")
 
     except Exception as e:
         print(f"❌ Erreur export top produits: {e}")
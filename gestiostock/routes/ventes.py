@@ -1,10 +1,14 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, Response, stream_with_context
 from flask_login import login_required, current_user
-from sqlalchemy import or_
-from models import Vente, Produit, Client, MouvementStock, db, VenteItem, ParametreSysteme, Paiement, MouvementCaisse
-from datetime import datetime
+from sqlalchemy import or_, case, func
+from models import Vente, Produit, Client, MouvementStock, db, VenteItem, ParametreSysteme, Paiement, MouvementCaisse, VenteJour, Caisse
+from datetime import datetime, timedelta
+import json
 import random
-from utils.export import exporter_facture_pdf
+from utils.export import exporter_facture_pdf, donnees_factures_lot
+from utils.factures import rendre_lot, FORMATS_LOT
+from utils.pagination import lire_limite, decoder_curseur, apres_curseur, page_suivante
+from utils.catalogue import invalider_produits
 
 ventes_bp = Blueprint('ventes', __name__)
 
@@ -34,24 +38,106 @@ def export_facture(id):
     )
 
 
+def lire_lot_factures(args):
+    """Critères d'un lot de factures : ids=1,2,3 ou date=YYYY-MM-DD (aujourd'hui par défaut). ValueError sinon"""
+    ids = [int(i) for i in str(args.get('ids') or '').split(',') if i.strip()]
+    if ids:
+        return ids, None
+    jour = args.get('date')
+    if not jour:
+        return None, datetime.now().date()
+    try:
+        return None, datetime.strptime(jour, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Date invalide: {jour} (attendu : YYYY-MM-DD)')
+
+
+@ventes_bp.route('/api/export/factures', methods=['GET'])
+@login_required
+def export_factures_lot():
+    """
+    Factures d'un lot (ids=1,2,3 ou date=YYYY-MM-DD) en un seul PDF (format=pdf)
+    ou en archive d'un PDF par facture (format=zip, rendu en parallèle)
+    """
+    try:
+        format = (request.args.get('format') or 'pdf').lower()
+        if format not in FORMATS_LOT:
+            raise ValueError(f"Format invalide: {format} (attendu : {', '.join(FORMATS_LOT)})")
+        ids, jour = lire_lot_factures(request.args)
+        factures = donnees_factures_lot(ids=ids, jour=jour)
+        if not factures:
+            return jsonify({'error': 'Aucune facture pour ces critères'}), 404
+
+        nom = f"factures_{jour.strftime('%Y%m%d') if jour else datetime.now().strftime('%Y%m%d_%H%M')}.{format}"
+        return send_file(rendre_lot(factures, format), as_attachment=True, download_name=nom,
+                         mimetype=FORMATS_LOT[format])
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Erreur export factures: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _vente_dict(v):
+    """Formatage d'une vente pour la liste (items et client préchargés)"""
+    try:
+        return {
+            'id': v.id,
+            'numero_facture': v.numero_facture,
+            'date_vente': v.date_vente.isoformat() if v.date_vente else None,
+            'mode_paiement': v.mode_paiement,
+            'devise': v.devise,
+            'statut': v.statut,
+            'statut_paiement': v.statut_paiement,
+            'notes': v.notes,
+            'client_id': v.client_id,
+            'montant_total': float(v.montant_total) if v.montant_total else 0,
+            'client': f"{v.client.nom} {v.client.prenom}".strip() if v.client else "Client anonyme",
+            'items': [
+                {
+                    'produit_id': item.produit.id,
+                    'produit_nom': item.produit.nom,
+                    'quantite': item.quantite,
+                    'prix_unitaire': float(item.prix_unitaire),
+                    'remise': float(item.remise or 0),
+                    'montant_total': float(item.prix_unitaire * item.quantite) - float(item.remise or 0)
+                }
+                for item in v.items
+            ]
+        }
+    except Exception as e:
+        print(f"❌ Erreur formatage vente {v.id}: {e}")
+        # fallback basique
+        return {
+            'id': v.id,
+            'numero_facture': v.numero_facture,
+            'client': 'Erreur chargement',
+            'montant_total': float(v.montant_total) if v.montant_total else 0
+        }
+
+
 @ventes_bp.route('/api/ventes', methods=['GET'])
 @login_required
 def get_ventes():
+    """
+    Liste des ventes, de la plus récente à la plus ancienne, paginée par curseur sur (date_vente, id).
+    Paramètres : date_debut, date_fin, client_id, statut, limit (défaut 100, max 1000), cursor.
+    Le corps reste une liste ; le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor.
+    format=ndjson : flux d'une vente par ligne, lue au fil de l'eau (limit facultatif).
+    """
     try:
-        print("🔍 Début get_ventes...")
-
         # Récupération des filtres
         date_debut = request.args.get('date_debut')
         date_fin = request.args.get('date_fin')
         client_id = request.args.get('client_id')
         statut = request.args.get('statut')
+        flux = request.args.get('format') == 'ndjson'
 
-        print(f"📅 Filtres - date_debut: {date_debut}, date_fin: {date_fin}")
-
-        # Chargement des ventes avec relations
+        # Relations chargées par IN groupés (compatible yield_per, pas de produit cartésien ventes × items)
         query = Vente.query.options(
-            db.joinedload(Vente.items).joinedload(VenteItem.produit),
-            db.joinedload(Vente.client)
+            db.selectinload(Vente.items).selectinload(VenteItem.produit),
+            db.selectinload(Vente.client)
         )
 
         # Application des filtres
@@ -75,50 +161,34 @@ def get_ventes():
         if statut:
             query = query.filter(Vente.statut == statut)
 
-        ventes = query.order_by(Vente.date_vente.desc()).all()
-        print(f"✅ {len(ventes)} ventes trouvées")
+        try:
+            # En flux, pas de limite par défaut ni de plafond : c'est le mode d'extraction en masse
+            limite = lire_limite(request.args.get('limit'), defaut=None, maximum=None) if flux \
+                else lire_limite(request.args.get('limit'))
+            curseur = request.args.get('cursor')
+            if curseur:
+                query = apres_curseur(query, (Vente.date_vente, Vente.id), decoder_curseur(curseur, datetime, int))
+        except ValueError as e:
+            return jsonify({'error': f'Paramètre de pagination invalide: {e}'}), 400
 
-        # Formatage des ventes
-        ventes_data = []
-        for v in ventes:
-            try:
-                vente_dict = {
-                    'id': v.id,
-                    'numero_facture': v.numero_facture,
-                    'date_vente': v.date_vente.isoformat() if v.date_vente else None,
-                    'mode_paiement': v.mode_paiement,
-                    'devise': v.devise,
-                    'statut': v.statut,
-                    'statut_paiement': v.statut_paiement,
-                    'notes': v.notes,
-                    'client_id': v.client_id,
-                    'montant_total': float(v.montant_total) if v.montant_total else 0,
-                    'client': f"{v.client.nom} {v.client.prenom}".strip() if v.client else "Client anonyme",
-                    'items': [
-                        {
-                            'produit_id': item.produit.id,
-                            'produit_nom': item.produit.nom,
-                            'quantite': item.quantite,
-                            'prix_unitaire': float(item.prix_unitaire),
-                            'remise': float(item.remise or 0),
-                            'montant_total': float(item.prix_unitaire * item.quantite) - float(item.remise or 0)
-                        }
-                        for item in v.items
-                    ]
-                }
-                ventes_data.append(vente_dict)
-            except Exception as e:
-                print(f"❌ Erreur formatage vente {v.id}: {e}")
-                # fallback basique
-                ventes_data.append({
-                    'id': v.id,
-                    'numero_facture': v.numero_facture,
-                    'client': 'Erreur chargement',
-                    'montant_total': float(v.montant_total) if v.montant_total else 0
-                })
-
-        print(f"🎯 {len(ventes_data)} ventes formatées")
-        return jsonify(ventes_data)
+        query = query.order_by(Vente.date_vente.desc(), Vente.id.desc())
+
+        if flux:
+            if limite:
+                query = query.limit(limite)
+
+            def generer():
+                # yield_per : les ventes sont lues et sérialisées par lots, sans tout matérialiser
+                for v in query.yield_per(500):
+                    yield json.dumps(_vente_dict(v), ensure_ascii=False) + '\n'
+
+            return Response(stream_with_context(generer()), mimetype='application/x-ndjson')
+
+        ventes, suivant = page_suivante(query.limit(limite + 1).all(), limite, lambda v: (v.date_vente, v.id))
+        reponse = jsonify([_vente_dict(v) for v in ventes])
+        if suivant:
+            reponse.headers['X-Next-Cursor'] = suivant
+        return reponse
 
     except Exception as e:
         import traceback
@@ -126,6 +196,26 @@ def get_ventes():
         return jsonify({'error': str(e)}), 500
 
 
+@ventes_bp.route('/api/ventes/resume-jour', methods=['GET'])
+@login_required
+def resume_ventes_jour():
+    """
+    Cartes de la page des ventes calculées sur toutes les ventes confirmées du jour (UTC, comme date_vente),
+    indépendamment de la page de la liste chargée : chiffre d'affaires, nombre de ventes, articles vendus.
+    """
+    try:
+        debut = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        nb_ventes, ca, articles = db.session.query(
+            func.count(func.distinct(Vente.id)),
+            func.coalesce(func.sum(VenteItem.montant_total), 0),
+            func.coalesce(func.sum(VenteItem.quantite), 0)
+        ).select_from(Vente).join(VenteItem, VenteItem.vente_id == Vente.id)\
+            .filter(Vente.statut == 'confirmée', Vente.date_vente >= debut, Vente.date_vente < debut + timedelta(days=1))\
+            .one()
+        return jsonify({'ca_jour': float(ca), 'nb_ventes_jour': nb_ventes, 'articles_vendus': int(articles)})
+    except Exception as e:
+        print(f"❌ Erreur resume_ventes_jour: {e}")
+        return jsonify({'error': str(e)}), 500
 
 
 @ventes_bp.route('/api/ventes/<int:id>/annuler', methods=['PUT'])
@@ -156,8 +246,13 @@ def annuler_vente(id):
                 )
                 db.session.add(mouvement)
         
+        # Retirer la vente de l'agrégat journalier du tableau de bord
+        if vente.statut == 'confirmée':
+            VenteJour.enregistrer(vente, signe=-1)
+
         vente.statut = 'annulée'
         db.session.commit()
+        invalider_produits(*[item.produit_id for item in vente.items])
         
         return jsonify({'message': 'Vente annulée avec succès'})
         
@@ -197,9 +292,50 @@ def create_vente_api():
             statut_paiement='payé'
         )
 
+        # Panier complet chargé en une requête et validé avant toute écriture
+        besoins = {}
+        for item in items:
+            besoins[item['produit_id']] = besoins.get(item['produit_id'], 0) + item['quantite']
+        produits = {p.id: p for p in Produit.query.filter(Produit.id.in_(besoins)).all()}
+
+        for produit_id in besoins:
+            if produits.get(produit_id) is None:
+                return jsonify({'error': f'Produit {produit_id} introuvable'}), 400
+        # Chaque ligne, et pas seulement le total par produit : une ligne négative compenserait une autre
+        for item in items:
+            if item['quantite'] <= 0:
+                return jsonify({'error': f"Quantité invalide pour {produits[item['produit_id']].nom}"}), 400
+        for produit_id, quantite in besoins.items():
+            produit = produits[produit_id]
+            if produit.stock_actuel < quantite:
+                return jsonify({'error': f'Stock insuffisant pour {produit.nom}'}), 400
+
+        # Décrément atomique de tout le panier : une seule requête, conditionnée au stock disponible
+        # (une vente concurrente entre la lecture et l'écriture fait échouer la condition)
+        quantite_vendue = case(besoins, value=Produit.id)
+        resultat = db.session.execute(
+            db.update(Produit)
+            .where(Produit.id.in_(besoins), Produit.stock_actuel >= quantite_vendue)
+            .values(stock_actuel=Produit.stock_actuel - quantite_vendue)
+            .execution_options(synchronize_session=False)
+        )
+        if resultat.rowcount != len(besoins):
+            db.session.rollback()
+            produits = {p.id: p for p in Produit.query.filter(Produit.id.in_(besoins)).all()}
+            manquant = next((produits[i].nom for i, q in besoins.items() if produits[i].stock_actuel < q), '')
+            return jsonify({'error': f'Stock insuffisant pour {manquant}'}), 400
+
+        # Stocks après décrément relus en une requête (rafraîchit les objets déjà chargés)
+        produits = {p.id: p for p in Produit.query.filter(Produit.id.in_(besoins)).populate_existing().all()}
+        stocks = {i: p.stock_actuel for i, p in produits.items()}
+
         total_vente = 0
+        lignes = []
+        mouvements = []
+        # Stock courant ligne à ligne (un même produit peut apparaître sur plusieurs lignes)
+        stock_courant = {i: stocks[i] + q for i, q in besoins.items()}
         for item in items:
-            produit_id = item['produit_id']
+            produit = produits[item['produit_id']]
             quantite = item['quantite']
             prix_unitaire = item['prix_unitaire']
             remise = item.get('remise', 0)
@@ -207,71 +343,63 @@ def create_vente_api():
             montant_total_item = quantite * prix_unitaire * (1 - remise/100)
             total_vente += montant_total_item
 
-            # Création de l'item de vente
-            vente_item = VenteItem(
-                produit_id=produit_id,
-                quantite=quantite,
-                prix_unitaire=prix_unitaire,
-                remise=remise,
-                montant_total=montant_total_item
-            )
-            vente.items.append(vente_item)
-
-            # Mise à jour du stock
-            produit = Produit.query.get(produit_id)
-            if produit:
-                if produit.stock_actuel < quantite:
-                    return jsonify({'error': f'Stock insuffisant pour {produit.nom}'}), 400
-
-                stock_avant = produit.stock_actuel
-                produit.stock_actuel -= quantite
+            # Ligne de vente (coût d'achat figé au moment de la vente)
+            lignes.append({
+                'produit_id': produit.id,
+                'quantite': quantite,
+                'prix_unitaire': prix_unitaire,
+                'remise': remise,
+                'montant_total': montant_total_item,
+                'cout_unitaire': produit.prix_achat
+            })
 
-                # Création d'un mouvement de stock
-                mouvement = MouvementStock(
-                    produit_id=produit.id,
-                    type_mouvement='sortie',
-                    quantite=quantite,
-                    quantite_avant=stock_avant,
-                    quantite_apres=produit.stock_actuel,
-                    motif=f'Vente {numero_facture}',
-                    utilisateur=current_user.username
-                )
-                db.session.add(mouvement)
+            stock_avant = stock_courant[produit.id]
+            stock_courant[produit.id] -= quantite
+            mouvements.append({
+                'produit_id': produit.id,
+                'type_mouvement': 'sortie',
+                'quantite': quantite,
+                'quantite_avant': stock_avant,
+                'quantite_apres': stock_courant[produit.id],
+                'motif': f'Vente {numero_facture}',
+                'utilisateur': current_user.username
+            })
 
         vente.montant_total = total_vente
 
         db.session.add(vente)
 
+        # flush to get vente.id et la date de vente par défaut
+        db.session.flush()
+
+        # Lignes de vente et mouvements de stock insérés chacun en un seul INSERT multi-lignes
+        db.session.execute(db.insert(VenteItem), [dict(ligne, vente_id=vente.id) for ligne in lignes])
+        db.session.execute(db.insert(MouvementStock), mouvements)
+
+        # Agrégat journalier lu par le tableau de bord
+        VenteJour.enregistrer(vente)
+
         # Si la vente est payée immédiatement, créer un paiement et créditer la caisse
         # (statut_paiement peut être 'payé' ou 'crédit' selon l'usage)
         if vente.statut_paiement == 'payé' or mode_paiement.lower() != 'crédit':
-            # flush to get vente.id
-            db.session.flush()
-
             # Créer paiement
             paiement = Paiement(vente_id=vente.id, montant=vente.montant_total, mode_paiement=mode_paiement)
             db.session.add(paiement)
+            db.session.flush()
 
-            # Mettre à jour solde caisse
-            solde_avant = ParametreSysteme.get_value("solde_caisse", 0)
-            solde_apres = solde_avant + (vente.montant_total or 0)
-            ParametreSysteme.set_value("solde_caisse", solde_apres, type_valeur="number")
-
-            # Historiser mouvement de caisse
+            # Créditer la caisse (incrément atomique) et historiser le mouvement
             utilisateur = getattr(current_user, 'username', None) if current_user and hasattr(current_user, 'username') else None
-            mouvement = MouvementCaisse(
-                type='encaisse',
-                montant=vente.montant_total,
+            Caisse.mouvement(
+                'encaisse',
+                vente.montant_total,
                 paiement_id=paiement.id,
                 vente_id=vente.id,
                 utilisateur=utilisateur,
-                solde_avant=solde_avant,
-                solde_apres=solde_apres,
                 notes='Paiement automatique lors création vente'
             )
-            db.session.add(mouvement)
 
         db.session.commit()
+        invalider_produits(*besoins)
 
         return jsonify({'message': 'Vente enregistrée', 'vente_id': vente.id, 'numero_facture': numero_facture}), 201
 
@@ -306,16 +434,19 @@ def get_clients():
         return jsonify({'error': str(e)}), 500
     
 
-from io import BytesIO
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from flask import send_file
+from openpyxl.styles import Alignment
+from utils import excel, flux
 
 @ventes_bp.route('/api/export/ventes/excel', methods=['GET'])
 @login_required
 def export_ventes_excel():
+    """Ventes de la période (une ligne par vente) en Excel, ou en flux avec format=csv|ndjson"""
     date_debut = request.args.get('date_debut')
     date_fin = request.args.get('date_fin')
+    try:
+        format = flux.lire_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     if not date_debut or not date_fin:
         return jsonify({'error': 'Les paramètres date_debut et date_fin sont requis'}), 400
@@ -326,44 +457,30 @@ def export_ventes_excel():
     except ValueError:
         return jsonify({'error': 'Format de date invalide. Utilisez YYYY-MM-DD'}), 400
 
-    # Récupérer les ventes dans la période
-    ventes = Vente.query.filter(
+    # Ventes de la période lues par lots (client joint), classeur écrit en flux
+    query = db.session.query(
+        Vente.id, Vente.numero_facture, Vente.date_vente, Client.nom, Client.prenom,
+        Vente.montant_total, Vente.devise, Vente.statut
+    ).outerjoin(Client, Client.id == Vente.client_id).filter(
         Vente.date_vente >= date_debut_obj,
         Vente.date_vente <= date_fin_obj
-    ).all()
-
-    # Créer Excel
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Ventes"
-
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center")
-
-    headers = ['ID', 'Numéro Facture', 'Date', 'Client', 'Montant Total', 'Devise', 'Statut']
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=h)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-
-    for row, vente in enumerate(ventes, 2):
-        ws.cell(row=row, column=1, value=vente.id)
-        ws.cell(row=row, column=2, value=vente.numero_facture)
-        ws.cell(row=row, column=3, value=vente.date_vente.strftime('%Y-%m-%d %H:%M') if vente.date_vente else '')
-        ws.cell(row=row, column=4, value=f"{vente.client.nom} {vente.client.prenom}" if vente.client else 'Client anonyme')
-        ws.cell(row=row, column=5, value=float(vente.montant_total))
-        ws.cell(row=row, column=6, value=vente.devise)
-        ws.cell(row=row, column=7, value=vente.statut)
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    ).order_by(Vente.date_vente, Vente.id)
 
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f'ventes_{date_debut}_a_{date_fin}.xlsx',
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    lignes = (
+        (v.id, v.numero_facture, excel.date_texte(v.date_vente),
+         f"{v.nom} {v.prenom}" if v.nom else 'Client anonyme', float(v.montant_total), v.devise, v.statut)
+        for v in excel.lire_par_lots(query)
     )
+
+    entetes = ['ID', 'Numéro Facture', 'Date', 'Client', 'Montant Total', 'Devise', 'Statut']
+    if format in flux.FORMATS_FLUX:
+        return flux.reponse(format, f'ventes_{date_debut}_a_{date_fin}', flux.generer(
+            format, entetes, ['id', 'numero_facture', 'date', 'client', 'montant_total', 'devise', 'statut'], lignes,
+            separateur=flux.lire_separateur(request.args.get('separateur'))
+        ))
+
+    wb = excel.classeur()
+    excel.ajouter_feuille(wb, "Ventes", entetes, lignes,
+                          style_entete=dict(excel.STYLE_ENTETE, alignment=Alignment(horizontal="center")))
+
+    return excel.envoyer(wb, f'ventes_{date_debut}_a_{date_fin}.xlsx')
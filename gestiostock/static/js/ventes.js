@@ -3,6 +3,7 @@
 class VentesManager {
     constructor() {
         this.ventes = [];
+        this.nextCursor = null;
         this.clients = [];
         this.produits = [];
         this.panier = [];
@@ -40,7 +41,7 @@ class VentesManager {
         document.getElementById('filter-date-fin').valueAsDate = aujourdhui;
     }
 
-    async loadVentes() {
+    async loadVentes(suite = false) {
         try {
             this.showLoading(true);
 
@@ -54,13 +55,19 @@ class VentesManager {
             if(dateFin) params.append('date_fin', dateFin);
             if(clientId) params.append('client_id', clientId);
             if(statut) params.append('statut', statut);
+            // Pagination par curseur : "Charger plus" reprend après la dernière vente affichée
+            if(suite && this.nextCursor) params.append('cursor', this.nextCursor);
 
             const response = await fetch(`/api/ventes?${params.toString()}`);
             if(!response.ok) throw new Error(`Erreur HTTP: ${response.status}`);
 
-            this.ventes = await response.json();
+            const page = await response.json();
+            this.ventes = suite ? this.ventes.concat(page) : page;
+            this.nextCursor = response.headers.get('X-Next-Cursor');
+            document.getElementById('btn-plus-ventes').style.display = this.nextCursor ? '' : 'none';
             this.afficherVentes(this.ventes);
-            this.calculerStats(this.ventes);
+            // Cartes calculées par le serveur sur toutes les ventes du jour (la liste n'en contient qu'une page)
+            if(!suite) await this.calculerStats();
         } catch (error) {
             console.error('❌ Erreur chargement ventes:', error);
             this.showError('Impossible de charger les ventes: ' + error.message);
@@ -128,27 +135,14 @@ class VentesManager {
         return badges[statut]||'<span class="badge badge-secondary">❓ Inconnu</span>';
     }
 
-    calculerStats(ventes) {
-        const aujourdhui = new Date().toISOString().split('T')[0];
-        const ventesJour = ventes.filter(v => v.date_vente.startsWith(aujourdhui) && v.statut === 'confirmée');
+    async calculerStats() {
+        const response = await fetch('/api/ventes/resume-jour');
+        if(!response.ok) throw new Error(`Erreur HTTP: ${response.status}`);
+        const resume = await response.json();
 
-        const caJour = ventesJour.reduce((sum, v) => {
-            // total de tous les items
-            const totalVente = v.items.reduce((s, item) => s + (item.prix_unitaire * item.quantite * (1 - (item.remise || 0)/100)), 0);
-            return sum + totalVente;
-        }, 0);
-
-        const nbVentes = ventesJour.length;
-
-        // total articles vendus
-        const articlesVendus = ventesJour.reduce((sum, v) => {
-            const totalArticles = v.items.reduce((s, item) => s + item.quantite, 0);
-            return sum + totalArticles;
-        }, 0);
-
-        document.getElementById('ca-jour').textContent = this.formatCurrency(caJour);
-        document.getElementById('nb-ventes-jour').textContent = nbVentes;
-        document.getElementById('articles-vendus').textContent = articlesVendus;
+        document.getElementById('ca-jour').textContent = this.formatCurrency(resume.ca_jour);
+        document.getElementById('nb-ventes-jour').textContent = resume.nb_ventes_jour;
+        document.getElementById('articles-vendus').textContent = resume.articles_vendus;
     }
 
 
@@ -0,0 +1,105 @@
+"""
+Agrégation par période (jour, semaine, mois) en une seule requête GROUP BY
+"""
+from datetime import datetime, date, timedelta
+from sqlalchemy import func
+from models import db
+
+GRANULARITES = ('jour', 'semaine', 'mois')
+
+_FORMATS_SQLITE = {
+    'jour': ('%Y-%m-%d',),
+    'semaine': ('%Y-%m-%d', 'weekday 0', '-6 days'),  # lundi de la semaine
+    'mois': ('%Y-%m-01',),
+}
+
+_TRONCATURES_POSTGRES = {
+    'jour': 'day',
+    'semaine': 'week',
+    'mois': 'month',
+}
+
+
+def debut_periode(jour, granularite='jour'):
+    """Ramène une date au premier jour de sa période"""
+    if isinstance(jour, datetime):
+        jour = jour.date()
+    if granularite == 'semaine':
+        return jour - timedelta(days=jour.weekday())
+    if granularite == 'mois':
+        return jour.replace(day=1)
+    return jour
+
+
+def periode_suivante(jour, granularite='jour'):
+    """Premier jour de la période qui suit celle commençant à `jour`"""
+    if granularite == 'semaine':
+        return jour + timedelta(days=7)
+    if granularite == 'mois':
+        return date(jour.year + 1, 1, 1) if jour.month == 12 else date(jour.year, jour.month + 1, 1)
+    return jour + timedelta(days=1)
+
+
+def reculer_mois(jour, nb_mois):
+    """Premier jour du mois situé nb_mois avant celui de `jour`"""
+    index = jour.year * 12 + (jour.month - 1) - nb_mois
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def periodes(debut, fin, granularite='jour'):
+    """Liste des débuts de période entre debut et fin (inclus)"""
+    courant = debut_periode(debut, granularite)
+    fin = debut_periode(fin, granularite)
+    resultat = []
+    while courant <= fin:
+        resultat.append(courant)
+        courant = periode_suivante(courant, granularite)
+    return resultat
+
+
+def expression_periode(colonne, granularite='jour'):
+    """Expression SQL qui tronque une colonne date/datetime au début de sa période.
+    PostgreSQL utilise date_trunc, SQLite strftime."""
+    if granularite not in GRANULARITES:
+        raise ValueError(f"Granularité inconnue: {granularite}")
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.date_trunc(_TRONCATURES_POSTGRES[granularite], colonne)
+    format_date, *modificateurs = _FORMATS_SQLITE[granularite]
+    return func.strftime(format_date, colonne, *modificateurs)
+
+
+def _vers_date(valeur):
+    """Normalise la clé de période renvoyée par la base (texte SQLite ou datetime PostgreSQL)"""
+    if isinstance(valeur, datetime):
+        return valeur.date()
+    if isinstance(valeur, date):
+        return valeur
+    return datetime.strptime(str(valeur)[:10], '%Y-%m-%d').date()
+
+
+def _borne(colonne, jour):
+    """Adapte une borne au type de la colonne filtrée (Date ou DateTime)"""
+    if isinstance(colonne.type, db.DateTime):
+        return datetime.combine(jour, datetime.min.time())
+    return jour
+
+
+def agreger_par_periode(colonne_date, valeur, debut, fin=None, granularite='jour', filtres=()):
+    """
+    Agrège `valeur` (ex: func.sum(Vente.montant_total)) par période en un seul aller-retour.
+    Retourne une liste [(debut_de_periode, valeur)] couvrant toutes les périodes de
+    debut à fin, les périodes sans donnée valant 0.
+    """
+    fin = fin or datetime.now().date()
+    liste_periodes = periodes(debut, fin, granularite)
+
+    periode = expression_periode(colonne_date, granularite).label('periode')
+    query = db.session.query(periode, valeur.label('valeur')).filter(
+        colonne_date >= _borne(colonne_date, liste_periodes[0]),
+        colonne_date < _borne(colonne_date, periode_suivante(liste_periodes[-1], granularite)),
+        *filtres
+    ).group_by(periode)
+
+    valeurs = {_vers_date(r.periode): r.valeur or 0 for r in query.all()}
+    return [(p, valeurs.get(p, 0)) for p in liste_periodes]
@@ -0,0 +1,62 @@
+"""
+Cache mémoire local au processus : LRU borné avec expiration (TTL), partagé entre threads
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_ABSENT = object()
+
+
+class CacheLRU:
+    """
+    Cache clé → valeur borné à taille_max entrées (les moins récemment lues sont évincées),
+    chaque entrée expirant ttl secondes après son écriture.
+    """
+
+    def __init__(self, taille_max=1024, ttl=60):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cle, defaut=None):
+        with self._verrou:
+            entree = self._entrees.get(cle, _ABSENT)
+            if entree is not _ABSENT:
+                expiration, valeur = entree
+                if expiration > time.monotonic():
+                    self._entrees.move_to_end(cle)
+                    self.hits += 1
+                    return valeur
+                del self._entrees[cle]
+            self.misses += 1
+            return defaut
+
+    def set(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic() + self.ttl, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def get_or_set(self, cle, calculer):
+        """Valeur en cache, sinon calculer() est appelé (hors verrou) et son résultat mis en cache"""
+        valeur = self.get(cle, _ABSENT)
+        if valeur is _ABSENT:
+            valeur = calculer()
+            self.set(cle, valeur)
+        return valeur
+
+    def invalider(self, *cles):
+        """Supprime les clés données, ou tout le cache si aucune clé n'est passée"""
+        with self._verrou:
+            if not cles:
+                self._entrees.clear()
+            for cle in cles:
+                self._entrees.pop(cle, None)
+
+    def __len__(self):
+        return len(self._entrees)
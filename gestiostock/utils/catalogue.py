@@ -0,0 +1,76 @@
+"""
+Caches du catalogue produits (local au processus), invalidés par les routes qui modifient les produits
+"""
+import threading
+from sqlalchemy import or_, case
+from models import db, Produit
+from utils.cache import CacheLRU
+
+# Nombre de produits actifs par combinaison de filtres de /api/produits
+compteurs_produits = CacheLRU(taille_max=256, ttl=30)
+
+# Lecture caisse (code-barre / référence) : code → id, puis id → fiche produit
+codes_produits = CacheLRU(taille_max=8192, ttl=3600)
+fiches_produits = CacheLRU(taille_max=2048, ttl=60)
+
+# Incrémenté à chaque invalidation : une fiche lue pendant une invalidation n'est pas mise en cache
+_generation = 0
+_verrou_generation = threading.Lock()
+
+
+def invalider_produits(*ids):
+    """
+    À appeler après le commit de toute création, modification, désactivation de produit
+    ou variation de stock (vente, annulation, réception). Sans ids, tout le catalogue est invalidé.
+    """
+    global _generation
+    with _verrou_generation:
+        _generation += 1
+    compteurs_produits.invalider()
+    fiches_produits.invalider(*ids)
+
+
+def _fiche(p):
+    return {
+        'id': p.id,
+        'reference': p.reference,
+        'code_barre': p.code_barre or '',
+        'nom': p.nom,
+        'prix_vente': float(p.prix_vente or 0),
+        'tva': float(p.tva or 0),
+        'stock_actuel': p.stock_actuel,
+        'unite_mesure': p.unite_mesure or 'unité',
+        'categorie_id': p.categorie_id
+    }
+
+
+def _requete_fiche(filtre):
+    return db.session.query(
+        Produit.id, Produit.reference, Produit.code_barre, Produit.nom, Produit.prix_vente,
+        Produit.tva, Produit.stock_actuel, Produit.unite_mesure, Produit.categorie_id
+    ).filter(Produit.actif == True, filtre)
+
+
+def produit_par_code(code):
+    """
+    Fiche du produit actif dont le code-barre (prioritaire) ou la référence vaut exactement code, ou None.
+    Résolu par les index uniques, puis servi depuis le cache tant que le produit n'est pas modifié.
+    """
+    produit_id = codes_produits.get(code)
+    if produit_id is not None:
+        fiche = fiches_produits.get(produit_id)
+        # Une fiche dont les codes ont changé depuis ne correspond plus à ce code
+        if fiche is not None and code in (fiche['code_barre'], fiche['reference']):
+            return dict(fiche)
+
+    generation = _generation
+    ligne = _requete_fiche(or_(Produit.code_barre == code, Produit.reference == code))\
+        .order_by(case((Produit.code_barre == code, 0), else_=1)).first()
+    if ligne is None:
+        return None
+
+    fiche = _fiche(ligne)
+    if generation == _generation:
+        codes_produits.set(code, fiche['id'])
+        fiches_produits.set(fiche['id'], fiche)
+    return dict(fiche)
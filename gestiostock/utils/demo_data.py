@@ -123,5 +123,7 @@ def init_demo_data():
     
     for param in params:
         db.session.add(param)
+    # Cache des paramètres déjà rempli au démarrage (Caisse.initialiser) : le signaler périmé
+    ParametreSysteme.nouvelle_version()
     
     db.session.commit()
\ No newline at end of file
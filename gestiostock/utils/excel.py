@@ -0,0 +1,101 @@
+"""
+Moteur d'export Excel en flux : classeur openpyxl en mode write_only (les lignes sont écrites
+au fil de l'eau, jamais gardées en mémoire), largeurs de colonnes estimées sur les premières lignes,
+fichier produit dans un SpooledTemporaryFile (mémoire sous SPOOL_MAX, disque au-delà)
+"""
+import tempfile
+from itertools import islice
+from flask import send_file
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Lignes lues pour estimer la largeur des colonnes, et largeur maximale
+ECHANTILLON_LARGEURS = 200
+LARGEUR_MAX = 50
+
+# Taille (octets) au-delà de laquelle le fichier produit passe sur disque
+SPOOL_MAX = 8 * 1024 * 1024
+
+# Lignes lues par lot depuis la base (curseur serveur sous PostgreSQL)
+LOT_LECTURE = 1000
+
+STYLE_ENTETE = {
+    'font': Font(bold=True, color="FFFFFF"),
+    'fill': PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+    'alignment': Alignment(horizontal="center", vertical="center")
+}
+
+STYLE_ENTETE_GRIS = {
+    'font': Font(bold=True),
+    'fill': PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+}
+
+
+def classeur():
+    """Nouveau classeur en écriture seule (sans feuille par défaut)"""
+    return Workbook(write_only=True)
+
+
+def ajouter_feuille(wb, titre, entetes, lignes, style_entete=STYLE_ENTETE, progression=None):
+    """
+    Ajoute une feuille : en-têtes stylés puis lignes (itérable de tuples, lu une seule fois).
+    Les largeurs de colonnes sont calculées sur les ECHANTILLON_LARGEURS premières lignes.
+    progression(n) est appelé toutes les LOT_LECTURE lignes avec le nombre de lignes écrites depuis l'appel précédent.
+    Retourne le nombre de lignes écrites (hors en-tête).
+    """
+    ws = wb.create_sheet(title=titre)
+    lignes = iter(lignes)
+    echantillon = list(islice(lignes, ECHANTILLON_LARGEURS))
+
+    # En mode write_only, les dimensions doivent être fixées avant la première ligne
+    for i, entete in enumerate(entetes):
+        longueur = max([len(str(entete))] + [len(str(l[i])) for l in echantillon if i < len(l) and l[i] is not None])
+        ws.column_dimensions[get_column_letter(i + 1)].width = min(longueur + 2, LARGEUR_MAX)
+
+    cellules = []
+    for entete in entetes:
+        cellule = WriteOnlyCell(ws, value=entete)
+        for attribut, valeur in (style_entete or {}).items():
+            setattr(cellule, attribut, valeur)
+        cellules.append(cellule)
+    ws.append(cellules)
+
+    nb = 0
+    for ligne in echantillon:
+        ws.append(tuple(ligne))
+        nb += 1
+    for ligne in lignes:
+        # tuple() : les Row SQLAlchemy ne sont pas acceptées telles quelles par openpyxl
+        ws.append(tuple(ligne))
+        nb += 1
+        if progression and nb % LOT_LECTURE == 0:
+            progression(LOT_LECTURE)
+    if progression:
+        progression(nb % LOT_LECTURE)
+    return nb
+
+
+def fichier(wb):
+    """Enregistre le classeur dans un fichier temporaire, repositionné au début"""
+    sortie = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    wb.save(sortie)
+    sortie.seek(0)
+    return sortie
+
+
+def envoyer(wb, nom_fichier):
+    """Réponse Flask de téléchargement du classeur (le fichier temporaire est fermé après l'envoi)"""
+    return send_file(fichier(wb), as_attachment=True, download_name=nom_fichier, mimetype=MIMETYPE_XLSX)
+
+
+def lire_par_lots(query, taille=LOT_LECTURE):
+    """Itère une requête ORM par lots de `taille` lignes (yield_per) au lieu de tout charger"""
+    return query.yield_per(taille)
+
+
+def date_texte(valeur, format='%Y-%m-%d %H:%M'):
+    return valeur.strftime(format) if valeur else ''
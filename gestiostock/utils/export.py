@@ -2,180 +2,230 @@
 Fonctions d'export (PDF, Excel)
 """
 import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+from datetime import datetime, timedelta
+from models import db, User, Vente, VenteItem, Produit, Client, Categorie, Fournisseur
+from utils import excel
+from utils.factures import donnees_facture, rendre_facture, rendre_rapport_ventes
 
-def exporter_ventes_pdf(ventes, filename=None):
-    """Exporte les ventes en PDF"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    elements.append(Paragraph("Rapport des Ventes", styles['Title']))
-    elements.append(Spacer(1, 12))
-    
-    # Préparer les données du tableau
-    data = [['Facture', 'Client', 'Produit', 'Quantité', 'Montant', 'Date']]
-    
-    for vente in ventes:
-        data.append([
-            vente.numero_facture,
-            vente.client.nom if vente.client else 'Anonyme',
-            vente.produit.nom,
-            str(vente.quantite),
-            f"{vente.montant_total:,.0f} F",
-            vente.date_vente.strftime('%d/%m/%Y')
-        ])
-    
-    # Créer le tableau
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
-    return buffer
+# Nombre maximal de factures par lot
+MAX_FACTURES_LOT = 2000
 
 
-import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+def charger_ventes_pdf(query):
+    """Précharge items, produits et clients des ventes à rendre en PDF (requêtes groupées)"""
+    return query.options(
+        db.selectinload(Vente.items).selectinload(VenteItem.produit),
+        db.selectinload(Vente.client)
+    )
+
+
+def exporter_ventes_pdf(ventes, filename=None):
+    """Exporte les ventes en PDF (une ligne par article vendu)"""
+    return rendre_rapport_ventes(ventes)
+
 
 def exporter_facture_pdf(vente):
     """
     Exporte une facture PDF pour une vente multi-produits.
     vente.items: liste d'objets VenteItem avec .produit.nom, .quantite, .prix_unitaire, .remise
-    vente.client: objet client obligatoire avec .nom
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=18)
-    elements = []
-
-    # Styles
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='CenterTitle', alignment=1, fontSize=18, spaceAfter=12))
-    styles.add(ParagraphStyle(name='Right', alignment=2))
-
-    # Titre
-    elements.append(Paragraph(f"Facture N° {vente.numero_facture}", styles['CenterTitle']))
-
-    # Infos client et vente (client obligatoire)
-    client_nom = vente.client.nom
-    info_text = f"""
-    <b>Client :</b> {client_nom}<br/>
-    <b>Date :</b> {vente.date_vente.strftime('%d/%m/%Y %H:%M')}<br/>
-    <b>Mode de paiement :</b> {vente.mode_paiement}<br/>
-    <b>Devise :</b> {vente.devise}
+    return io.BytesIO(rendre_facture(donnees_facture(vente)))
+
+
+def donnees_factures_lot(ids=None, jour=None):
+    """
+    Données des factures d'un lot : ventes listées par ids, ou ventes non annulées du jour donné
+    (date). ValueError si le lot est vide de critères ou dépasse MAX_FACTURES_LOT.
+    """
+    query = Vente.query
+    if ids:
+        query = query.filter(Vente.id.in_(ids))
+    elif jour is not None:
+        debut = datetime(jour.year, jour.month, jour.day)
+        query = query.filter(Vente.date_vente >= debut, Vente.date_vente < debut + timedelta(days=1),
+                             Vente.statut != 'annulée')
+    else:
+        raise ValueError('Préciser ids ou date')
+
+    ventes = charger_ventes_pdf(query.order_by(Vente.date_vente, Vente.id)).limit(MAX_FACTURES_LOT + 1).all()
+    if len(ventes) > MAX_FACTURES_LOT:
+        raise ValueError(f'Lot limité à {MAX_FACTURES_LOT} factures')
+    return [donnees_facture(v) for v in ventes]
+
+
+ENTETES_PRODUITS = ['Référence', 'Nom', 'Catégorie', 'Prix Achat', 'Prix Vente', 'Stock', 'Stock Min', 'Fournisseur']
+
+ENTETES_VENTES_DETAIL = [
+    'ID', 'Numéro Facture', 'Date', 'Client', 'Produit',
+    'Quantité', 'Prix Unitaire', 'Remise', 'Montant Total',
+    'Devise', 'Mode Paiement', 'Statut', 'Statut Paiement'
+]
+
+ENTETES_UTILISATEURS = [
+    'ID', 'Username', 'Email', 'Nom', 'Prénom', 'Rôle',
+    'Téléphone', 'Actif', 'Date Création', 'Dernier Login'
+]
+
+ENTETES_PRODUITS_COMPLET = [
+    'ID', 'Nom', 'Référence', 'Description', 'Prix Achat',
+    'Prix Vente', 'Stock Actuel', 'Stock Min', 'Catégorie',
+    'Fournisseur', 'Actif'
+]
+
+# Clés des mêmes colonnes pour les formats texte (CSV, NDJSON)
+CLES_PRODUITS = ['reference', 'nom', 'categorie', 'prix_achat', 'prix_vente', 'stock', 'stock_min', 'fournisseur']
+CLES_VENTES_DETAIL = [
+    'vente_id', 'numero_facture', 'date', 'client', 'produit',
+    'quantite', 'prix_unitaire', 'remise', 'montant_total',
+    'devise', 'mode_paiement', 'statut', 'statut_paiement'
+]
+CLES_UTILISATEURS = [
+    'id', 'username', 'email', 'nom', 'prenom', 'role',
+    'telephone', 'actif', 'date_creation', 'dernier_login'
+]
+CLES_PRODUITS_COMPLET = [
+    'id', 'nom', 'reference', 'description', 'prix_achat',
+    'prix_vente', 'stock_actuel', 'stock_min', 'categorie',
+    'fournisseur', 'actif'
+]
+
+
+def lignes_produits(*filtres):
+    """Lignes de l'export produits (une requête projetée, lue par lots)"""
+    query = db.session.query(
+        Produit.reference, Produit.nom, Categorie.nom, Produit.prix_achat, Produit.prix_vente,
+        Produit.stock_actuel, Produit.stock_min, Fournisseur.nom
+    ).outerjoin(Categorie, Categorie.id == Produit.categorie_id)\
+     .outerjoin(Fournisseur, Fournisseur.id == Produit.fournisseur_id)\
+     .filter(*filtres).order_by(Produit.id)
+    for ref, nom, categorie, prix_achat, prix_vente, stock, stock_min, fournisseur in excel.lire_par_lots(query):
+        yield (ref, nom, categorie or '', prix_achat, prix_vente, stock, stock_min, fournisseur or '')
+
+
+def lignes_ventes_detail(*filtres):
+    """
+    Lignes de l'export des ventes : une par article vendu (une vente sans article garde une ligne),
+    colonnes projetées par jointures, lues par lots dans l'ordre chronologique
+    """
+    query = db.session.query(
+        Vente.id, Vente.numero_facture, Vente.date_vente, Client.nom, Client.prenom, Produit.nom,
+        VenteItem.quantite, VenteItem.prix_unitaire, VenteItem.remise, VenteItem.montant_total,
+        Vente.montant_total, Vente.devise, Vente.mode_paiement, Vente.statut, Vente.statut_paiement
+    ).outerjoin(VenteItem, VenteItem.vente_id == Vente.id)\
+     .outerjoin(Produit, Produit.id == VenteItem.produit_id)\
+     .outerjoin(Client, Client.id == Vente.client_id)\
+     .filter(*filtres).order_by(Vente.date_vente, Vente.id, VenteItem.id)
+    for (id_, facture, date, client_nom, client_prenom, produit, quantite, prix, remise, montant_item,
+         montant_vente, devise, mode, statut, statut_paiement) in excel.lire_par_lots(query):
+        client = f"{client_nom} {client_prenom or ''}".strip() if client_nom else 'Client anonyme'
+        yield (
+            id_, facture, excel.date_texte(date), client, produit or 'Produit inconnu',
+            quantite or 0, float(prix or 0), float(remise or 0),
+            float(montant_item if montant_item is not None else montant_vente or 0),
+            devise, mode, statut, statut_paiement
+        )
+
+
+def exporter_produits_excel(produits=None, filename=None):
+    """
+    Exporte les produits en Excel (fichier temporaire). Sans liste fournie, les produits actifs
+    sont lus par lots depuis la base.
     """
-    elements.append(Paragraph(info_text, styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Tableau produits
-    data = [['Produit', 'Quantité', 'Prix Unitaire', 'Remise (%)', 'Montant']]
-    total = 0
-
-    for item in getattr(vente, 'items', []):
-        produit_nom = getattr(getattr(item, 'produit', None), 'nom', 'Produit inconnu')
-        quantite = max(getattr(item, 'quantite', 0), 0)
-        prix_unitaire = max(getattr(item, 'prix_unitaire', 0), 0)
-        remise = max(getattr(item, 'remise', 0) or 0, 0)
-
-        montant_item = prix_unitaire * quantite * (1 - remise / 100)
-        total += montant_item
-
-        data.append([
-            produit_nom,
-            str(quantite),
-            f"{prix_unitaire:,.2f} {vente.devise}",
-            f"{remise:.2f}%",
-            f"{montant_item:,.2f} {vente.devise}"
-        ])
-
-    # Création du tableau
-    table = Table(data, colWidths=[200, 60, 80, 60, 80])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.darkblue),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('ALIGN', (1,1), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 12),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('BACKGROUND', (0,1), (-1,-1), colors.beige)
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 12))
-
-    # Total
-    elements.append(Paragraph(f"<b>Total à payer : {total:,.2f} {vente.devise}</b>", styles['Heading2']))
-
-    # Notes éventuelles
-    if getattr(vente, 'notes', None):
-        elements.append(Spacer(1, 12))
-        elements.append(Paragraph(f"<b>Notes :</b> {vente.notes}", styles['Normal']))
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-
-def exporter_produits_excel(produits, filename=None):
-
-
-    """Exporte les produits en Excel"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Produits"
+    if produits is None:
+        return excel.fichier(classeur_produits())
+
+    wb = excel.classeur()
+    excel.ajouter_feuille(wb, "Produits", ENTETES_PRODUITS, (
+        (p.reference, p.nom, p.categorie.nom if p.categorie else '', p.prix_achat, p.prix_vente,
+         p.stock_actuel, p.stock_min, p.fournisseur.nom if p.fournisseur else '') for p in produits
+    ), style_entete=excel.STYLE_ENTETE_GRIS)
+    return excel.fichier(wb)
+
+
+def lignes_utilisateurs():
+    """Lignes de la feuille utilisateurs de l'export complet"""
+    query = db.session.query(
+        User.id, User.username, User.email, User.nom, User.prenom, User.role,
+        User.telephone, User.actif, User.date_creation, User.dernier_login
+    ).order_by(User.id)
+    for u in excel.lire_par_lots(query):
+        yield (u.id, u.username, u.email, u.nom or '', u.prenom or '', u.role, u.telephone or '',
+               'Oui' if u.actif else 'Non', excel.date_texte(u.date_creation), excel.date_texte(u.dernier_login))
+
+
+def lignes_produits_complet():
+    """Lignes de la feuille produits de l'export complet (actifs et inactifs)"""
+    query = db.session.query(
+        Produit.id, Produit.nom, Produit.reference, Produit.description, Produit.prix_achat,
+        Produit.prix_vente, Produit.stock_actuel, Produit.stock_min,
+        Categorie.nom.label('categorie'), Fournisseur.nom.label('fournisseur'), Produit.actif
+    ).outerjoin(Categorie, Categorie.id == Produit.categorie_id)\
+     .outerjoin(Fournisseur, Fournisseur.id == Produit.fournisseur_id)\
+     .order_by(Produit.id)
+    for p in excel.lire_par_lots(query):
+        yield (p.id, p.nom, p.reference, p.description or '', float(p.prix_achat or 0), float(p.prix_vente or 0),
+               p.stock_actuel, p.stock_min, p.categorie or '', p.fournisseur or '', 'Oui' if p.actif else 'Non')
+
+
+def compter_lignes_ventes(*filtres):
+    """Nombre de lignes de lignes_ventes_detail(*filtres) (pour la progression)"""
+    return db.session.query(db.func.count()).select_from(Vente)\
+        .outerjoin(VenteItem, VenteItem.vente_id == Vente.id).filter(*filtres).scalar()
+
+
+def classeur_ventes(debut, fin, progression=None):
+    """Classeur des ventes de debut (inclus) à fin (exclu), une ligne par article vendu"""
+    wb = excel.classeur()
+    nb = excel.ajouter_feuille(wb, "Ventes", ENTETES_VENTES_DETAIL, lignes_ventes_detail(
+        Vente.date_vente >= debut,
+        Vente.date_vente < fin
+    ), progression=progression)
+    print(f"📊 {nb} lignes de ventes exportées")
+    return wb
+
+
+def classeur_produits(progression=None):
+    """Classeur des produits actifs"""
+    wb = excel.classeur()
+    excel.ajouter_feuille(wb, "Produits", ENTETES_PRODUITS, lignes_produits(Produit.actif == True),
+                          style_entete=excel.STYLE_ENTETE_GRIS, progression=progression)
+    return wb
+
+
+def compter_lignes_complet():
+    """Nombre de lignes écrites par classeur_complet (hors statistiques)"""
+    return db.session.query(db.func.count(User.id)).scalar() + compter_lignes_ventes() \
+        + db.session.query(db.func.count(Produit.id)).scalar()
+
+
+def classeur_complet(progression=None):
+    """Export de toutes les données : utilisateurs, ventes, produits et statistiques"""
+    # Classeur en écriture seule : chaque feuille est lue par lots et écrite en flux
+    wb = excel.classeur()
     
-    # En-têtes
-    headers = ['Référence', 'Nom', 'Catégorie', 'Prix Achat', 'Prix Vente', 'Stock', 'Stock Min', 'Fournisseur']
-    for col, header in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=header)
-        ws.cell(row=1, column=col).font = Font(bold=True)
-        ws.cell(row=1, column=col).fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+    # === FEUILLE 1: UTILISATEURS ===
+    nb_users = excel.ajouter_feuille(wb, "Utilisateurs", ENTETES_UTILISATEURS, lignes_utilisateurs(),
+                                     progression=progression)
+    print(f"✅ {nb_users} utilisateurs exportés")
     
-    # Données
-    for row, produit in enumerate(produits, 2):
-        ws.cell(row=row, column=1, value=produit.reference)
-        ws.cell(row=row, column=2, value=produit.nom)
-        ws.cell(row=row, column=3, value=produit.categorie.nom if produit.categorie else '')
-        ws.cell(row=row, column=4, value=produit.prix_achat)
-        ws.cell(row=row, column=5, value=produit.prix_vente)
-        ws.cell(row=row, column=6, value=produit.stock_actuel)
-        ws.cell(row=row, column=7, value=produit.stock_min)
-        ws.cell(row=row, column=8, value=produit.fournisseur.nom if produit.fournisseur else '')
+    # === FEUILLE 2: VENTES ===
+    nb_lignes_ventes = excel.ajouter_feuille(wb, "Ventes", ENTETES_VENTES_DETAIL, lignes_ventes_detail(), progression=progression)
+    print(f"✅ {nb_lignes_ventes} lignes de ventes exportées")
     
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column_letter].width = adjusted_width
+    # === FEUILLE 3: PRODUITS ===
+    nb_produits = excel.ajouter_feuille(wb, "Produits", ENTETES_PRODUITS_COMPLET, lignes_produits_complet(),
+                                        progression=progression)
+    print(f"✅ {nb_produits} produits exportés")
     
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+    # === FEUILLE 4: STATISTIQUES ===
+    nb_ventes, ca_total = db.session.query(
+        db.func.count(Vente.id), db.func.coalesce(db.func.sum(Vente.montant_total), 0.0)
+    ).one()
+    excel.ajouter_feuille(wb, "Statistiques", ['Statistique', 'Valeur'], [
+        ['Date de génération', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+        ['Total Utilisateurs', nb_users],
+        ['Total Ventes', nb_ventes],
+        ['Total Produits', nb_produits],
+        ['Chiffre d\'affaires total', f"{ca_total:.2f} XOF"]
+    ])
+    return wb
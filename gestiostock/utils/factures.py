@@ -0,0 +1,241 @@
+"""
+Rendu PDF des factures et du rapport des ventes (reportlab)
+ - styles et mises en forme construits une fois à l'import (et une fois par processus du pool)
+ - tableaux longs découpés en blocs d'une page : reportlab ne remet pas en page un tableau géant
+ - lots de factures rendus en parallèle dans un pool de processus (ZIP) ou d'un seul tenant (PDF)
+"""
+import io
+import os
+import zipfile
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+STYLES = getSampleStyleSheet()
+STYLES.add(ParagraphStyle(name='CenterTitle', alignment=1, fontSize=18, spaceAfter=12))
+STYLES.add(ParagraphStyle(name='Right', alignment=2))
+
+STYLE_TABLE_FACTURE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige)
+])
+
+STYLE_TABLE_RAPPORT = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+ENTETES_FACTURE = ['Produit', 'Quantité', 'Prix Unitaire', 'Remise (%)', 'Montant']
+LARGEURS_FACTURE = [200, 60, 80, 60, 80]
+ENTETES_RAPPORT = ['Facture', 'Client', 'Produit', 'Quantité', 'Montant', 'Date']
+
+FORMATS_LOT = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+
+# Lignes de tableau par bloc (environ une page A4)
+LIGNES_PAR_BLOC = 35
+
+# En dessous, un lot est rendu dans le processus courant (démarrer le pool coûterait plus cher)
+SEUIL_POOL = 20
+
+NB_PROCESSUS = int(os.environ.get('FACTURES_PROCESSUS', 0)) or min(4, os.cpu_count() or 1)
+
+_pool = None
+_verrou_pool = threading.Lock()
+
+
+def _tableaux(entetes, lignes, style, largeurs=None):
+    """Tableaux d'au plus LIGNES_PAR_BLOC lignes, en-tête répété sur chacun"""
+    blocs = []
+    for debut in range(0, max(len(lignes), 1), LIGNES_PAR_BLOC):
+        table = Table([entetes] + lignes[debut:debut + LIGNES_PAR_BLOC], colWidths=largeurs, repeatRows=1)
+        table.setStyle(style)
+        blocs.append(table)
+    return blocs
+
+
+# --- Factures --------------------------------------------------------------
+
+def donnees_facture(vente):
+    """
+    Données d'une facture extraites d'une Vente (items, produits et client chargés),
+    sous forme de dict sérialisable pour le rendu dans un autre processus
+    """
+    client = vente.client
+    return {
+        'numero_facture': vente.numero_facture,
+        'client': client.nom if client else 'Client anonyme',
+        'date': vente.date_vente.strftime('%d/%m/%Y %H:%M') if vente.date_vente else '',
+        'mode_paiement': vente.mode_paiement,
+        'devise': vente.devise,
+        'notes': vente.notes,
+        'lignes': [
+            (
+                item.produit.nom if item.produit else 'Produit inconnu',
+                max(item.quantite or 0, 0),
+                max(item.prix_unitaire or 0, 0),
+                max(item.remise or 0, 0)
+            )
+            for item in vente.items
+        ]
+    }
+
+
+def elements_facture(facture):
+    """Éléments reportlab d'une facture"""
+    devise = facture['devise']
+    elements = [
+        Paragraph(f"Facture N° {facture['numero_facture']}", STYLES['CenterTitle']),
+        Paragraph(f"""
+    <b>Client :</b> {facture['client']}<br/>
+    <b>Date :</b> {facture['date']}<br/>
+    <b>Mode de paiement :</b> {facture['mode_paiement']}<br/>
+    <b>Devise :</b> {devise}
+    """, STYLES['Normal']),
+        Spacer(1, 12)
+    ]
+
+    lignes = []
+    total = 0
+    for produit_nom, quantite, prix_unitaire, remise in facture['lignes']:
+        montant_item = prix_unitaire * quantite * (1 - remise / 100)
+        total += montant_item
+        lignes.append([
+            produit_nom,
+            str(quantite),
+            f"{prix_unitaire:,.2f} {devise}",
+            f"{remise:.2f}%",
+            f"{montant_item:,.2f} {devise}"
+        ])
+
+    elements.extend(_tableaux(ENTETES_FACTURE, lignes, STYLE_TABLE_FACTURE, LARGEURS_FACTURE))
+    elements.append(Spacer(1, 12))
+    elements.append(Paragraph(f"<b>Total à payer : {total:,.2f} {devise}</b>", STYLES['Heading2']))
+
+    if facture.get('notes'):
+        elements.append(Spacer(1, 12))
+        elements.append(Paragraph(f"<b>Notes :</b> {facture['notes']}", STYLES['Normal']))
+    return elements
+
+
+def _document(buffer):
+    return SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=18)
+
+
+def rendre_facture(facture):
+    """PDF (bytes) d'une facture"""
+    buffer = io.BytesIO()
+    _document(buffer).build(elements_facture(facture))
+    return buffer.getvalue()
+
+
+def rendre_factures_pdf(factures):
+    """Un seul PDF (bytes) contenant toutes les factures, une par page (ou plus)"""
+    elements = []
+    for i, facture in enumerate(factures):
+        if i:
+            elements.append(PageBreak())
+        elements.extend(elements_facture(facture))
+    buffer = io.BytesIO()
+    _document(buffer).build(elements)
+    return buffer.getvalue()
+
+
+def _pool_processus():
+    global _pool
+    with _verrou_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=NB_PROCESSUS)
+        return _pool
+
+
+def _reinitialiser_pool():
+    global _pool
+    with _verrou_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def rendre_factures_zip(factures):
+    """
+    ZIP (fichier temporaire repositionné au début) d'un PDF par facture.
+    Au-delà de SEUIL_POOL factures, le rendu est réparti sur le pool de processus.
+    """
+    pdfs = None
+    if len(factures) >= SEUIL_POOL and NB_PROCESSUS > 1:
+        taille_lot = max(1, len(factures) // (NB_PROCESSUS * 4))
+        try:
+            pdfs = list(_pool_processus().map(rendre_facture, factures, chunksize=taille_lot))
+        except BrokenProcessPool as e:
+            print(f"⚠️ Pool de rendu indisponible, rendu séquentiel: {e}")
+            _reinitialiser_pool()
+    if pdfs is None:
+        pdfs = map(rendre_facture, factures)
+
+    sortie = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    # Les PDF sont déjà compressés : stockés tels quels
+    with zipfile.ZipFile(sortie, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for facture, pdf in zip(factures, pdfs):
+            archive.writestr(f"facture_{facture['numero_facture']}.pdf", pdf)
+    sortie.seek(0)
+    return sortie
+
+
+def rendre_lot(factures, format='pdf'):
+    """
+    Lot de factures : 'pdf' (un document, une facture par page) ou 'zip' (un PDF par facture).
+    Retourne un fichier repositionné au début. ValueError si le format est inconnu.
+    """
+    if format not in FORMATS_LOT:
+        raise ValueError(f"Format invalide: {format} (attendu : {', '.join(FORMATS_LOT)})")
+    if format == 'zip':
+        return rendre_factures_zip(factures)
+    # Sans bibliothèque de fusion PDF, le document unique est composé d'une seule passe
+    return io.BytesIO(rendre_factures_pdf(factures))
+
+
+# --- Rapport des ventes ----------------------------------------------------
+
+def rendre_rapport_ventes(ventes):
+    """
+    Rapport PDF (BytesIO) des ventes : une ligne par article vendu,
+    en tableaux d'une page. ventes : itérable de Vente (items, produits et client chargés).
+    """
+    lignes = []
+    for vente in ventes:
+        client = vente.client.nom if vente.client else 'Anonyme'
+        date = vente.date_vente.strftime('%d/%m/%Y') if vente.date_vente else ''
+        for item in vente.items or [None]:
+            lignes.append([
+                vente.numero_facture,
+                client,
+                item.produit.nom if item is not None and item.produit else '',
+                str(item.quantite) if item is not None else '',
+                f"{(item.montant_total if item is not None else vente.montant_total) or 0:,.0f} F",
+                date
+            ])
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = [Paragraph("Rapport des Ventes", STYLES['Title']), Spacer(1, 12)]
+    elements.extend(_tableaux(ENTETES_RAPPORT, lignes, STYLE_TABLE_RAPPORT))
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
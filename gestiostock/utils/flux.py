@@ -0,0 +1,75 @@
+"""
+Exports texte en flux (CSV, NDJSON) : les lignes sont sérialisées au fil de la lecture
+et envoyées par paquets, sans classeur ni fichier intermédiaire (mémoire constante)
+"""
+import io
+import csv
+import json
+from flask import Response, stream_with_context
+
+FORMATS_FLUX = ('csv', 'ndjson')
+
+MIMETYPES = {
+    'csv': 'text/csv',  # charset=utf-8 ajouté par Werkzeug (type text/*)
+    'ndjson': 'application/x-ndjson'
+}
+
+# Lignes sérialisées par paquet envoyé
+LIGNES_PAR_PAQUET = 500
+
+
+def lire_format(valeur, defaut='xlsx'):
+    """Paramètre format d'un export : 'xlsx' (défaut), 'csv' ou 'ndjson'. ValueError sinon"""
+    format = (valeur or defaut).lower()
+    if format != 'xlsx' and format not in FORMATS_FLUX:
+        raise ValueError(f"Format invalide: {valeur} (attendu : xlsx, {', '.join(FORMATS_FLUX)})")
+    return format
+
+
+def lire_separateur(valeur):
+    """Séparateur CSV : ',' (défaut), ';' ou tabulation"""
+    return valeur if valeur in (',', ';', '\t') else ','
+
+
+def flux_csv(entetes, lignes, separateur=','):
+    """Générateur CSV : ligne d'en-têtes puis une ligne par élément de lignes"""
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon, delimiter=separateur, lineterminator='\n')
+    ecrivain.writerow(entetes)
+    for i, ligne in enumerate(lignes, 1):
+        ecrivain.writerow(ligne)
+        if i % LIGNES_PAR_PAQUET == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    yield tampon.getvalue()
+
+
+def flux_ndjson(cles, lignes, **champs_fixes):
+    """Générateur NDJSON : un objet {cle: valeur} par ligne (champs_fixes ajoutés à chaque objet)"""
+    paquet = []
+    for ligne in lignes:
+        objet = dict(champs_fixes)
+        objet.update(zip(cles, ligne))
+        paquet.append(json.dumps(objet, ensure_ascii=False, default=str))
+        if len(paquet) == LIGNES_PAR_PAQUET:
+            yield '\n'.join(paquet) + '\n'
+            paquet = []
+    if paquet:
+        yield '\n'.join(paquet) + '\n'
+
+
+def generer(format, entetes, cles, lignes, separateur=','):
+    """Générateur du format demandé ('csv' : en-têtes lisibles, 'ndjson' : clés)"""
+    if format == 'csv':
+        return flux_csv(entetes, lignes, separateur=separateur)
+    return flux_ndjson(cles, lignes)
+
+
+def reponse(format, nom_base, generateur):
+    """Réponse de téléchargement diffusée au fil de la génération (contexte de requête conservé)"""
+    return Response(
+        stream_with_context(generateur),
+        mimetype=MIMETYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="{nom_base}.{format}"'}
+    )
@@ -0,0 +1,68 @@
+"""
+Identité de l'utilisateur connecté (Flask-Login), gardée en mémoire quelques secondes
+pour éviter une requête sur users à chaque requête authentifiée
+"""
+from flask_login import UserMixin
+from models import db, User
+from utils.cache import CacheLRU
+
+# user_id → IdentiteUtilisateur ; le TTL borne le délai de prise en compte dans les autres processus
+identites = CacheLRU(taille_max=1024, ttl=30)
+
+CHAMPS_IDENTITE = ('id', 'username', 'email', 'nom', 'prenom', 'role', 'telephone', 'actif', 'preferences')
+
+
+class IdentiteUtilisateur(UserMixin):
+    """Copie en lecture seule des champs d'un User, utilisée comme current_user"""
+    __slots__ = CHAMPS_IDENTITE
+
+    def __init__(self, ligne):
+        for champ in CHAMPS_IDENTITE:
+            object.__setattr__(self, champ, getattr(ligne, champ))
+
+    def __setattr__(self, champ, valeur):
+        raise AttributeError("Identité en lecture seule : modifier l'utilisateur via User")
+
+    @property
+    def is_active(self):
+        return bool(self.actif)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'nom': self.nom,
+            'prenom': self.prenom,
+            'role': self.role,
+            'telephone': self.telephone,
+            'actif': self.actif
+        }
+
+    def __repr__(self):
+        return f'<IdentiteUtilisateur {self.id} {self.username}>'
+
+
+def charger_identite(user_id):
+    """Identité de l'utilisateur actif user_id (cache, sinon une requête), ou None"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    identite = identites.get(user_id)
+    if identite is None:
+        ligne = db.session.query(*(getattr(User, champ) for champ in CHAMPS_IDENTITE))\
+            .filter(User.id == user_id).first()
+        if ligne is None:
+            return None
+        identite = IdentiteUtilisateur(ligne)
+        identites.set(user_id, identite)
+
+    # Un compte désactivé est déconnecté à sa prochaine requête
+    return identite if identite.actif else None
+
+
+def invalider_identite(*ids):
+    """À appeler après le commit de toute modification d'un utilisateur (statut, rôle, profil)"""
+    identites.invalider(*ids)
@@ -0,0 +1,232 @@
+"""
+Import en masse du catalogue produits (CSV ou XLSX)
+ - lecture en flux : csv.DictReader, ou openpyxl en lecture seule (pas de chargement complet du classeur)
+ - catégories, fournisseurs et références existantes chargés en une requête chacun
+ - validation par lots, puis écriture par INSERT ... ON CONFLICT(reference) DO UPDATE
+ - rapport d'erreurs ligne par ligne et mode simulation (dry_run) sans écriture
+"""
+import io
+import csv
+import zipfile
+import openpyxl
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy.dialects import sqlite, postgresql
+from models import db, Produit, Categorie, Fournisseur
+
+# Lignes validées puis écrites ensemble
+LOT_IMPORT = 1000
+
+# Erreurs détaillées dans le rapport (les suivantes sont seulement comptées)
+MAX_ERREURS = 500
+
+VALEURS_VRAI = ('1', 'true', 'oui', 'yes')
+
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def lire_lignes(fichier, nom_fichier):
+    """
+    Générateur de (numéro de ligne, {en-tête en minuscules: valeur}) d'un fichier uploadé.
+    ValueError si le format n'est pas CSV ou XLSX.
+    """
+    nom_fichier = (nom_fichier or '').lower()
+    if nom_fichier.endswith('.csv'):
+        return _lignes_csv(fichier)
+    if nom_fichier.endswith('.xlsx') or nom_fichier.endswith('.xls'):
+        return _lignes_xlsx(fichier)
+    raise ValueError('Format de fichier non supporté. Utilisez CSV ou XLSX.')
+
+
+def _lignes_csv(fichier):
+    # utf-8-sig : accepte les CSV enregistrés par Excel (BOM)
+    lecteur = csv.DictReader(io.TextIOWrapper(fichier, encoding='utf-8-sig', newline=''))
+    for num, ligne in enumerate(lecteur, start=2):
+        yield num, {(k or '').strip().lower(): v for k, v in ligne.items()}
+
+
+def _lignes_xlsx(fichier):
+    try:
+        wb = openpyxl.load_workbook(fichier, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError(f'Fichier Excel illisible: {e}')
+    try:
+        lignes = wb.active.iter_rows(values_only=True)
+        entetes = next(lignes, None)
+        if entetes is None:
+            raise ValueError('Fichier Excel vide')
+        entetes = [str(e).strip().lower() if e is not None else '' for e in entetes]
+        for num, valeurs in enumerate(lignes, start=2):
+            if not any(v is not None for v in valeurs):
+                continue
+            yield num, {entetes[i]: valeurs[i] for i in range(min(len(entetes), len(valeurs)))}
+    finally:
+        wb.close()
+
+
+def _texte(valeur):
+    if valeur is None:
+        return ''
+    return valeur.strip() if isinstance(valeur, str) else str(valeur)
+
+
+def _nombre(data, cles, entier=False):
+    """Valeur numérique de la première colonne renseignée parmi cles (None si absente). ValueError si invalide ou négative"""
+    cle = cles[0]
+    for c in cles:
+        brut = _texte(data.get(c))
+        if brut:
+            try:
+                valeur = float(brut.replace(',', '.'))
+            except ValueError:
+                raise ValueError(f'{cle} invalide: {brut}')
+            if valeur < 0:
+                raise ValueError(f'{cle} négatif: {brut}')
+            return int(valeur) if entier else valeur
+    return None
+
+
+class ImportProduits:
+    """
+    Import d'un fichier de produits : accumule les lignes validées par lots et les écrit
+    (sauf en simulation). created / updated / errors décrivent le résultat.
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.nb_erreurs = 0
+        self.lignes = 0
+        self._lot = {}
+        # Trois requêtes pour tout l'import
+        self.categories = dict(db.session.query(Categorie.nom, Categorie.id).all())
+        self.fournisseurs = dict(db.session.query(Fournisseur.nom, Fournisseur.id).all())
+        self.references = {r for (r,) in db.session.query(Produit.reference).all()}
+        dialecte = db.engine.dialect.name
+        if dialecte not in _INSERTS and not dry_run:
+            raise ValueError(f"Import en masse non supporté pour la base {dialecte}")
+        self._insert = _INSERTS.get(dialecte)
+
+    def erreur(self, num, message, reference=None):
+        self.nb_erreurs += 1
+        if len(self.errors) < MAX_ERREURS:
+            self.errors.append({'row': num, 'reference': reference, 'error': message})
+
+    def valider(self, data):
+        """
+        (valeurs à insérer, colonnes à mettre à jour) d'une ligne : à la création tous les champs
+        (valeurs par défaut comprises), à la mise à jour seulement les champs renseignés.
+        ValueError si la ligne est invalide.
+        """
+        reference = _texte(data.get('reference') or data.get('ref'))
+        nom = _texte(data.get('nom') or data.get('name'))
+        if not reference or not nom:
+            raise ValueError('reference ou nom manquant')
+        if len(reference) > 50:
+            raise ValueError('reference trop longue (50 caractères max)')
+        if len(nom) > 200:
+            raise ValueError('nom trop long (200 caractères max)')
+
+        valeurs = {'reference': reference, 'nom': nom}
+        prix_achat = _nombre(data, ('prix_achat', 'cost'))
+        prix_vente = _nombre(data, ('prix_vente', 'price'))
+        # Un prix à 0 ne remplace pas le prix existant
+        if prix_achat:
+            valeurs['prix_achat'] = prix_achat
+        if prix_vente:
+            valeurs['prix_vente'] = prix_vente
+        # Un 0 explicite est appliqué (inventaire à zéro, produit exonéré de TVA)
+        for cle, entier in (('tva', False), ('stock_actuel', True), ('stock_min', True)):
+            valeur = _nombre(data, (cle,), entier)
+            if valeur is not None:
+                valeurs[cle] = valeur
+
+        if 'description' in data and data['description'] is not None:
+            valeurs['description'] = _texte(data['description'])
+        for cle in ('unite_mesure', 'emplacement'):
+            if _texte(data.get(cle)):
+                valeurs[cle] = _texte(data.get(cle))
+        if _texte(data.get('actif')):
+            valeurs['actif'] = _texte(data.get('actif')).lower() in VALEURS_VRAI
+
+        # Catégorie ou fournisseur inconnus : ignorés, comme à la saisie manuelle
+        categorie_id = self.categories.get(_texte(data.get('categorie')))
+        if categorie_id:
+            valeurs['categorie_id'] = categorie_id
+        fournisseur_id = self.fournisseurs.get(_texte(data.get('fournisseur')))
+        if fournisseur_id:
+            valeurs['fournisseur_id'] = fournisseur_id
+
+        maj = tuple(sorted(c for c in valeurs if c != 'reference'))
+        # La base vérifie les NOT NULL de la ligne insérée avant de détecter le conflit
+        valeurs.setdefault('prix_achat', 0.0)
+        valeurs.setdefault('prix_vente', 0.0)
+        if reference not in self.references:
+            valeurs.setdefault('tva', 0.0)
+            valeurs.setdefault('stock_actuel', 0)
+            valeurs.setdefault('stock_min', 0)
+            valeurs.setdefault('actif', True)
+            if not valeurs.get('description'):
+                valeurs['description'] = None
+            maj = tuple(sorted(c for c in valeurs if c != 'reference'))
+        return valeurs, maj
+
+    def ajouter(self, num, data):
+        self.lignes += 1
+        try:
+            valeurs, maj = self.valider(data)
+        except ValueError as e:
+            self.erreur(num, str(e), _texte(data.get('reference') or data.get('ref')) or None)
+            return
+        reference = valeurs['reference']
+        # Une référence répétée dans le même lot : écrire le lot d'abord (une ligne par conflit)
+        if reference in self._lot:
+            self.ecrire()
+        self._lot[reference] = (valeurs, maj)
+        if reference in self.references:
+            self.updated += 1
+        else:
+            self.created += 1
+            self.references.add(reference)
+        if len(self._lot) >= LOT_IMPORT:
+            self.ecrire()
+
+    def ecrire(self):
+        """Écrit le lot courant : un INSERT ... ON CONFLICT par jeu de colonnes renseignées"""
+        lot, self._lot = list(self._lot.values()), {}
+        if self.dry_run or not lot:
+            return
+        groupes = {}
+        for valeurs, maj in lot:
+            groupes.setdefault((tuple(sorted(valeurs)), maj), []).append(valeurs)
+        for (_, maj), lignes in groupes.items():
+            stmt = self._insert(Produit.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['reference'],
+                set_={c: stmt.excluded[c] for c in maj}
+            )
+            db.session.execute(stmt, lignes)
+
+    def importer(self, lignes):
+        for num, data in lignes:
+            self.ajouter(num, data)
+        self.ecrire()
+        return self
+
+    def rapport(self):
+        message = f'Import terminé. Créés: {self.created}, Mis à jour: {self.updated}'
+        if self.dry_run:
+            message = f'Simulation : {self.created} à créer, {self.updated} à mettre à jour'
+        if self.nb_erreurs:
+            message += f', Erreurs: {self.nb_erreurs}'
+        return {
+            'success': True,
+            'dry_run': self.dry_run,
+            'lignes': self.lignes,
+            'created': self.created,
+            'updated': self.updated,
+            'errors': self.errors,
+            'nb_erreurs': self.nb_erreurs,
+            'message': message
+        }
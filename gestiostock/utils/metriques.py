@@ -0,0 +1,398 @@
+"""
+Métriques au format texte Prometheus, exposées sur /metrics :
+ - histogrammes de latence HTTP et nombre de requêtes par endpoint / blueprint
+ - état du pool de connexions de la base (additionné sur tous les workers)
+ - compteurs métier comptés à la validation de la transaction (rien en cas de rollback) :
+   ventes, montants vendus, encaissements / décaissements, mouvements de stock, exports générés
+Chaque processus accumule ses incréments en mémoire et les reporte périodiquement dans un
+fichier SQLite partagé (à côté de la base, ou METRIQUES_FICHIER) : /metrics renvoie le total
+de tous les workers gunicorn. Désactivable par METRIQUES=0.
+"""
+import os
+import hmac
+import time
+import atexit
+import sqlite3
+import threading
+from flask import g, request
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from models import db, Vente, MouvementStock, MouvementCaisse, ExportJob
+
+ACTIF = os.environ.get('METRIQUES', '1').lower() not in ('0', 'false', 'non')
+
+# Fichier partagé par les processus (défaut : dossier de la base SQLite, sinon instance/)
+FICHIER = os.environ.get('METRIQUES_FICHIER')
+
+# Si défini, /metrics exige l'en-tête Authorization: Bearer <jeton> (sinon : admin connecté)
+JETON = os.environ.get('METRIQUES_JETON')
+
+# Appels depuis la machine acceptés sans jeton (Prometheus local, sans proxy inverse devant l'application)
+ACCES_LOCAL = os.environ.get('METRIQUES_LOCAL', '').lower() in ('1', 'true', 'oui')
+
+# Intervalle de report des incréments de chaque processus (secondes)
+INTERVALLE = float(os.environ.get('METRIQUES_INTERVALLE', 5))
+
+# Jauges d'un processus sans report depuis ce délai ignorées (worker arrêté)
+EXPIRATION_JAUGES = max(30.0, 6 * INTERVALLE)
+
+# Bornes des histogrammes de latence (secondes)
+BORNES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+DEFINITIONS = {
+    'gestiostock_http_requetes_total': ('counter', 'Requêtes HTTP traitées'),
+    'gestiostock_http_duree_secondes': ('histogram', 'Durée de traitement des requêtes HTTP (secondes)'),
+    'gestiostock_ventes_total': ('counter', 'Ventes enregistrées'),
+    'gestiostock_ventes_montant_total': ('counter', 'Montant des ventes enregistrées'),
+    'gestiostock_caisse_montant_total': ('counter', 'Montants encaissés et décaissés'),
+    'gestiostock_mouvements_stock_total': ('counter', 'Mouvements de stock'),
+    'gestiostock_mouvements_stock_quantite_total': ('counter', 'Quantités des mouvements de stock'),
+    'gestiostock_exports_total': ('counter', 'Exports générés (tâches terminées, téléchargements directs)'),
+    'gestiostock_db_pool_taille': ('gauge', 'Taille configurée du pool de connexions, tous workers'),
+    'gestiostock_db_pool_connexions': ('gauge', 'Connexions du pool par état, tous workers'),
+    'gestiostock_db_pool_debordement': ('gauge', 'Connexions ouvertes au-delà de la taille du pool, tous workers'),
+    'gestiostock_processus': ('gauge', 'Processus servant l\'application'),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS compteurs (
+    nom TEXT NOT NULL, etiquettes TEXT NOT NULL, borne TEXT NOT NULL, valeur REAL NOT NULL,
+    PRIMARY KEY (nom, etiquettes, borne)
+);
+CREATE TABLE IF NOT EXISTS jauges (
+    nom TEXT NOT NULL, etiquettes TEXT NOT NULL, pid INTEGER NOT NULL, valeur REAL NOT NULL, maj REAL NOT NULL,
+    PRIMARY KEY (nom, etiquettes, pid)
+);
+"""
+
+# (nom, étiquettes, borne d'histogramme) -> incrément pas encore reporté
+_deltas = {}
+_verrou = threading.Lock()
+_verrou_base = threading.Lock()
+_connexion = None
+_moteur = None
+_pid_report = None
+
+
+def _reinitialiser_enfant():
+    # Processus créé par fork (worker gunicorn) : les incréments en attente restent au parent
+    global _verrou, _verrou_base, _connexion, _pid_report
+    _deltas.clear()
+    _verrou = threading.Lock()
+    _verrou_base = threading.Lock()
+    _connexion = None
+    _pid_report = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinitialiser_enfant)
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquettes(valeurs):
+    return ','.join(f'{cle}="{_echapper(v)}"' for cle, v in sorted(valeurs.items()))
+
+
+def ajouter(nom, valeur=1, **etiquettes):
+    """Incrémente un compteur (report différé vers le fichier partagé)"""
+    if not ACTIF:
+        return
+    cle = (nom, _etiquettes(etiquettes), '')
+    with _verrou:
+        _deltas[cle] = _deltas.get(cle, 0) + valeur
+    _demarrer_report()
+
+
+def observer(nom, valeur, **etiquettes):
+    """Observation d'un histogramme : seau non cumulé (cumulé à la lecture), somme et nombre"""
+    if not ACTIF:
+        return
+    borne = next((f'{b:g}' for b in BORNES if valeur <= b), '+Inf')
+    e = _etiquettes(etiquettes)
+    with _verrou:
+        for cle, v in (((nom + '_bucket', e, borne), 1), ((nom + '_sum', e, ''), valeur), ((nom + '_count', e, ''), 1)):
+            _deltas[cle] = _deltas.get(cle, 0) + v
+    _demarrer_report()
+
+
+# --- Fichier partagé ------------------------------------------------------------
+
+def _base():
+    global _connexion
+    if _connexion is None:
+        os.makedirs(os.path.dirname(os.path.abspath(FICHIER)), exist_ok=True)
+        connexion = sqlite3.connect(FICHIER, timeout=10, isolation_level=None, check_same_thread=False)
+        connexion.execute('PRAGMA journal_mode=WAL')
+        connexion.execute('PRAGMA synchronous=NORMAL')
+        connexion.executescript(_SCHEMA)
+        _connexion = connexion
+    return _connexion
+
+
+def _jauges():
+    """État du pool de connexions de ce processus"""
+    mesures = [('gestiostock_processus', '', 1)]
+    pool = _moteur.pool if _moteur is not None else None
+    if pool is None:
+        return mesures
+    for nom, etiquettes, methode in (('gestiostock_db_pool_taille', '', 'size'),
+                                     ('gestiostock_db_pool_connexions', 'etat="utilisees"', 'checkedout'),
+                                     ('gestiostock_db_pool_connexions', 'etat="disponibles"', 'checkedin'),
+                                     ('gestiostock_db_pool_debordement', '', 'overflow')):
+        mesure = getattr(pool, methode, None)
+        if callable(mesure):
+            mesures.append((nom, etiquettes, max(mesure(), 0)))
+    return mesures
+
+
+def reporter():
+    """Reporte les incréments et les jauges de ce processus dans le fichier partagé"""
+    if not ACTIF or FICHIER is None:
+        return
+    with _verrou:
+        deltas = dict(_deltas)
+        _deltas.clear()
+    pid = os.getpid()
+    maintenant = time.time()
+    try:
+        with _verrou_base:
+            base = _base()
+            base.execute('BEGIN IMMEDIATE')
+            try:
+                base.executemany(
+                    'INSERT INTO compteurs (nom, etiquettes, borne, valeur) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (nom, etiquettes, borne) DO UPDATE SET valeur = valeur + excluded.valeur',
+                    [(nom, etiquettes, borne, valeur) for (nom, etiquettes, borne), valeur in deltas.items()]
+                )
+                base.execute('DELETE FROM jauges WHERE pid = ?', (pid,))
+                base.executemany('INSERT INTO jauges (nom, etiquettes, pid, valeur, maj) VALUES (?, ?, ?, ?, ?)',
+                                 [(nom, etiquettes, pid, valeur, maintenant) for nom, etiquettes, valeur in _jauges()])
+                base.execute('COMMIT')
+            except Exception:
+                if base.in_transaction:
+                    base.execute('ROLLBACK')
+                raise
+    except Exception as e:
+        # Incréments conservés pour le prochain report
+        with _verrou:
+            for cle, valeur in deltas.items():
+                _deltas[cle] = _deltas.get(cle, 0) + valeur
+        print(f"❌ Erreur report des métriques: {e}")
+
+
+def _boucle_report(pid):
+    while os.getpid() == pid:
+        time.sleep(INTERVALLE)
+        reporter()
+
+
+def _demarrer_report():
+    """Thread de report propre à chaque processus (les threads ne survivent pas au fork)"""
+    global _pid_report
+    pid = os.getpid()
+    if _pid_report == pid or FICHIER is None:
+        return
+    _pid_report = pid
+    threading.Thread(target=_boucle_report, args=(pid,), daemon=True, name='metriques').start()
+
+
+@atexit.register
+def _a_la_sortie():
+    # Worker recyclé ou arrêté : derniers incréments reportés, jauges retirées
+    if _pid_report != os.getpid():
+        return
+    reporter()
+    try:
+        with _verrou_base:
+            _base().execute('DELETE FROM jauges WHERE pid = ?', (os.getpid(),))
+    except Exception:
+        pass
+
+
+# --- Exposition -----------------------------------------------------------------
+
+def _nombre(valeur):
+    return str(int(valeur)) if float(valeur).is_integer() else repr(float(valeur))
+
+
+def _ligne(nom, etiquettes, valeur):
+    return f'{nom}{{{etiquettes}}} {_nombre(valeur)}' if etiquettes else f'{nom} {_nombre(valeur)}'
+
+
+def _histogramme(famille, series):
+    seaux, sommes, nombres = {}, {}, {}
+    for nom, etiquettes, borne, valeur in series:
+        if nom.endswith('_bucket'):
+            seaux.setdefault(etiquettes, {})[borne] = valeur
+        elif nom.endswith('_sum'):
+            sommes[etiquettes] = valeur
+        else:
+            nombres[etiquettes] = valeur
+    lignes = []
+    for etiquettes in sorted(nombres):
+        cumul = 0
+        prefixe = etiquettes + ',' if etiquettes else ''
+        for borne in [f'{b:g}' for b in BORNES] + ['+Inf']:
+            cumul += seaux.get(etiquettes, {}).get(borne, 0)
+            lignes.append(_ligne(famille + '_bucket', f'{prefixe}le="{borne}"', cumul))
+        lignes.append(_ligne(famille + '_sum', etiquettes, sommes.get(etiquettes, 0)))
+        lignes.append(_ligne(famille + '_count', etiquettes, nombres[etiquettes]))
+    return lignes
+
+
+def exposer():
+    """Texte Prometheus de toutes les métriques, tous processus confondus"""
+    reporter()
+    with _verrou_base:
+        base = _base()
+        series = base.execute('SELECT nom, etiquettes, borne, valeur FROM compteurs ORDER BY nom, etiquettes').fetchall()
+        base.execute('DELETE FROM jauges WHERE maj < ?', (time.time() - EXPIRATION_JAUGES,))
+        series += [(nom, etiquettes, '', valeur) for nom, etiquettes, valeur in base.execute(
+            'SELECT nom, etiquettes, SUM(valeur) FROM jauges GROUP BY nom, etiquettes ORDER BY nom, etiquettes')]
+
+    familles = {}
+    for serie in series:
+        famille = serie[0]
+        for suffixe in ('_bucket', '_sum', '_count'):
+            if famille.endswith(suffixe) and DEFINITIONS.get(famille[:-len(suffixe)], ('',))[0] == 'histogram':
+                famille = famille[:-len(suffixe)]
+        familles.setdefault(famille, []).append(serie)
+
+    lignes = []
+    for famille in sorted(familles):
+        type, aide = DEFINITIONS.get(famille, ('untyped', ''))
+        lignes.append(f'# HELP {famille} {aide}')
+        lignes.append(f'# TYPE {famille} {type}')
+        if type == 'histogram':
+            lignes.extend(_histogramme(famille, familles[famille]))
+        else:
+            lignes.extend(_ligne(nom, etiquettes, valeur) for nom, etiquettes, _, valeur in familles[famille])
+    return '\n'.join(lignes) + '\n'
+
+
+def acces_autorise():
+    """
+    Jeton METRIQUES_JETON si défini, sinon admin connecté. Derrière un proxy inverse local, toutes
+    les requêtes arrivent de 127.0.0.1 : l'accès local n'est donc ouvert que sur METRIQUES_LOCAL=1.
+    """
+    if JETON:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {JETON}')
+    if ACCES_LOCAL and request.remote_addr in ('127.0.0.1', '::1'):
+        return True
+    return current_user.is_authenticated and current_user.role == 'admin'
+
+
+# --- Compteurs métier (événements de session) -------------------------------------
+
+def _niveau(session):
+    """Transaction qui porte les entrées : savepoint le plus interne, sinon transaction principale"""
+    return session.get_nested_transaction() or session.get_transaction()
+
+
+def _en_attente(session):
+    return session.info.setdefault('metriques', {}).setdefault(_niveau(session), [])
+
+
+def _mouvement_stock(attente, type_mouvement, quantite):
+    attente.append(('gestiostock_mouvements_stock_total', 1, {'type': type_mouvement or ''}))
+    attente.append(('gestiostock_mouvements_stock_quantite_total', abs(quantite or 0), {'type': type_mouvement or ''}))
+
+
+def _apres_flush(session, _contexte):
+    attente = _en_attente(session)
+    for objet in session.new:
+        if isinstance(objet, Vente):
+            attente.append(('gestiostock_ventes_total', 1, {'mode_paiement': objet.mode_paiement or ''}))
+            attente.append(('gestiostock_ventes_montant_total', objet.montant_total or 0, {'devise': objet.devise or ''}))
+        elif isinstance(objet, MouvementCaisse):
+            attente.append(('gestiostock_caisse_montant_total', objet.montant or 0, {'type': objet.type}))
+        elif isinstance(objet, MouvementStock):
+            _mouvement_stock(attente, objet.type_mouvement, objet.quantite)
+    for objet in session.dirty:
+        if isinstance(objet, ExportJob) and 'termine' in inspect(objet).attrs.statut.history.added:
+            attente.append(('gestiostock_exports_total', 1, {'type': objet.type, 'mode': 'tache'}))
+
+
+def _execution_orm(etat):
+    # Mouvements de stock insérés en masse (db.insert(MouvementStock), [...]) : hors unité de travail
+    if etat.is_insert and (getattr(etat.statement, 'entity_description', None) or {}).get('entity') is MouvementStock:
+        parametres = etat.parameters
+        lignes = parametres if isinstance(parametres, (list, tuple)) else [parametres or {}]
+        attente = _en_attente(etat.session)
+        for ligne in lignes:
+            _mouvement_stock(attente, ligne.get('type_mouvement'), ligne.get('quantite'))
+
+
+def _apres_commit(session):
+    # Appelé aussi à la libération d'un savepoint : le niveau est seulement marqué validé
+    session.info.setdefault('metriques_valides', set()).add(_niveau(session))
+
+
+def _fin_transaction(session, transaction):
+    """
+    Fin d'une transaction ou d'un savepoint : entrées comptées au commit de la transaction principale,
+    rattachées au niveau englobant à la libération d'un savepoint, abandonnées en cas de rollback
+    """
+    valides = session.info.get('metriques_valides')
+    valide = valides is not None and transaction in valides
+    if valide:
+        valides.discard(transaction)
+    entrees = session.info.get('metriques', {}).pop(transaction, None)
+    if not entrees or not valide:
+        return
+    if transaction.parent is None:
+        for nom, valeur, etiquettes in entrees:
+            ajouter(nom, valeur, **etiquettes)
+        return
+    englobant = transaction.parent
+    while englobant.parent is not None and not englobant.nested:
+        englobant = englobant.parent
+    session.info['metriques'].setdefault(englobant, []).extend(entrees)
+
+
+# --- Requêtes HTTP ----------------------------------------------------------------
+
+def _debut_requete():
+    g._metriques_debut = time.perf_counter()
+
+
+def _fin_requete(reponse):
+    debut = g.get('_metriques_debut')
+    if debut is None or request.endpoint == 'static':
+        return reponse
+    etiquettes = {'endpoint': request.endpoint or 'inconnu', 'blueprint': request.blueprint or 'app',
+                  'methode': request.method}
+    observer('gestiostock_http_duree_secondes', time.perf_counter() - debut, **etiquettes)
+    ajouter('gestiostock_http_requetes_total', statut=reponse.status_code, **etiquettes)
+    # Export téléchargé directement (fichier en pièce jointe), hors fichiers des tâches d'export déjà comptées
+    if reponse.status_code == 200 and request.blueprint != 'exports' \
+            and reponse.headers.get('Content-Disposition', '').startswith('attachment'):
+        ajouter('gestiostock_exports_total', type=request.endpoint, mode='direct')
+    return reponse
+
+
+def _fichier_defaut(app):
+    url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        return os.path.join(os.path.dirname(os.path.abspath(url.database)), 'metriques.db')
+    return os.path.join(app.instance_path, 'metriques.db')
+
+
+def installer_metriques(app):
+    """Branche les hooks Flask et de session SQLAlchemy. À appeler dans create_app"""
+    global FICHIER, _moteur
+    if not ACTIF:
+        return
+    with app.app_context():
+        _moteur = db.engine
+        FICHIER = FICHIER or _fichier_defaut(app)
+    if not event.contains(db.session, 'after_transaction_end', _fin_transaction):
+        event.listen(db.session, 'after_flush', _apres_flush)
+        event.listen(db.session, 'do_orm_execute', _execution_orm)
+        event.listen(db.session, 'after_commit', _apres_commit)
+        event.listen(db.session, 'after_transaction_end', _fin_transaction)
+    app.before_request(_debut_requete)
+    app.after_request(_fin_requete)
@@ -0,0 +1,57 @@
+"""
+Migrations légères du schéma pour les bases existantes
+(db.create_all() crée les tables manquantes mais n'ajoute ni colonnes ni index aux tables existantes)
+"""
+from sqlalchemy import inspect, text
+from models import db
+from utils.recherche import installer_index_recherche
+
+# Colonnes ajoutées après la création initiale : (table, colonne, type SQL)
+COLONNES_AJOUTEES = [
+    ('vente_items', 'cout_unitaire', 'FLOAT'),
+]
+
+
+def ajouter_colonnes_manquantes():
+    """Ajoute par ALTER TABLE les colonnes déclarées dans COLONNES_AJOUTEES"""
+    inspecteur = inspect(db.engine)
+    tables = set(inspecteur.get_table_names())
+    ajoutees = []
+
+    for table, colonne, type_sql in COLONNES_AJOUTEES:
+        if table not in tables:
+            continue
+        existantes = {c['name'] for c in inspecteur.get_columns(table)}
+        if colonne not in existantes:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {colonne} {type_sql}'))
+            ajoutees.append(f'{table}.{colonne}')
+
+    db.session.commit()
+    return ajoutees
+
+
+def creer_index_manquants():
+    """Crée les index déclarés dans les modèles (__table_args__) absents de la base"""
+    inspecteur = inspect(db.engine)
+    tables = set(inspecteur.get_table_names())
+    crees = []
+
+    with db.engine.begin() as connexion:
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existants = {i['name'] for i in inspecteur.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existants:
+                    index.create(connexion, checkfirst=True)
+                    crees.append(index.name)
+    return crees
+
+
+def appliquer_migrations():
+    """Applique toutes les migrations (idempotent)"""
+    return {
+        'colonnes': ajouter_colonnes_manquantes(),
+        'index': creer_index_manquants(),
+        'recherche': installer_index_recherche()
+    }
@@ -0,0 +1,39 @@
+"""
+Configuration du moteur de base de données : PRAGMA SQLite appliqués à chaque nouvelle connexion
+(WAL, synchronous, busy_timeout, cache, mmap) par un hook 'connect' de SQLAlchemy
+"""
+from sqlalchemy import event
+from models import db
+
+
+def appliquer_pragmas(engine, pragmas):
+    """Enregistre le hook qui exécute les PRAGMA sur chaque connexion ouverte par le pool"""
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(connexion_dbapi, _enregistrement):
+        curseur = connexion_dbapi.cursor()
+        try:
+            for nom, valeur in pragmas.items():
+                curseur.execute(f'PRAGMA {nom}={valeur}')
+        finally:
+            curseur.close()
+
+    return _pragmas
+
+
+def configurer_moteur(app):
+    """À appeler après db.init_app, avant toute connexion"""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite' and pragmas:
+            appliquer_pragmas(db.engine, pragmas)
+
+
+def etat_moteur():
+    """Réglages effectifs de la connexion courante (diagnostic)"""
+    engine = db.engine
+    etat = {'dialecte': engine.dialect.name, 'pool': engine.pool.status()}
+    if engine.dialect.name == 'sqlite':
+        for nom in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+            etat[nom] = db.session.execute(db.text(f'PRAGMA {nom}')).scalar()
+    return etat
@@ -0,0 +1,58 @@
+"""
+Pagination par curseur (keyset) : la page suivante reprend après la dernière clé lue,
+sans OFFSET, donc à coût constant quelle que soit la profondeur
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+LIMITE_DEFAUT = 100
+LIMITE_MAX = 1000
+
+
+def lire_limite(valeur, defaut=LIMITE_DEFAUT, maximum=LIMITE_MAX):
+    """Paramètre limit borné entre 1 et maximum (None : sans plafond). ValueError si non numérique"""
+    if valeur in (None, ''):
+        return defaut
+    limite = max(1, int(valeur))
+    return min(limite, maximum) if maximum else limite
+
+
+def encoder_curseur(*valeurs):
+    """Curseur opaque (base64 url-safe) à partir des valeurs de clé de la dernière ligne"""
+    brut = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in valeurs])
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur, *types):
+    """Décode un curseur ; types convertit chaque valeur (ex. datetime, int). ValueError si invalide"""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4)).decode()
+        valeurs = json.loads(brut)
+    except Exception:
+        raise ValueError('Curseur invalide')
+    if not isinstance(valeurs, list) or len(valeurs) != len(types):
+        raise ValueError('Curseur invalide')
+    try:
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(valeurs, types)]
+    except (TypeError, ValueError):
+        # Valeurs de type inattendu (null, objet...) : même erreur qu'un curseur mal formé
+        raise ValueError('Curseur invalide')
+
+
+def apres_curseur(query, colonnes, valeurs, descendant=True):
+    """Filtre keyset : lignes strictement après (colonnes) = (valeurs) dans l'ordre de tri"""
+    cle = tuple_(*colonnes)
+    return query.filter(cle < tuple_(*valeurs) if descendant else cle > tuple_(*valeurs))
+
+
+def page_suivante(lignes, limite, cle):
+    """
+    Découpe une lecture de limite + 1 lignes : retourne (lignes de la page, curseur suivant ou None).
+    cle(ligne) donne le tuple de valeurs de tri de la ligne.
+    """
+    if len(lignes) <= limite:
+        return lignes, None
+    lignes = lignes[:limite]
+    return lignes, encoder_curseur(*cle(lignes[-1]))
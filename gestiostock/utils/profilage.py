@@ -0,0 +1,163 @@
+"""
+Profilage des requêtes HTTP (local au processus) :
+ - nombre de requêtes SQL, temps passé en base et temps total de chaque requête HTTP
+ - en-tête Server-Timing (visible dans l'onglet Réseau du navigateur)
+ - statistiques cumulées par endpoint, consultables sur /api/system/perf
+ - requêtes SQL lentes journalisées avec la ligne de code qui les a émises
+Désactivable par PROFILAGE=0.
+"""
+import os
+import sys
+import time
+import threading
+from collections import deque
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from models import db
+
+ACTIF = os.environ.get('PROFILAGE', '1').lower() not in ('0', 'false', 'non')
+
+# Requête SQL journalisée au-delà de ce seuil (millisecondes)
+SEUIL_LENT_MS = float(os.environ.get('PROFILAGE_SEUIL_MS', 200))
+
+# Au-delà de ce nombre de requêtes SQL pour une requête HTTP : N+1 probable, signalé
+SEUIL_NB_REQUETES = int(os.environ.get('PROFILAGE_SEUIL_REQUETES', 50))
+
+# Dernières requêtes lentes conservées pour /api/system/perf
+requetes_lentes = deque(maxlen=100)
+
+_stats = {}
+_verrou = threading.Lock()
+_DEBUT = time.time()
+
+_RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CE_FICHIER = os.path.abspath(__file__)
+
+
+def _site_appel():
+    """Première ligne de code de l'application (hors SQLAlchemy et ce module) dans la pile d'appel"""
+    cadre = sys._getframe(2)
+    while cadre is not None:
+        fichier = os.path.abspath(cadre.f_code.co_filename)
+        if fichier.startswith(_RACINE) and fichier != _CE_FICHIER:
+            return f"{os.path.relpath(fichier, _RACINE)}:{cadre.f_lineno} ({cadre.f_code.co_name})"
+        cadre = cadre.f_back
+    return '?'
+
+
+def _avant_execution(conn, curseur, instruction, parametres, contexte, executemany):
+    if contexte is not None:
+        contexte._profil_debut = time.perf_counter()
+
+
+def _apres_execution(conn, curseur, instruction, parametres, contexte, executemany):
+    debut = getattr(contexte, '_profil_debut', None)
+    if debut is None:
+        return
+    duree = time.perf_counter() - debut
+    endpoint = None
+    if has_request_context():
+        g._profil_nb_requetes = g.get('_profil_nb_requetes', 0) + 1
+        g._profil_duree_db = g.get('_profil_duree_db', 0.0) + duree
+        endpoint = request.endpoint
+    if duree * 1000 >= SEUIL_LENT_MS:
+        site = _site_appel()
+        sql = ' '.join(instruction.split())[:300]
+        requetes_lentes.append({
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duree_ms': round(duree * 1000, 1),
+            'endpoint': endpoint,
+            'site': site,
+            'sql': sql
+        })
+        print(f"⚠️ Requête lente ({duree * 1000:.0f} ms) {site} [{endpoint or 'hors requête'}] : {sql[:160]}")
+
+
+def _debut_requete():
+    g._profil_debut = time.perf_counter()
+
+
+def _fin_requete(reponse):
+    debut = g.get('_profil_debut')
+    if debut is None:
+        return reponse
+    total = time.perf_counter() - debut
+    nb = g.get('_profil_nb_requetes', 0)
+    duree_db = g.get('_profil_duree_db', 0.0)
+    reponse.headers['Server-Timing'] = (
+        f'db;dur={duree_db * 1000:.1f};desc="{nb} SQL", '
+        f'app;dur={(total - duree_db) * 1000:.1f}, total;dur={total * 1000:.1f}'
+    )
+    endpoint = request.endpoint
+    if endpoint and endpoint != 'static':
+        enregistrer(endpoint, total, duree_db, nb)
+        if nb >= SEUIL_NB_REQUETES:
+            print(f"⚠️ {nb} requêtes SQL pour {request.method} {request.path} ({endpoint}) : N+1 probable")
+    return reponse
+
+
+def enregistrer(endpoint, total, duree_db, nb_requetes):
+    with _verrou:
+        s = _stats.get(endpoint)
+        if s is None:
+            s = _stats[endpoint] = {'appels': 0, 'total': 0.0, 'total_max': 0.0, 'db': 0.0,
+                                    'requetes': 0, 'requetes_max': 0}
+        s['appels'] += 1
+        s['total'] += total
+        s['total_max'] = max(s['total_max'], total)
+        s['db'] += duree_db
+        s['requetes'] += nb_requetes
+        s['requetes_max'] = max(s['requetes_max'], nb_requetes)
+
+
+def statistiques(tri='total'):
+    """Statistiques par endpoint (moyennes et maxima en ms), triées par temps cumulé décroissant"""
+    with _verrou:
+        copie = {e: dict(s) for e, s in _stats.items()}
+    resultat = []
+    for endpoint, s in copie.items():
+        appels = s['appels']
+        resultat.append({
+            'endpoint': endpoint,
+            'appels': appels,
+            'total_ms': round(s['total'] * 1000, 1),
+            'moyenne_ms': round(s['total'] / appels * 1000, 1),
+            'max_ms': round(s['total_max'] * 1000, 1),
+            'db_moyenne_ms': round(s['db'] / appels * 1000, 1),
+            'part_db': round(s['db'] / s['total'], 3) if s['total'] else 0,
+            'requetes_moyenne': round(s['requetes'] / appels, 1),
+            'requetes_max': s['requetes_max'],
+        })
+    cles = {'total': 'total_ms', 'moyenne': 'moyenne_ms', 'requetes': 'requetes_moyenne', 'appels': 'appels'}
+    resultat.sort(key=lambda e: e[cles.get(tri, 'total_ms')], reverse=True)
+    return resultat
+
+
+def reinitialiser():
+    global _DEBUT
+    with _verrou:
+        _stats.clear()
+        _DEBUT = time.time()
+    requetes_lentes.clear()
+
+
+def rapport(tri='total'):
+    return {
+        'actif': ACTIF,
+        'pid': os.getpid(),
+        'depuis': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(_DEBUT)),
+        'seuil_lent_ms': SEUIL_LENT_MS,
+        'endpoints': statistiques(tri),
+        'requetes_lentes': list(requetes_lentes)[::-1],
+    }
+
+
+def installer_profilage(app):
+    """Branche les hooks SQLAlchemy (moteur de l'application) et Flask. À appeler dans create_app"""
+    if not ACTIF:
+        return
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _avant_execution)
+        event.listen(db.engine, 'after_cursor_execute', _apres_execution)
+    app.before_request(_debut_requete)
+    app.after_request(_fin_requete)
@@ -0,0 +1,80 @@
+"""
+Rapports analytiques calculés côté SQL
+"""
+from sqlalchemy import func, case
+from models import db, Vente, VenteItem, Produit
+
+
+def calculer_rentabilite(date_debut=None, date_fin=None, categorie_id=None, top=5):
+    """
+    Rentabilité des ventes confirmées en une seule requête agrégée, sans charger aucun objet Vente.
+    Les lignes sont agrégées sur vente_items ⨝ ventes (index couvrant idx_vente_item_marge) avec le
+    coût figé à la vente ; hors filtre de catégorie, produits n'est joint qu'au résultat groupé
+    (nom, et prix d'achat actuel pour les lignes historiques sans coût figé).
+    date_debut / date_fin: datetimes optionnels (fin exclue), categorie_id: filtre optionnel.
+    """
+    montant = VenteItem.prix_unitaire * VenteItem.quantite * (1 - func.coalesce(VenteItem.remise, 0) / 100)
+    sans_cout = VenteItem.cout_unitaire.is_(None)
+
+    par_produit = db.session.query(
+        VenteItem.produit_id.label('produit_id'),
+        func.sum(VenteItem.quantite).label('quantite'),
+        func.sum(montant).label('ca'),
+        func.coalesce(func.sum(VenteItem.quantite * VenteItem.cout_unitaire), 0).label('cout_fige'),
+        func.sum(case((sans_cout, VenteItem.quantite), else_=0)).label('quantite_sans_cout')
+    ).join(Vente, Vente.id == VenteItem.vente_id)\
+     .filter(Vente.statut == 'confirmée')
+
+    if date_debut:
+        par_produit = par_produit.filter(Vente.date_vente >= date_debut)
+    if date_fin:
+        par_produit = par_produit.filter(Vente.date_vente < date_fin)
+    if categorie_id:
+        # Jointure par clé primaire : un IN (...) ferait sonder l'index couvrant pour chaque produit
+        par_produit = par_produit.join(Produit, Produit.id == VenteItem.produit_id)\
+            .filter(Produit.categorie_id == categorie_id)
+
+    par_produit = par_produit.group_by(VenteItem.produit_id).subquery()
+
+    # Totaux globaux calculés par fenêtre sur le même agrégat : un seul aller-retour
+    cout = par_produit.c.cout_fige + par_produit.c.quantite_sans_cout * Produit.prix_achat
+    benefice = par_produit.c.ca - cout
+    lignes = db.session.query(
+        Produit.nom,
+        par_produit.c.quantite,
+        par_produit.c.ca,
+        cout.label('cout'),
+        func.sum(par_produit.c.ca).over().label('ca_total'),
+        func.sum(cout).over().label('cout_total')
+    ).join(Produit, Produit.id == par_produit.c.produit_id)\
+     .order_by(benefice.desc()).limit(top).all()
+
+    ca_total = float(lignes[0].ca_total or 0) if lignes else 0
+    cout_total = float(lignes[0].cout_total or 0) if lignes else 0
+    benefice_brut = ca_total - cout_total
+    marge_brute_pct = (benefice_brut / ca_total * 100) if ca_total else 0
+
+    top_rentables = []
+    for p in lignes:
+        if not p.quantite or p.quantite <= 0:
+            continue
+        ca = float(p.ca or 0)
+        cout_produit = float(p.cout or 0)
+        top_rentables.append({
+            'nom': p.nom,
+            'quantite': int(p.quantite),
+            'ca': ca,
+            'cout': cout_produit,
+            'benefice': ca - cout_produit,
+            'marge': ((ca - cout_produit) / ca * 100) if ca else 0
+        })
+
+    return {
+        'resume': {
+            'ca_total': round(ca_total, 2),
+            'cout_total': round(cout_total, 2),
+            'benefice_brut': round(benefice_brut, 2),
+            'marge_brute': round(marge_brute_pct, 2)
+        },
+        'top_rentables': top_rentables
+    }
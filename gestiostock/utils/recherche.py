@@ -0,0 +1,210 @@
+"""
+Index de recherche plein texte des produits (nom, référence, code-barre)
+ - SQLite : table virtuelle FTS5 produits_fts (produits actifs, sans accents, préfixes), synchronisée par triggers
+ - PostgreSQL : index GIN trigramme sur le texte sans accents (pg_trgm + unaccent)
+Sans index disponible, la recherche retombe sur ILIKE.
+"""
+import re
+from sqlalchemy import text, or_, bindparam, Integer
+from models import db, Produit
+
+# Table FTS5 autonome ne contenant que les produits actifs : aucune jointure nécessaire pour filtrer
+_SQLITE_INSTALLATION = [
+    """CREATE VIRTUAL TABLE produits_fts USING fts5(
+        nom, reference, code_barre,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER produits_fts_ai AFTER INSERT ON produits WHEN new.actif BEGIN
+        INSERT INTO produits_fts(rowid, nom, reference, code_barre)
+        VALUES (new.id, new.nom, new.reference, new.code_barre);
+    END""",
+    """CREATE TRIGGER produits_fts_ad AFTER DELETE ON produits BEGIN
+        DELETE FROM produits_fts WHERE rowid = old.id;
+    END""",
+    # Limité aux colonnes indexées (et actif) : les mises à jour de stock ne touchent pas l'index
+    """CREATE TRIGGER produits_fts_au AFTER UPDATE OF nom, reference, code_barre, actif ON produits BEGIN
+        DELETE FROM produits_fts WHERE rowid = old.id;
+        INSERT INTO produits_fts(rowid, nom, reference, code_barre)
+        SELECT new.id, new.nom, new.reference, new.code_barre WHERE new.actif;
+    END""",
+    "INSERT INTO produits_fts(rowid, nom, reference, code_barre) SELECT id, nom, reference, code_barre FROM produits WHERE actif",
+]
+
+# Au-delà, la saisie est trop large pour que le classement bm25 (coûteux : il note chaque
+# correspondance) ait un sens : les correspondances sur référence / code-barre passent d'abord,
+# puis les produits les plus récents
+SEUIL_CLASSEMENT = 1000
+
+# Texte indexé côté PostgreSQL (doit être identique dans l'index et dans les requêtes)
+_EXPRESSION_PG = "f_unaccent(lower(produits.nom || ' ' || produits.reference || ' ' || coalesce(produits.code_barre, '')))"
+
+_POSTGRES_INSTALLATION = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() n'est pas IMMUTABLE : enveloppe requise pour l'utiliser dans un index
+    """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent', $1) $$""",
+    f"CREATE INDEX IF NOT EXISTS idx_produits_recherche_trgm ON produits USING gin ({_EXPRESSION_PG} gin_trgm_ops)",
+]
+
+# Disponibilité de l'index, par URL de base
+_index_disponible = {}
+
+
+def installer_index_recherche():
+    """Crée l'index de recherche s'il n'existe pas. Retourne True si l'index vient d'être créé"""
+    dialecte = db.engine.dialect.name
+    _index_disponible.pop(str(db.engine.url), None)
+    try:
+        if dialecte == 'sqlite':
+            existe = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'produits_fts'")
+            ).first()
+            if existe:
+                return False
+            for instruction in _SQLITE_INSTALLATION:
+                db.session.execute(text(instruction))
+            db.session.commit()
+            return True
+
+        if dialecte == 'postgresql':
+            existe = db.session.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = 'idx_produits_recherche_trgm'")
+            ).first()
+            if existe:
+                return False
+            for instruction in _POSTGRES_INSTALLATION:
+                db.session.execute(text(instruction))
+            db.session.commit()
+            return True
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Index de recherche non installé ({dialecte}): {e}")
+    return False
+
+
+def index_disponible():
+    """Vrai si l'index de recherche existe dans la base courante (vérifié une fois par processus)"""
+    url = str(db.engine.url)
+    if url not in _index_disponible:
+        dialecte = db.engine.dialect.name
+        if dialecte == 'sqlite':
+            requete = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'produits_fts'"
+        elif dialecte == 'postgresql':
+            requete = "SELECT 1 FROM pg_indexes WHERE indexname = 'idx_produits_recherche_trgm'"
+        else:
+            requete = None
+        _index_disponible[url] = bool(requete and db.session.execute(text(requete)).first())
+    return _index_disponible[url]
+
+
+def termes(q):
+    """Découpe la saisie en mots (lettres et chiffres), comme le tokenizer de l'index"""
+    return re.findall(r'\w+', (q or '').lower())
+
+
+def expression_fts(q):
+    """Requête MATCH FTS5 : tous les mots, chacun en préfixe ("ecr" trouve "écran")"""
+    mots = termes(q)
+    return ' AND '.join(f'"{m}"*' for m in mots) if mots else None
+
+
+def filtre_recherche(q):
+    """
+    Condition SQLAlchemy sur Produit correspondant à la saisie q, pour l'intégrer à une requête existante.
+    Utilise l'index s'il est disponible, sinon ILIKE sur nom, référence et code-barre.
+    """
+    mots = termes(q)
+    if mots and index_disponible():
+        if db.engine.dialect.name == 'sqlite':
+            return Produit.id.in_(
+                text("SELECT rowid FROM produits_fts WHERE produits_fts MATCH :recherche_fts")
+                .bindparams(recherche_fts=expression_fts(q))
+                .columns(rowid=Integer)
+            )
+        return text(' AND '.join(
+            f"{_EXPRESSION_PG} LIKE '%' || f_unaccent(:mot_{i}) || '%'" for i in range(len(mots))
+        )).bindparams(**{f'mot_{i}': m for i, m in enumerate(mots)})
+
+    return or_(
+        Produit.nom.ilike(f'%{q}%'),
+        Produit.reference.ilike(f'%{q}%'),
+        Produit.code_barre.ilike(f'%{q}%')
+    )
+
+
+def rechercher_produits(q, limite=20):
+    """
+    Produits actifs correspondant à q, les plus pertinents d'abord
+    (SQLite : bm25, référence et code-barre pondérés plus fort que le nom ; PostgreSQL : similarité trigramme).
+    Sous SQLite, chaque étape ne lit que l'index plein texte puis au plus `limite` produits par clé primaire.
+    Retourne une liste de dicts.
+    """
+    mots = termes(q)
+    if not mots:
+        return []
+
+    colonnes = "p.id, p.reference, p.code_barre, p.nom, p.prix_vente, p.tva, p.stock_actuel, p.unite_mesure"
+    dialecte = db.engine.dialect.name
+
+    if index_disponible() and dialecte == 'sqlite':
+        expression = expression_fts(q)
+        nb = db.session.execute(
+            text("SELECT count(*) FROM produits_fts WHERE produits_fts MATCH :recherche"), {'recherche': expression}
+        ).scalar()
+        if nb <= SEUIL_CLASSEMENT:
+            ids = db.session.execute(text("""
+                SELECT rowid FROM produits_fts WHERE produits_fts MATCH :recherche
+                ORDER BY bm25(produits_fts, 1.0, 10.0, 10.0) LIMIT :limite
+            """), {'recherche': expression, 'limite': limite}).scalars().all()
+        else:
+            ids = db.session.execute(text("""
+                SELECT rowid FROM produits_fts WHERE produits_fts MATCH :recherche
+                ORDER BY rank LIMIT :limite
+            """), {'recherche': f'{{reference code_barre}} : ({expression})', 'limite': limite}).scalars().all()
+            if len(ids) < limite:
+                ids += db.session.execute(text("""
+                    SELECT rowid FROM produits_fts WHERE produits_fts MATCH :recherche
+                    ORDER BY rowid DESC LIMIT :limite
+                """), {'recherche': expression, 'limite': limite}).scalars().all()
+                ids = list(dict.fromkeys(ids))[:limite]
+
+        position = {id_: i for i, id_ in enumerate(ids)}
+        lignes = sorted(db.session.execute(
+            text(f"SELECT {colonnes} FROM produits p WHERE p.id IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': ids}
+        ).all(), key=lambda p: position[p.id]) if ids else []
+
+    elif index_disponible() and dialecte == 'postgresql':
+        parametres = {f'mot_{i}': m for i, m in enumerate(mots)}
+        conditions = ' AND '.join(
+            f"{_EXPRESSION_PG.replace('produits.', 'p.')} LIKE '%' || f_unaccent(:mot_{i}) || '%'" for i in range(len(mots))
+        )
+        lignes = db.session.execute(text(f"""
+            SELECT {colonnes}
+            FROM produits p
+            WHERE {conditions} AND p.actif
+            ORDER BY similarity({_EXPRESSION_PG.replace('produits.', 'p.')}, f_unaccent(:saisie)) DESC, p.id
+            LIMIT :limite
+        """), {**parametres, 'saisie': ' '.join(mots), 'limite': limite}).all()
+
+    else:
+        lignes = db.session.query(
+            Produit.id, Produit.reference, Produit.code_barre, Produit.nom,
+            Produit.prix_vente, Produit.tva, Produit.stock_actuel, Produit.unite_mesure
+        ).filter(Produit.actif == True, filtre_recherche(q)).order_by(Produit.nom).limit(limite).all()
+
+    return [
+        {
+            'id': p.id,
+            'reference': p.reference,
+            'code_barre': p.code_barre or '',
+            'nom': p.nom,
+            'prix_vente': float(p.prix_vente or 0),
+            'tva': float(p.tva or 0),
+            'stock_actuel': p.stock_actuel,
+            'unite_mesure': p.unite_mesure or 'unité'
+        }
+        for p in lignes
+    ]
@@ -0,0 +1,203 @@
+"""
+Sauvegardes de la base SQLite par l'API de sauvegarde en ligne (sqlite3.Connection.backup)
+ - copie par étapes de quelques pages : les écritures ne sont bloquées que le temps d'une étape
+ - instantané cohérent (pas de fichier copié en pleine écriture), vérifié puis éventuellement compressé
+ - rotation des sauvegardes conservées et mode planifié vers un dossier local
+"""
+import io
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db
+
+# Pages copiées par étape, et pause entre deux étapes pour laisser passer les écritures
+PAGES_PAR_ETAPE = int(os.environ.get('SAUVEGARDE_PAGES', 1024))
+PAUSE_ETAPE = float(os.environ.get('SAUVEGARDE_PAUSE', 0.005))
+
+# Au-delà, la copie par étapes (recommencée à chaque écriture concurrente) est faite en une seule étape
+MAX_REPRISES = 5
+
+# Sauvegardes planifiées : dossier, intervalle (0 = désactivé) et nombre de fichiers conservés
+DOSSIER_SAUVEGARDES = os.environ.get('SAUVEGARDE_DOSSIER')
+INTERVALLE_HEURES = float(os.environ.get('SAUVEGARDE_INTERVALLE_HEURES', 0))
+NB_CONSERVEES = int(os.environ.get('SAUVEGARDE_CONSERVER', 7))
+
+PREFIXE = 'backup_'
+EXTENSIONS = ('.db', '.db.gz')
+
+_planificateur = None
+
+
+class _TropDeReprises(Exception):
+    pass
+
+
+class FichierTemporaire(io.FileIO):
+    """Fichier ouvert en lecture, supprimé à sa fermeture (fin de l'envoi d'une réponse send_file)"""
+
+    def close(self):
+        super().close()
+        if os.path.exists(self.name):
+            os.remove(self.name)
+
+
+def chemin_base():
+    """Chemin du fichier SQLite de l'application, None pour une autre base ou une base en mémoire"""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    return url.database if os.path.exists(url.database) else None
+
+
+def dossier_sauvegardes():
+    dossier = DOSSIER_SAUVEGARDES or os.path.join(current_app.instance_path, 'sauvegardes')
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+def nom_sauvegarde(compresser=False):
+    return f"{PREFIXE}{datetime.now().strftime('%Y%m%d_%H%M%S')}{'.db.gz' if compresser else '.db'}"
+
+
+def nombre_pages(chemin=None):
+    """Nombre de pages de la base (total à copier)"""
+    connexion = sqlite3.connect(chemin or chemin_base())
+    try:
+        return connexion.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        connexion.close()
+
+
+def _copier(source, cible, pages, progression):
+    """Copie source → cible ; _TropDeReprises si la copie recommence trop souvent"""
+    etat = {'restantes': None, 'reprises': 0}
+
+    def avancement(statut, restantes, total):
+        if etat['restantes'] is not None and restantes > etat['restantes']:
+            # Une écriture concurrente a modifié la base : SQLite recommence la copie
+            etat['reprises'] += 1
+            if pages > 0 and etat['reprises'] > MAX_REPRISES:
+                raise _TropDeReprises()
+        etat['restantes'] = restantes
+        if progression:
+            progression(total - restantes, total)
+        if PAUSE_ETAPE and restantes:
+            time.sleep(PAUSE_ETAPE)
+
+    source.backup(cible, pages=pages, progress=avancement)
+
+
+def creer_sauvegarde(destination, compresser=False, pages=None, progression=None, chemin=None):
+    """
+    Écrit un instantané cohérent de la base SQLite dans destination (gzip si compresser).
+    progression(pages copiées, total) est appelé après chaque étape.
+    Le fichier n'apparaît qu'une fois complet et vérifié. ValueError si la base n'est pas SQLite.
+    Retourne la taille du fichier écrit.
+    """
+    chemin = chemin or chemin_base()
+    if chemin is None:
+        raise ValueError("Sauvegarde en ligne disponible uniquement pour une base SQLite")
+    pages = PAGES_PAR_ETAPE if pages is None else pages
+    copie = destination + '.part'
+    source = sqlite3.connect(f'file:{chemin}?mode=ro', uri=True)
+    try:
+        cible = sqlite3.connect(copie)
+        try:
+            try:
+                _copier(source, cible, pages, progression)
+            except _TropDeReprises:
+                print("⚠️ Sauvegarde : écritures trop fréquentes, copie en une seule étape")
+                _copier(source, cible, -1, progression)
+            resultat = cible.execute('PRAGMA quick_check').fetchone()[0]
+            if resultat != 'ok':
+                raise RuntimeError(f'Sauvegarde invalide: {resultat}')
+        finally:
+            cible.close()
+    except Exception:
+        if os.path.exists(copie):
+            os.remove(copie)
+        raise
+    finally:
+        source.close()
+
+    if compresser:
+        try:
+            with open(copie, 'rb') as entree, gzip.open(copie + '.gz', 'wb', compresslevel=6) as sortie:
+                shutil.copyfileobj(entree, sortie, 1024 * 1024)
+        finally:
+            os.remove(copie)
+        copie += '.gz'
+    os.replace(copie, destination)
+    return os.path.getsize(destination)
+
+
+def sauvegardes(dossier):
+    """Sauvegardes du dossier, les plus récentes d'abord"""
+    if not os.path.isdir(dossier):
+        return []
+    fichiers = [
+        os.path.join(dossier, nom) for nom in os.listdir(dossier)
+        if nom.startswith(PREFIXE) and nom.endswith(EXTENSIONS)
+    ]
+    return sorted(fichiers, key=os.path.getmtime, reverse=True)
+
+
+def rotation(dossier, conserver=None):
+    """Supprime les sauvegardes au-delà des `conserver` plus récentes. Retourne les fichiers supprimés"""
+    conserver = NB_CONSERVEES if conserver is None else conserver
+    supprimees = sauvegardes(dossier)[max(conserver, 1):]
+    for fichier in supprimees:
+        os.remove(fichier)
+    return supprimees
+
+
+def sauvegarder_dossier(dossier=None, compresser=True, conserver=None):
+    """Sauvegarde horodatée dans le dossier des sauvegardes, puis rotation. Retourne le chemin écrit"""
+    dossier = dossier or dossier_sauvegardes()
+    os.makedirs(dossier, exist_ok=True)
+    destination = os.path.join(dossier, nom_sauvegarde(compresser))
+    creer_sauvegarde(destination, compresser=compresser)
+    rotation(dossier, conserver)
+    return destination
+
+
+# --- Mode planifié ---------------------------------------------------------
+
+def _boucle(app, intervalle):
+    with app.app_context():
+        dossier = dossier_sauvegardes()
+    while True:
+        try:
+            with app.app_context():
+                recentes = sauvegardes(dossier)
+                # Plusieurs processus (gunicorn) partagent le dossier : une seule sauvegarde par intervalle
+                age = time.time() - os.path.getmtime(recentes[0]) if recentes else None
+                if age is None or age >= intervalle.total_seconds() * 0.9:
+                    chemin = sauvegarder_dossier(dossier)
+                    print(f"✅ Sauvegarde planifiée : {chemin}")
+        except Exception as e:
+            print(f"❌ Erreur sauvegarde planifiée: {e}")
+        time.sleep(intervalle.total_seconds())
+
+
+def demarrer_planification(app, intervalle_heures=None):
+    """Lance les sauvegardes périodiques (thread de fond) si un intervalle est configuré"""
+    global _planificateur
+    intervalle_heures = INTERVALLE_HEURES if intervalle_heures is None else intervalle_heures
+    if intervalle_heures <= 0 or _planificateur is not None:
+        return None
+    with app.app_context():
+        if chemin_base() is None:
+            print("⚠️ Sauvegardes planifiées ignorées : la base n'est pas un fichier SQLite")
+            return None
+    _planificateur = threading.Thread(
+        target=_boucle, args=(app, timedelta(hours=intervalle_heures)), name='sauvegarde', daemon=True
+    )
+    _planificateur.start()
+    print(f"💾 Sauvegardes planifiées toutes les {intervalle_heures:g} h")
+    return _planificateur
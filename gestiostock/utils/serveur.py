@@ -0,0 +1,153 @@
+"""
+Service en production : gunicorn (Linux) ou waitress (Windows) à la place du serveur de développement
+ - application préchargée une fois dans le processus maître, puis dupliquée dans les workers
+ - initialisation de la base faite une seule fois (verrou fichier si plusieurs processus démarrent ensemble)
+ - connexions de la base rouvertes dans chaque worker après le fork
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+HOTE = os.environ.get('HOST', '127.0.0.1')
+PORT = int(os.environ.get('PORT', 5000))
+
+# Threads par worker (gunicorn gthread) ou du serveur waitress
+THREADS = int(os.environ.get('WEB_THREADS', 4))
+
+# Délai maximal d'une requête (exports volumineux) et délai d'arrêt gracieux (secondes)
+DELAI_REQUETE = int(os.environ.get('WEB_TIMEOUT', 120))
+DELAI_ARRET = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+
+_app = None
+_initialisee = False
+_sous_gunicorn = False
+
+
+def nb_workers():
+    """WEB_WORKERS, sinon 2 × cœurs + 1"""
+    return int(os.environ.get('WEB_WORKERS', 0)) or (os.cpu_count() or 1) * 2 + 1
+
+
+@contextmanager
+def verrou_fichier(chemin):
+    """Verrou exclusif entre processus (fcntl sous Linux, msvcrt sous Windows)"""
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    with open(chemin, 'a+') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def preparer(app, init_database):
+    """
+    À appeler une fois l'application créée (wsgi.py, mode production de app.py) :
+    initialise la base sous verrou et lance les sauvegardes planifiées
+    (sous gunicorn, dans le maître une fois prêt : voir options_gunicorn).
+    """
+    global _app, _initialisee
+    _app = app
+    if not _initialisee:
+        with verrou_fichier(os.path.join(app.instance_path, 'init.lock')):
+            init_database(app)
+        _initialisee = True
+    if not _sous_gunicorn:
+        from utils.sauvegarde import demarrer_planification
+        demarrer_planification(app)
+    return app
+
+
+# --- gunicorn ----------------------------------------------------------------
+
+def _quand_pret(server):
+    if _app is not None:
+        from utils.sauvegarde import demarrer_planification
+        demarrer_planification(_app)
+
+
+def _apres_fork(server, worker):
+    # Les connexions ouvertes par le maître (initialisation) ne doivent pas être partagées
+    if _app is not None:
+        from models import db
+        with _app.app_context():
+            db.engine.dispose(close=False)
+
+
+def options_gunicorn():
+    """
+    Réglages gunicorn (lus par gunicorn.conf.py). Rechargement gracieux :
+     - kill -HUP <maître> : nouveaux workers, les anciens finissent leurs requêtes (configuration relue)
+     - kill -USR2 <maître> puis -TERM sur l'ancien maître : nouveau code (l'application est préchargée)
+    """
+    global _sous_gunicorn
+    _sous_gunicorn = True
+    return {
+        'bind': f'{HOTE}:{PORT}',
+        'workers': nb_workers(),
+        'worker_class': 'gthread',
+        'threads': THREADS,
+        'preload_app': True,
+        'timeout': DELAI_REQUETE,
+        'graceful_timeout': DELAI_ARRET,
+        'keepalive': 5,
+        # Workers recyclés périodiquement (mémoire), décalés pour ne pas redémarrer ensemble
+        'max_requests': 2000,
+        'max_requests_jitter': 200,
+        'accesslog': '-',
+        'errorlog': '-',
+        'proc_name': 'gestiostock',
+        'when_ready': _quand_pret,
+        'post_fork': _apres_fork,
+    }
+
+
+def servir(app):
+    """
+    Sert l'application en production : gunicorn si disponible (hors Windows), sinon waitress,
+    à défaut le serveur intégré sans mode debug.
+    """
+    if os.name != 'nt':
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            BaseApplication = None
+        if BaseApplication is not None:
+            options = options_gunicorn()
+            # Application déjà préparée dans ce processus : sauvegardes planifiées déjà lancées
+            options.pop('when_ready')
+
+            class _Gunicorn(BaseApplication):
+                def load_config(self):
+                    for cle, valeur in options.items():
+                        self.cfg.set(cle, valeur)
+
+                def load(self):
+                    return app
+
+            print(f"🚀 gunicorn : {options['workers']} workers x {options['threads']} threads sur {options['bind']}")
+            _Gunicorn().run()
+            return
+
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    if serve is not None:
+        print(f"🚀 waitress : {THREADS * 2} threads sur http://{HOTE}:{PORT}")
+        serve(app, host=HOTE, port=PORT, threads=THREADS * 2)
+        return
+
+    print("⚠️ Ni gunicorn ni waitress installé : serveur intégré (pip install gunicorn ou waitress)", file=sys.stderr)
+    app.run(host=HOTE, port=PORT, debug=False, threaded=True, use_reloader=False)
@@ -0,0 +1,276 @@
+"""
+Exports en arrière-plan : les exports volumineux sont mis en file (table export_jobs),
+exécutés par un pool de threads local au processus, et le fichier produit est conservé
+dans instance/exports jusqu'à son expiration
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from models import db, ExportJob, Vente
+from utils import excel
+from utils.export import (classeur_ventes, classeur_produits, classeur_complet,
+                          compter_lignes_ventes, compter_lignes_complet, donnees_factures_lot)
+from utils.factures import rendre_lot, FORMATS_LOT
+from utils.sauvegarde import chemin_base, creer_sauvegarde, nom_sauvegarde, nombre_pages
+
+# Exports exécutés simultanément par processus
+NB_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+
+# Durée de conservation des fichiers produits
+DUREE_CONSERVATION = timedelta(hours=int(os.environ.get('EXPORT_TTL_HEURES', 24)))
+
+# Délai minimal (secondes) entre deux écritures de l'avancement en base
+INTERVALLE_PROGRESSION = 1.0
+
+_executeur = None
+_verrou = threading.Lock()
+
+# Avancement des exports en cours dans ce processus : job_id → lignes traitées
+_avancement = {}
+
+
+def _pool():
+    global _executeur
+    with _verrou:
+        if _executeur is None:
+            _executeur = ThreadPoolExecutor(max_workers=NB_WORKERS, thread_name_prefix='export')
+        return _executeur
+
+
+def dossier_exports():
+    dossier = os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+class Suivi:
+    """Compteur d'avancement passé aux fonctions d'export (appelé avec le nombre de lignes écrites)"""
+
+    def __init__(self, job_id, persister=True):
+        """persister=False : avancement gardé en mémoire seulement, jamais écrit en base pendant l'export"""
+        self.job_id = job_id
+        self.fait = 0
+        self._derniere_ecriture = 0.0
+        # En SQLite hors WAL, écrire pendant la lecture de l'export bloquerait : avancement en mémoire seulement
+        self._persister = persister and (db.engine.dialect.name != 'sqlite' or
+                                         str(db.session.execute(text('PRAGMA journal_mode')).scalar()).lower() == 'wal')
+
+    def definir_total(self, total):
+        """À appeler avant la lecture des données"""
+        db.session.query(ExportJob).filter(ExportJob.id == self.job_id).update({ExportJob.total: total})
+        db.session.commit()
+
+    def __call__(self, nb):
+        self.fait += nb
+        _avancement[self.job_id] = self.fait
+        maintenant = time.monotonic()
+        if self._persister and maintenant - self._derniere_ecriture >= INTERVALLE_PROGRESSION:
+            self._derniere_ecriture = maintenant
+            # Connexion séparée : la session de l'export garde son curseur de lecture ouvert
+            with db.engine.begin() as connexion:
+                connexion.execute(
+                    db.update(ExportJob).where(ExportJob.id == self.job_id).values(progression=self.fait)
+                )
+
+
+# --- Types d'export -------------------------------------------------------
+
+def _periode(parametres):
+    try:
+        debut = datetime.strptime(parametres['date_debut'], '%Y-%m-%d')
+        fin = datetime.strptime(parametres['date_fin'], '%Y-%m-%d') + timedelta(days=1)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Les paramètres date_debut et date_fin (YYYY-MM-DD) sont requis')
+    return debut, fin
+
+
+def _export_ventes_excel(parametres, chemin, suivi):
+    debut, fin = _periode(parametres)
+    suivi.definir_total(compter_lignes_ventes(Vente.date_vente >= debut, Vente.date_vente < fin))
+    classeur_ventes(debut, fin, progression=suivi).save(chemin)
+    return f"ventes_{parametres['date_debut']}_a_{parametres['date_fin']}.xlsx"
+
+
+def _export_produits_excel(parametres, chemin, suivi):
+    classeur_produits(progression=suivi).save(chemin)
+    return f"produits_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+
+
+def _export_complet_excel(parametres, chemin, suivi):
+    suivi.definir_total(compter_lignes_complet())
+    classeur_complet(progression=suivi).save(chemin)
+    return f"export_complet_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+
+def _lot_factures(parametres):
+    ids = parametres.get('ids')
+    if ids:
+        return [int(i) for i in ids], None
+    try:
+        return None, datetime.strptime(parametres['date'], '%Y-%m-%d').date()
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Le paramètre ids (liste) ou date (YYYY-MM-DD) est requis')
+
+
+def _export_factures(parametres, chemin, suivi):
+    ids, jour = _lot_factures(parametres)
+    format = parametres.get('format', 'zip')
+    factures = donnees_factures_lot(ids=ids, jour=jour)
+    suivi.definir_total(len(factures))
+    # Le rendu a lieu hors session : libérer la connexion pendant qu'il tourne
+    db.session.remove()
+    with rendre_lot(factures, format) as lot, open(chemin, 'wb') as f:
+        shutil.copyfileobj(lot, f)
+    suivi(len(factures))
+    return f"factures_{jour.strftime('%Y%m%d') if jour else datetime.now().strftime('%Y%m%d_%H%M')}.{format}"
+
+
+def _export_sauvegarde(parametres, chemin, suivi):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if chemin_base():
+        compresser = bool(parametres.get('compresser'))
+        suivi.definir_total(nombre_pages())
+        creer_sauvegarde(chemin, compresser=compresser, progression=lambda faites, total: suivi(faites - suivi.fait))
+        return nom_sauvegarde(compresser)
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump({
+            'export_date': datetime.now().isoformat(),
+            'app': 'GestioStock',
+            'status': 'Backup généré avec succès'
+        }, f, indent=2, default=str)
+    return f"backup_{timestamp}.json"
+
+
+# type → fonction(parametres, chemin, suivi) retournant le nom de fichier proposé, mimetype, réservé admin, avancement écrit en base (défaut True)
+TYPES_EXPORT = {
+    'ventes_excel': {'fonction': _export_ventes_excel, 'mimetype': excel.MIMETYPE_XLSX, 'admin': False},
+    'produits_excel': {'fonction': _export_produits_excel, 'mimetype': excel.MIMETYPE_XLSX, 'admin': False},
+    'complet_excel': {'fonction': _export_complet_excel, 'mimetype': excel.MIMETYPE_XLSX, 'admin': True},
+    'factures': {'fonction': _export_factures, 'mimetype': 'application/zip', 'admin': False},
+    # Écrire l'avancement en base pendant la copie la ferait recommencer : en mémoire seulement
+    'sauvegarde': {'fonction': _export_sauvegarde, 'mimetype': 'application/octet-stream', 'admin': True,
+                   'persister_avancement': False},
+}
+
+
+# --- File d'exécution -----------------------------------------------------
+
+def soumettre(type_export, parametres, user):
+    """
+    Crée l'export et le confie au pool. ValueError si le type ou les paramètres sont invalides,
+    PermissionError si l'export est réservé aux administrateurs.
+    """
+    definition = TYPES_EXPORT.get(type_export)
+    if definition is None:
+        raise ValueError(f"Type d'export inconnu: {type_export} (attendu : {', '.join(TYPES_EXPORT)})")
+    if definition['admin'] and user.role != 'admin':
+        raise PermissionError('Accès non autorisé')
+    parametres = parametres or {}
+    if type_export == 'ventes_excel':
+        _periode(parametres)
+    if type_export == 'factures':
+        _lot_factures(parametres)
+        if parametres.get('format', 'zip') not in FORMATS_LOT:
+            raise ValueError(f"Format invalide: {parametres['format']} (attendu : {', '.join(FORMATS_LOT)})")
+
+    nettoyer_exports()
+
+    mimetype = definition['mimetype']
+    if type_export == 'factures':
+        mimetype = FORMATS_LOT[parametres.get('format', 'zip')]
+    job = ExportJob(type=type_export, parametres=json.dumps(parametres), statut='en_attente',
+                    mimetype=mimetype, user_id=user.id)
+    db.session.add(job)
+    db.session.commit()
+
+    _pool().submit(_executer, current_app._get_current_object(), job.id)
+    return job
+
+
+def _executer(app, job_id):
+    with app.app_context():
+        chemin_temporaire = None
+        try:
+            job = db.session.get(ExportJob, job_id)
+            if job is None or job.statut != 'en_attente':
+                return
+            job.statut = 'en_cours'
+            job.date_debut = datetime.utcnow()
+            db.session.commit()
+
+            dossier = dossier_exports()
+            chemin_temporaire = os.path.join(dossier, f'{job_id}.part')
+            suivi = Suivi(job_id, persister=TYPES_EXPORT[job.type].get('persister_avancement', True))
+            nom_fichier = TYPES_EXPORT[job.type]['fonction'](json.loads(job.parametres or '{}'), chemin_temporaire, suivi)
+
+            chemin = os.path.join(dossier, f'{job_id}_{nom_fichier}')
+            os.replace(chemin_temporaire, chemin)
+
+            job = db.session.get(ExportJob, job_id)
+            job.statut = 'termine'
+            job.fichier = chemin
+            job.nom_fichier = nom_fichier
+            job.taille = os.path.getsize(chemin)
+            job.progression = suivi.fait
+            job.date_fin = datetime.utcnow()
+            job.date_expiration = job.date_fin + DUREE_CONSERVATION
+            db.session.commit()
+            print(f"✅ Export {job_id} ({job.type}) terminé : {nom_fichier}")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Erreur export {job_id}: {e}")
+            if chemin_temporaire and os.path.exists(chemin_temporaire):
+                os.remove(chemin_temporaire)
+            job = db.session.get(ExportJob, job_id)
+            if job is not None:
+                job.statut = 'erreur'
+                job.erreur = str(e)
+                job.date_fin = datetime.utcnow()
+                job.date_expiration = job.date_fin + DUREE_CONSERVATION
+                db.session.commit()
+        finally:
+            _avancement.pop(job_id, None)
+            db.session.remove()
+
+
+def etat(job):
+    """Dictionnaire de l'export, avec l'avancement en mémoire s'il s'exécute dans ce processus"""
+    data = job.to_dict()
+    if job.id in _avancement:
+        data['progression'] = _avancement[job.id]
+        if job.total:
+            data['pourcentage'] = round(100 * data['progression'] / job.total, 1)
+    return data
+
+
+def nettoyer_exports():
+    """
+    Supprime les exports expirés (fichier et ligne) et marque en erreur ceux restés
+    en attente ou en cours au-delà de la durée de conservation (processus arrêté).
+    Retourne le nombre d'exports supprimés.
+    """
+    maintenant = datetime.utcnow()
+    expires = ExportJob.query.filter(ExportJob.date_expiration < maintenant).all()
+    for job in expires:
+        if job.fichier and os.path.exists(job.fichier):
+            os.remove(job.fichier)
+        db.session.delete(job)
+
+    ExportJob.query.filter(
+        ExportJob.statut.in_(('en_attente', 'en_cours')),
+        ExportJob.date_creation < maintenant - DUREE_CONSERVATION
+    ).update({
+        ExportJob.statut: 'erreur',
+        ExportJob.erreur: 'Export interrompu',
+        ExportJob.date_fin: maintenant,
+        ExportJob.date_expiration: maintenant + DUREE_CONSERVATION
+    }, synchronize_session=False)
+    db.session.commit()
+    return len(expires)
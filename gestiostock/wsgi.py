@@ -1,7 +1,14 @@
-from app import create_app
+"""
+Point d'entrée WSGI de production (application préchargée, base initialisée une seule fois) :
+    gunicorn wsgi:app            (Linux, réglages dans gunicorn.conf.py)
+    waitress-serve wsgi:app      (Windows)
+    python wsgi.py               (gunicorn ou waitress selon ce qui est installé)
+"""
+from app import create_app, init_database
+from utils.serveur import preparer, servir
 
 app = create_app()
+preparer(app, init_database)
 
 if __name__ == "__main__":
-    # Pour tests locaux uniquement
-    app.run(host="127.0.0.1", port=5000)
+    servir(app)
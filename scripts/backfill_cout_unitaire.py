@@ -0,0 +1,93 @@
+"""Backfill du coût d'achat figé (vente_items.cout_unitaire) pour les ventes historiques.
+
+Les nouvelles ventes enregistrent le prix d'achat du produit au moment de la vente.
+Pour les lignes plus anciennes, ce script estime ce coût :
+ - par défaut : dernier prix unitaire d'une commande fournisseur reçue avant la vente,
+   à défaut le prix d'achat actuel du produit
+ - avec --prix-actuel : toujours le prix d'achat actuel du produit
+
+Usage (PowerShell):
+    # preview (no DB writes)
+    python scripts\\backfill_cout_unitaire.py
+
+    # apply (will write to DB) -- make a DB backup before running
+    python scripts\\backfill_cout_unitaire.py --apply
+"""
+import os
+import sys
+import argparse
+
+# Ensure imports resolve (same approach as reconcile script)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+from gestiostock.app import create_app
+try:
+    from models import db, Vente, VenteItem, Produit, Commande, CommandeItem
+except ImportError:
+    from gestiostock.models import db, Vente, VenteItem, Produit, Commande, CommandeItem
+from utils.migrations import ajouter_colonnes_manquantes
+from sqlalchemy import func
+
+
+def expression_cout(prix_actuel=False):
+    """Sous-requête corrélée donnant le coût estimé d'une ligne de vente"""
+    prix_produit = db.select(Produit.prix_achat).where(Produit.id == VenteItem.produit_id).scalar_subquery()
+    if prix_actuel:
+        return prix_produit
+
+    dernier_achat = db.select(CommandeItem.prix_unitaire)\
+        .join(Commande, Commande.id == CommandeItem.commande_id)\
+        .where(
+            CommandeItem.produit_id == VenteItem.produit_id,
+            Commande.statut == 'reçue',
+            Commande.date_livraison_reelle <= db.select(Vente.date_vente).where(Vente.id == VenteItem.vente_id).scalar_subquery()
+        )\
+        .order_by(Commande.date_livraison_reelle.desc())\
+        .limit(1)\
+        .scalar_subquery()
+    return func.coalesce(dernier_achat, prix_produit)
+
+
+def preview(app):
+    with app.app_context():
+        a_traiter = db.session.query(func.count(VenteItem.id)).filter(VenteItem.cout_unitaire.is_(None)).scalar()
+        total = db.session.query(func.count(VenteItem.id)).scalar()
+        print(f"Lignes de vente sans coût figé : {a_traiter} / {total}")
+        return a_traiter
+
+
+def apply_backfill(app, prix_actuel=False):
+    with app.app_context():
+        resultat = db.session.execute(
+            db.update(VenteItem)
+            .where(VenteItem.cout_unitaire.is_(None))
+            .values(cout_unitaire=expression_cout(prix_actuel))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        print(f"Backfill appliqué : {resultat.rowcount} lignes mises à jour")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--apply', action='store_true', help='Appliquer les changements en base')
+    parser.add_argument('--prix-actuel', action='store_true', help='Utiliser le prix d\'achat actuel au lieu de l\'historique des commandes')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        # Ajoute la colonne sur une base créée avant son introduction
+        ajouter_colonnes_manquantes()
+
+    a_traiter = preview(app)
+    if args.apply and a_traiter:
+        apply_backfill(app, args.prix_actuel)
+        preview(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ Script behaviour:
  - repère les ventes considérées payées (heuristique: statut_paiement contient 'pay' ou mode_paiement != 'crédit')
  - ignore les ventes qui ont déjà un Paiement lié
  - preview: affiche la liste et les totaux
- - apply: crée un Paiement et un MouvementCaisse par vente, et met à jour ParametreSysteme.solde_caisse
+ - apply: crée un Paiement et un MouvementCaisse par vente, et crédite la caisse (Caisse)
 """
 import os
 import sys
@@ -27,9 +27,9 @@ for p in (ROOT, PKG):
 
 from gestiostock.app import create_app
 try:
-    from models import db, Vente, Paiement, MouvementCaisse, ParametreSysteme
+    from models import db, Vente, Paiement, Caisse
 except ImportError:
-    from gestiostock.models import db, Vente, Paiement, MouvementCaisse, ParametreSysteme
+    from gestiostock.models import db, Vente, Paiement, Caisse
 
 
 def find_target_ventes():
@@ -63,13 +63,7 @@ def preview(app):
 
 def apply_backfill(app, targets):
     with app.app_context():
-        # read current solde
-        try:
-            current = float(ParametreSysteme.get_value('solde_caisse') or 0)
-        except Exception:
-            current = 0.0
-
-        print(f"Solde caisse avant : {current}")
+        print(f"Solde caisse avant : {Caisse.solde_actuel()}")
 
         created = 0
         for v in targets:
@@ -82,22 +76,14 @@ def apply_backfill(app, targets):
             db.session.add(p)
             db.session.flush()  # get p.id
 
-            # create MouvementCaisse
-            solde_avant = current
-            solde_apres = solde_avant + montant
-            m = MouvementCaisse(type='encaisse', montant=montant, reference=f'backfill-vente-{v.id}', date=datetime.utcnow(), paiement_id=p.id, vente_id=v.id, utilisateur='system-backfill', solde_avant=solde_avant, solde_apres=solde_apres, notes='Backfill automatique')
-            db.session.add(m)
-
-            # update running solde
-            current = solde_apres
+            # create MouvementCaisse (credits the cash balance atomically)
+            Caisse.mouvement('encaisse', montant, reference=f'backfill-vente-{v.id}', date=datetime.utcnow(), paiement_id=p.id, vente_id=v.id, utilisateur='system-backfill', notes='Backfill automatique')
             created += 1
 
-        # persist new solde
-        ParametreSysteme.set_value('solde_caisse', current, type_valeur='number')
         db.session.commit()
 
         print(f"Backfill appliqué : {created} paiements + mouvements créés")
-        print(f"Solde caisse après : {current}")
+        print(f"Solde caisse après : {Caisse.solde_actuel()}")
 
 
 def main():
@@ -0,0 +1,132 @@
+"""Benchmark des exports de ventes : XLSX (openpyxl write-only) contre CSV et NDJSON en flux.
+
+Remplit une base SQLite temporaire de ventes synthétiques, puis télécharge
+/api/api/export/ventes/excel dans chaque format via le client de test Flask et mesure :
+durée, débit (lignes/s), taille produite et, avec --memoire, le pic d'allocations Python.
+
+Usage (PowerShell):
+    python scripts\\bench_exports.py                       # 200 000 lignes de vente
+    python scripts\\bench_exports.py --lignes 1000000
+    python scripts\\bench_exports.py --lignes 50000 --memoire
+
+La base de travail est créée dans un dossier temporaire : aucune donnée réelle n'est touchée.
+"""
+import os
+import io
+import sys
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+WORKDIR = tempfile.mkdtemp(prefix='bench_exports_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from gestiostock.app import create_app, init_database
+try:
+    from models import db, Vente, VenteItem, Produit
+except ImportError:
+    from gestiostock.models import db, Vente, VenteItem, Produit
+
+DEBUT = datetime(2024, 1, 1)
+
+
+def remplir(nb_lignes):
+    """Ventes de 1 à 3 articles réparties sur un an"""
+    random.seed(42)
+    produits = [p.id for p in Produit.query.all()]
+    vente_id = 1000
+    ventes, items = [], []
+    lignes = 0
+    while lignes < nb_lignes:
+        vente_id += 1
+        nb = min(random.randint(1, 3), nb_lignes - lignes)
+        montant = 0.0
+        for _ in range(nb):
+            prix = random.randint(1, 500) * 100.0
+            items.append({'vente_id': vente_id, 'produit_id': random.choice(produits), 'quantite': 1,
+                          'prix_unitaire': prix, 'montant_total': prix})
+            montant += prix
+        ventes.append({'id': vente_id, 'numero_facture': f'BENCH-{vente_id}', 'client_id': 1,
+                       'montant_total': montant, 'statut': 'confirmée',
+                       'date_vente': DEBUT + timedelta(seconds=random.randint(0, 365 * 86400))})
+        lignes += nb
+        if len(items) >= 20000:
+            db.session.execute(db.insert(Vente), ventes)
+            db.session.execute(db.insert(VenteItem), items)
+            ventes, items = [], []
+    if ventes:
+        db.session.execute(db.insert(Vente), ventes)
+        db.session.execute(db.insert(VenteItem), items)
+    db.session.commit()
+
+
+def telecharger(client, format, memoire):
+    url = f'/api/api/export/ventes/excel?date_debut=2024-01-01&date_fin=2024-12-31&format={format}'
+    if memoire:
+        tracemalloc.start()
+    debut = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        reponse = client.get(url, buffered=False)
+        taille = sum(len(morceau) for morceau in reponse.response)
+        reponse.close()
+    duree = time.perf_counter() - debut
+    pic = None
+    if memoire:
+        pic = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return reponse.status_code, duree, taille, pic
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lignes', type=int, default=200000, help='Nombre de lignes de vente à générer')
+    parser.add_argument('--memoire', action='store_true', help='Mesurer le pic mémoire (ralentit les mesures)')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+        init_database(app)
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        print(f"Génération de {args.lignes} lignes de vente dans {WORKDIR} ...")
+        debut = time.perf_counter()
+        remplir(args.lignes)
+        print(f"  données prêtes en {time.perf_counter() - debut:.1f}s")
+
+    client = app.test_client()
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.post('/login', json={'username': 'admin', 'password': 'admin123'})
+
+    print(f"\n{'Format':8s} {'Durée':>9s} {'Lignes/s':>11s} {'Taille':>10s}" + (f" {'Pic mémoire':>12s}" if args.memoire else ''))
+    references = {}
+    for format in ('xlsx', 'csv', 'ndjson'):
+        statut, duree, taille, pic = telecharger(client, format, args.memoire)
+        if statut != 200:
+            print(f"{format:8s} ❌ statut HTTP {statut}")
+            continue
+        references[format] = duree
+        ligne = f"{format:8s} {duree:8.2f}s {args.lignes / duree:11,.0f} {taille / 1024 / 1024:8.1f} Mo"
+        if pic is not None:
+            ligne += f" {pic / 1024 / 1024:10.1f} Mo"
+        print(ligne)
+
+    if 'xlsx' in references:
+        for format in ('csv', 'ndjson'):
+            if format in references:
+                print(f"{format} : {references['xlsx'] / references[format]:.1f}x plus rapide que xlsx")
+
+
+if __name__ == '__main__':
+    main()
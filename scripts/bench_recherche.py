@@ -0,0 +1,109 @@
+"""Benchmark de la recherche produits (/api/produits/search).
+
+Compare, sur une base SQLite temporaire remplie de produits synthétiques :
+ - l'index plein texte FTS5 (utils.recherche.rechercher_produits)
+ - l'ancien filtre ILIKE '%terme%' sur nom, référence et code-barre
+
+Usage (PowerShell):
+    python scripts\\bench_recherche.py                   # 100 000 produits
+    python scripts\\bench_recherche.py --produits 20000
+
+La base de travail est créée dans un dossier temporaire : aucune donnée réelle n'est touchée.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+WORKDIR = tempfile.mkdtemp(prefix='bench_recherche_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+
+from gestiostock.app import create_app
+try:
+    from models import db, Produit
+except ImportError:
+    from gestiostock.models import db, Produit
+from sqlalchemy import or_
+from utils.recherche import installer_index_recherche, rechercher_produits
+
+TYPES = ['Écran', 'Clavier', 'Souris', 'Câble', 'Téléphone', 'Imprimante', 'Chargeur', 'Batterie',
+         'Disque', 'Clé USB', 'Casque', 'Enceinte', 'Télévision', 'Réfrigérateur', 'Ventilateur']
+MARQUES = ['Samsung', 'HP', 'Dell', 'Lenovo', 'Tecno', 'Itel', 'Infinix', 'Logitech', 'Sony', 'LG']
+QUALIFICATIFS = ['pro', 'mini', 'sans fil', 'noir', 'blanc', 'éco', 'premium', 'rapide', '24 pouces', '1 To']
+
+SAISIES = ['ecran', 'ecran sam', 'clav', 'telephone tec', 'cle usb', 'refrig', 'REF-0042', '3760000012',
+           'casque sans', 'dell', 'imprimante hp', 'batt', 'tele lg', 'chargeur rapide', 'souris logi']
+
+
+def remplir(nb_produits):
+    random.seed(42)
+    lot = 20000
+    for depart in range(1, nb_produits + 1, lot):
+        db.session.execute(db.insert(Produit), [{
+            'nom': f'{random.choice(TYPES)} {random.choice(MARQUES)} {random.choice(QUALIFICATIFS)} {i}',
+            'reference': f'REF-{i:06d}',
+            'code_barre': f'376{i:010d}',
+            'prix_achat': 1000,
+            'prix_vente': 1500,
+            'stock_actuel': 10,
+            'actif': True
+        } for i in range(depart, min(depart + lot, nb_produits + 1))])
+    db.session.commit()
+
+
+def ancien_ilike(q, limite=20):
+    return Produit.query.filter(Produit.actif == True, or_(
+        Produit.nom.ilike(f'%{q}%'),
+        Produit.reference.ilike(f'%{q}%'),
+        Produit.code_barre.ilike(f'%{q}%')
+    )).limit(limite).all()
+
+
+def mesurer(fonction, repetitions=20):
+    """Durées (ms) de chaque saisie, meilleure de `repetitions` exécutions"""
+    durees = []
+    for q in SAISIES:
+        meilleure = None
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            fonction(q)
+            duree = (time.perf_counter() - debut) * 1000
+            meilleure = duree if meilleure is None else min(meilleure, duree)
+        durees.append(meilleure)
+    return durees
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--produits', type=int, default=100000, help='Nombre de produits à générer')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f"Génération de {args.produits} produits dans {WORKDIR} ...")
+        debut = time.perf_counter()
+        remplir(args.produits)
+        installer_index_recherche()
+        print(f"  données et index prêts en {time.perf_counter() - debut:.1f}s")
+
+        for libelle, fonction in (('Index FTS5', rechercher_produits), ('Ancien ILIKE', ancien_ilike)):
+            durees = mesurer(fonction, repetitions=5 if fonction is ancien_ilike else 20)
+            print(f"{libelle:20s} médiane {statistics.median(durees):7.2f} ms   max {max(durees):7.2f} ms")
+
+        print("\nExemples :")
+        for q in SAISIES[:4]:
+            print(f"  {q!r:18s} -> {[p['nom'] for p in rechercher_produits(q, 3)]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Benchmark du rapport de rentabilité (/api/rapport/rentabilite).
+
+Compare, sur une base SQLite temporaire remplie de données synthétiques :
+ - l'ancienne boucle Python (Vente -> items -> produit, chargements paresseux)
+ - la requête agrégée unique de utils.rapports.calculer_rentabilite
+
+Usage (PowerShell):
+    python scripts\\bench_rentabilite.py                      # 500 000 lignes de vente
+    python scripts\\bench_rentabilite.py --lignes 50000
+    python scripts\\bench_rentabilite.py --sans-ancien        # ne mesure que la requête SQL
+
+La base de travail est créée dans un dossier temporaire : aucune donnée réelle n'est touchée.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+WORKDIR = tempfile.mkdtemp(prefix='bench_rentabilite_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+
+from gestiostock.app import create_app
+try:
+    from models import db, Vente, VenteItem, Produit, Categorie
+except ImportError:
+    from gestiostock.models import db, Vente, VenteItem, Produit, Categorie
+from utils.rapports import calculer_rentabilite
+
+
+def remplir(nb_lignes, nb_produits=2000, lignes_par_vente=4):
+    """Insère des produits, ventes et lignes de vente synthétiques par lots"""
+    random.seed(42)
+    db.session.execute(db.insert(Categorie), [{'nom': f'Catégorie {i}', 'actif': True} for i in range(1, 21)])
+    db.session.execute(db.insert(Produit), [{
+        'nom': f'Produit {i}',
+        'reference': f'REF-{i:06d}',
+        'prix_achat': random.randint(500, 50000),
+        'prix_vente': random.randint(60000, 90000),
+        'stock_actuel': 1000,
+        'categorie_id': random.randint(1, 20),
+        'actif': True
+    } for i in range(1, nb_produits + 1)])
+
+    nb_ventes = nb_lignes // lignes_par_vente
+    debut = datetime.now() - timedelta(days=365)
+    lot = 20000
+    for depart in range(0, nb_ventes, lot):
+        db.session.execute(db.insert(Vente), [{
+            'numero_facture': f'BENCH-{i:08d}',
+            'montant_total': 0,
+            'mode_paiement': 'espèces',
+            'date_vente': debut + timedelta(minutes=i * 525600 // nb_ventes),
+            'statut': 'annulée' if i % 50 == 0 else 'confirmée',
+            'statut_paiement': 'payé'
+        } for i in range(depart + 1, min(depart + lot, nb_ventes) + 1)])
+
+    for depart in range(0, nb_lignes, lot):
+        lignes = []
+        for i in range(depart, min(depart + lot, nb_lignes)):
+            quantite = random.randint(1, 5)
+            prix = random.randint(60000, 90000)
+            lignes.append({
+                'vente_id': i // lignes_par_vente + 1,
+                'produit_id': random.randint(1, nb_produits),
+                'quantite': quantite,
+                'prix_unitaire': prix,
+                'remise': random.choice([0, 0, 5, 10]),
+                'montant_total': quantite * prix
+            })
+        db.session.execute(db.insert(VenteItem), lignes)
+    db.session.commit()
+
+
+def ancienne_boucle():
+    """Reproduction de l'implémentation historique (N+1)"""
+    ca_total = 0
+    cout_total = 0
+    for vente in Vente.query.filter_by(statut='confirmée').all():
+        for item in vente.items:
+            produit = item.produit
+            if not produit:
+                continue
+            ca_total += item.prix_unitaire * item.quantite * (1 - (item.remise or 0) / 100)
+            cout_total += item.quantite * produit.prix_achat
+    return ca_total, cout_total
+
+
+def chronometrer(fonction, repetitions=1):
+    meilleur = None
+    resultat = None
+    for _ in range(repetitions):
+        db.session.expire_all()
+        debut = time.perf_counter()
+        resultat = fonction()
+        duree = time.perf_counter() - debut
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    return meilleur, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lignes', type=int, default=500000, help='Nombre de lignes de vente à générer')
+    parser.add_argument('--sans-ancien', action='store_true', help='Ne pas mesurer l\'ancienne boucle Python')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f"Génération de {args.lignes} lignes de vente dans {WORKDIR} ...")
+        debut = time.perf_counter()
+        remplir(args.lignes)
+        print(f"  données prêtes en {time.perf_counter() - debut:.1f}s")
+
+        duree, rapport = chronometrer(lambda: calculer_rentabilite(), repetitions=3)
+        print(f"Requête agrégée (tout l'historique)     : {duree * 1000:8.1f} ms  CA={rapport['resume']['ca_total']:,.0f}")
+
+        debut_mois = datetime.now() - timedelta(days=30)
+        duree, _ = chronometrer(lambda: calculer_rentabilite(date_debut=debut_mois), repetitions=3)
+        print(f"Requête agrégée (30 derniers jours)     : {duree * 1000:8.1f} ms")
+
+        duree, _ = chronometrer(lambda: calculer_rentabilite(categorie_id=1), repetitions=3)
+        print(f"Requête agrégée (une catégorie)         : {duree * 1000:8.1f} ms")
+
+        if not args.sans_ancien:
+            duree, (ca, _) = chronometrer(ancienne_boucle)
+            print(f"Ancienne boucle Python (N+1)            : {duree * 1000:8.1f} ms  CA={ca:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Benchmark de concurrence SQLite : lectures pendant des ventes, journal classique contre WAL.
+
+Pour chaque mode, une base temporaire est créée dans un processus séparé (les PRAGMA
+sont lus dans la configuration au démarrage). Des caisses enregistrent des ventes en
+continu (/api/ventes) pendant que des lecteurs interrogent les tableaux de bord, chacun
+dans son propre processus comme des workers gunicorn ; le script compare la latence
+des lectures (médiane, p95, max), les débits et les erreurs.
+
+Usage (PowerShell):
+    python scripts\\bench_wal.py
+    python scripts\\bench_wal.py --ecrivains 4 --lecteurs 8 --duree 20
+
+La base de travail est créée dans un dossier temporaire : aucune donnée réelle n'est touchée.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+import contextlib
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+
+# Réglages comparés : ceux d'avant (aucun PRAGMA, valeurs par défaut de SQLite) et la configuration actuelle
+MODES = {
+    'journal': {'SQLITE_JOURNAL_MODE': 'delete', 'SQLITE_SYNCHRONOUS': 'full', 'SQLITE_CACHE_KO': '2000', 'SQLITE_MMAP_MO': '0'},
+    'wal': {},
+}
+
+LECTURES = ('/api/stats/ventes', '/api/ventes?limit=50', '/api/produits', '/api/dashboard')
+
+
+def centile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p))] if valeurs else 0.0
+
+
+def _chemins():
+    for p in (ROOT, PKG):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+
+
+def _application():
+    _chemins()
+    with contextlib.redirect_stdout(io.StringIO()):
+        from gestiostock.app import create_app
+        app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def travailleur(role, numero, duree, depart, resultats):
+    """
+    Processus de charge (comme un worker gunicorn) : 'caisse' enregistre des ventes,
+    'lecteur' interroge les tableaux de bord. Envoie (role, durées réussies, nb erreurs, exemple d'erreur)
+    """
+    app = _application()
+    client = app.test_client()
+    durees, erreurs, exemple = [], 0, None
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.post('/login', json={'username': 'admin', 'password': 'admin123'})
+        aleatoire = random.Random(numero)
+        i = numero
+        # Mesure lancée quand tous les processus sont prêts
+        depart.wait()
+        fin = time.monotonic() + duree
+        while time.monotonic() < fin:
+            debut = time.perf_counter()
+            if role == 'caisse':
+                r = client.post('/api/ventes', json={
+                    'client_id': 1,
+                    'items': [{'produit_id': aleatoire.choice((1, 2)), 'quantite': 1,
+                               'prix_unitaire': aleatoire.randint(1, 50) * 100}]
+                })
+                ok = r.status_code == 201
+            else:
+                r = client.get(LECTURES[i % len(LECTURES)])
+                i += 1
+                ok = r.status_code == 200
+            if ok:
+                durees.append(time.perf_counter() - debut)
+            else:
+                erreurs += 1
+                exemple = exemple or str((r.get_json(silent=True) or {}).get('error', r.status_code)).splitlines()[0][:80]
+    resultats.put((role, durees, erreurs, exemple))
+
+
+def mesurer(args):
+    """Exécuté dans le processus enfant : charge mixte sur une base neuve, résultats en JSON"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_wal_'), 'bench.db')
+    _chemins()
+    with contextlib.redirect_stdout(io.StringIO()):
+        from gestiostock.app import create_app, init_database
+        app = create_app()
+        init_database(app)
+    from models import db, Produit
+
+    with app.app_context():
+        db.session.query(Produit).update({Produit.stock_actuel: 1000000})
+        db.session.commit()
+        mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+    # Un processus par caisse et par lecteur, la mesure démarre quand tous sont initialisés
+    taches = [('caisse', i) for i in range(args.ecrivains)] + [('lecteur', i) for i in range(args.lecteurs)]
+    contexte = multiprocessing.get_context('spawn')
+    depart = contexte.Barrier(len(taches))
+    file = contexte.Queue()
+    processus = [contexte.Process(target=travailleur, args=(role, i, args.duree, depart, file)) for role, i in taches]
+    for p in processus:
+        p.start()
+    retours = [file.get() for _ in processus]
+    for p in processus:
+        p.join()
+
+    lectures = [d for role, durees, _, _ in retours if role == 'lecteur' for d in durees]
+    ecritures = [d for role, durees, _, _ in retours if role == 'caisse' for d in durees]
+    print(json.dumps({
+        'journal_mode': mode,
+        'ecritures_s': len(ecritures) / args.duree,
+        'lectures_s': len(lectures) / args.duree,
+        'lecture_p50': centile(lectures, 0.5),
+        'lecture_p95': centile(lectures, 0.95),
+        'lecture_max': max(lectures, default=0.0),
+        'ecriture_p95': centile(ecritures, 0.95),
+        'erreurs': sum(e for _, _, e, _ in retours),
+        'exemple_erreur': next((x for _, _, _, x in retours if x), None),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ecrivains', type=int, default=4, help='Caisses enregistrant des ventes')
+    parser.add_argument('--lecteurs', type=int, default=4, help='Clients lisant les tableaux de bord')
+    parser.add_argument('--duree', type=float, default=10, help='Durée de chaque mesure (secondes)')
+    parser.add_argument('--mode', choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        mesurer(args)
+        return
+
+    print(f"{args.ecrivains} caisses, {args.lecteurs} lecteurs, {args.duree:g}s par mode\n")
+    print(f"{'Mode':8s} {'Ventes/s':>9s} {'Lect./s':>9s} {'Lect. p50':>10s} {'Lect. p95':>10s} "
+          f"{'Lect. max':>10s} {'Vente p95':>10s} {'Erreurs':>8s}")
+    mesures = {}
+    for mode, variables in MODES.items():
+        env = dict(os.environ, **variables)
+        sortie = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--mode', mode, '--ecrivains', str(args.ecrivains),
+             '--lecteurs', str(args.lecteurs), '--duree', str(args.duree)],
+            env=env, capture_output=True, text=True
+        )
+        lignes = sortie.stdout.strip().splitlines()
+        if sortie.returncode != 0 or not lignes:
+            print(f"{mode:8s} ❌ {sortie.stderr.strip().splitlines()[-1] if sortie.stderr.strip() else 'échec'}")
+            continue
+        m = mesures[mode] = json.loads(lignes[-1])
+        print(f"{mode:8s} {m['ecritures_s']:9.1f} {m['lectures_s']:9.1f} {m['lecture_p50'] * 1000:8.1f}ms "
+              f"{m['lecture_p95'] * 1000:8.1f}ms {m['lecture_max'] * 1000:8.1f}ms {m['ecriture_p95'] * 1000:8.1f}ms "
+              f"{m['erreurs']:8d}")
+        if m['exemple_erreur']:
+            print(f"         erreur : {m['exemple_erreur']}")
+
+    if len(mesures) == 2 and mesures['wal']['lecture_p95'] and mesures['wal']['ecriture_p95']:
+        avant, apres = mesures['journal'], mesures['wal']
+        print(f"\nWAL : lectures p95 {avant['lecture_p95'] * 1000:.0f}ms → {apres['lecture_p95'] * 1000:.0f}ms, "
+              f"ventes p95 {avant['ecriture_p95'] * 1000:.0f}ms → {apres['ecriture_p95'] * 1000:.0f}ms, "
+              f"débit des ventes x{apres['ecritures_s'] / max(avant['ecritures_s'], 0.001):.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Contrôle des compteurs métier de /metrics face aux savepoints et aux rollbacks.
+
+Sur une base temporaire, rejoue les enchaînements de create_vente_api autour du
+savepoint de VenteJour.enregistrer et vérifie que les compteurs ne bougent qu'au
+commit de la transaction principale :
+ - vente annulée (rollback) après la première vente du jour : rien n'est compté
+ - savepoint en échec (IntegrityError, deux caisses sur la première vente du jour)
+   puis commit : la vente et ses mouvements de stock sont comptés
+ - entrées ajoutées dans un savepoint annulé : abandonnées, le reste est compté
+
+Usage (PowerShell):
+    python scripts\\check_metriques.py      # code retour 1 en cas d'écart
+"""
+import os
+import io
+import sys
+import uuid
+import tempfile
+import contextlib
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+WORKDIR = tempfile.mkdtemp(prefix='check_metriques_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'metriques_controle.db')
+os.environ['METRIQUES'] = '1'
+os.environ.pop('METRIQUES_FICHIER', None)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from gestiostock.app import create_app, init_database
+from sqlalchemy.exc import IntegrityError
+from models import db, Vente, VenteJour, MouvementStock
+from utils import metriques
+
+
+def valeur(nom, etiquettes=''):
+    """Valeur exposée sur /metrics (0 si la série n'existe pas)"""
+    serie = f'{nom}{{{etiquettes}}} ' if etiquettes else f'{nom} '
+    for ligne in metriques.exposer().splitlines():
+        if ligne.startswith(serie):
+            return float(ligne[len(serie):])
+    return 0.0
+
+
+def nouvelle_vente(mode):
+    vente = Vente(numero_facture=f'CTRL-{uuid.uuid4().hex[:12]}', montant_total=100, mode_paiement=mode,
+                  date_vente=datetime.utcnow(), statut='confirmée')
+    db.session.add(vente)
+    db.session.flush()
+    db.session.execute(db.insert(MouvementStock), [
+        {'produit_id': 1, 'type_mouvement': 'sortie', 'quantite': 1, 'motif': f'Vente {vente.numero_facture}'}
+    ])
+    return vente
+
+
+def verifier(libelle, attendu, obtenu):
+    ok = attendu == obtenu
+    print(f"{'✅' if ok else '❌'} {libelle} : attendu {attendu:g}, obtenu {obtenu:g}")
+    return ok
+
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+        init_database(app)
+
+    ok = True
+    with app.app_context():
+        ventes = 'gestiostock_ventes_total'
+        montants = 'gestiostock_ventes_montant_total'
+        mouvements = 'gestiostock_mouvements_stock_total'
+
+        # 1. Première vente du jour pour ce mode (savepoint libéré), puis rollback
+        mode = 'controle-rollback'
+        avant = valeur(ventes, f'mode_paiement="{mode}"'), valeur(montants, 'devise="XOF"'), valeur(mouvements, 'type="sortie"')
+        vente = nouvelle_vente(mode)
+        VenteJour.enregistrer(vente)
+        db.session.rollback()
+        apres = valeur(ventes, f'mode_paiement="{mode}"'), valeur(montants, 'devise="XOF"'), valeur(mouvements, 'type="sortie"')
+        ok = verifier('Rollback après savepoint : ventes', avant[0], apres[0]) and ok
+        ok = verifier('Rollback après savepoint : montant', avant[1], apres[1]) and ok
+        ok = verifier('Rollback après savepoint : mouvements', avant[2], apres[2]) and ok
+
+        # 2. Ligne du jour créée par une autre caisse : le savepoint échoue, la vente est validée
+        mode = 'controle-concurrence'
+        db.session.add(VenteJour(date=datetime.utcnow().date(), mode_paiement=mode, chiffre_affaires=0, nb_ventes=0))
+        db.session.commit()
+        avant = valeur(ventes, f'mode_paiement="{mode}"'), valeur(mouvements, 'type="sortie"')
+        nouvelle_vente(mode)
+        try:
+            with db.session.begin_nested():
+                db.session.add(VenteJour(date=datetime.utcnow().date(), mode_paiement=mode, chiffre_affaires=100, nb_ventes=1))
+        except IntegrityError:
+            pass
+        db.session.commit()
+        apres = valeur(ventes, f'mode_paiement="{mode}"'), valeur(mouvements, 'type="sortie"')
+        ok = verifier('Savepoint en échec puis commit : ventes', avant[0] + 1, apres[0]) and ok
+        ok = verifier('Savepoint en échec puis commit : mouvements', avant[1] + 1, apres[1]) and ok
+
+        # 3. Mouvement inséré dans un savepoint annulé : seul celui de la vente est compté
+        mode = 'controle-savepoint'
+        avant = valeur(mouvements, 'type="sortie"')
+        nouvelle_vente(mode)
+        savepoint = db.session.begin_nested()
+        db.session.execute(db.insert(MouvementStock), [{'produit_id': 1, 'type_mouvement': 'sortie', 'quantite': 5}])
+        savepoint.rollback()
+        db.session.commit()
+        ok = verifier('Savepoint annulé : mouvements', avant + 1, valeur(mouvements, 'type="sortie"')) and ok
+
+    print("\n" + "=" * 50)
+    print("✅ Compteurs conformes" if ok else "❌ Compteurs incorrects")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
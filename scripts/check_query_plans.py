@@ -0,0 +1,139 @@
+"""Contrôle de non-régression des plans d'exécution (EXPLAIN QUERY PLAN, SQLite).
+
+Rejoue les requêtes chaudes du tableau de bord, des statistiques et de la liste
+des ventes sur une base temporaire, capture le SQL réellement émis et vérifie :
+ - qu'aucune table volumineuse n'est parcourue intégralement (SCAN sans index)
+ - que les index attendus sont bien utilisés
+
+Usage (PowerShell):
+    python scripts\\check_query_plans.py            # code retour 1 en cas de régression
+    python scripts\\check_query_plans.py --verbose  # affiche les plans
+"""
+import os
+import io
+import re
+import sys
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+WORKDIR = tempfile.mkdtemp(prefix='check_plans_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'plans.db')
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from gestiostock.app import create_app, init_database
+try:
+    from models import db, Vente, Paiement, MouvementStock, MouvementCaisse
+except ImportError:
+    from gestiostock.models import db, Vente, Paiement, MouvementStock, MouvementCaisse
+from sqlalchemy import event
+
+# Tables dont un parcours complet est une régression
+TABLES_SURVEILLEES = ('ventes', 'vente_items', 'paiements', 'mouvements_stock', 'mouvement_caisse', 'notifications')
+
+AUJOURD_HUI = datetime.now().date()
+DEBUT = (AUJOURD_HUI - timedelta(days=30)).isoformat()
+
+# (libellé, URL appelée, index qui doivent apparaître dans les plans)
+REQUETES_HTTP = [
+    ('Tableau de bord', '/api/dashboard', ['idx_vente_statut_date']),
+    ('Statistiques ventes', '/api/stats/ventes?periode=mois', ['idx_vente_statut_date']),
+    ('Statistiques clients', '/api/stats/clients', ['idx_vente_statut_date']),
+    ('Rentabilité sur période', f'/api/rapport/rentabilite?date_debut={DEBUT}', ['idx_vente_statut_date', 'idx_vente_item_marge']),
+    ('Résumé des ventes du jour', '/api/ventes/resume-jour', ['idx_vente_statut_date']),
+    ('Ventes par période', f'/api/ventes?date_debut={DEBUT}', ['idx_vente_date']),
+    ('Ventes d\'un client', '/api/ventes?client_id=1', ['idx_vente_client_date']),
+    ('Notifications', '/api/api/notifications', ['idx_notification_user_lue_date']),
+]
+
+
+def requetes_orm():
+    """Formes de requêtes utilisées par les scripts et les relations (hors routes HTTP)"""
+    hier = datetime.now() - timedelta(days=1)
+    return [
+        ('Paiements d\'une vente', Paiement.query.filter_by(vente_id=1), ['idx_paiement_vente']),
+        ('Mouvements d\'un produit', MouvementStock.query.filter_by(produit_id=1).order_by(MouvementStock.date_mouvement.desc()),
+         ['idx_mouvement_stock_produit_date']),
+        ('Mouvements de caisse du jour', MouvementCaisse.query.filter(MouvementCaisse.date >= hier), ['idx_mouvement_caisse_date']),
+    ]
+
+
+def plan(sql, params=()):
+    return [ligne[3] for ligne in db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def verifier(libelle, plans, index_attendus, verbose):
+    erreurs = []
+    details = [d for p in plans for d in p]
+    for detail in details:
+        for table in TABLES_SURVEILLEES:
+            if re.fullmatch(rf'SCAN {table}( AS \w+)?', detail):
+                erreurs.append(f'parcours complet de {table}')
+    for index in index_attendus:
+        if not any(index in d for d in details):
+            erreurs.append(f'index {index} non utilisé')
+
+    print(f"{'❌' if erreurs else '✅'} {libelle}")
+    for erreur in erreurs:
+        print(f"     {erreur}")
+    if verbose or erreurs:
+        for detail in details:
+            print(f"       {detail}")
+    return not erreurs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--verbose', action='store_true', help='Afficher tous les plans')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+        init_database(app)
+    client = app.test_client()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.post('/login', json={'username': 'admin', 'password': 'admin123'})
+        for _ in range(3):
+            client.post('/api/ventes', json={'client_id': 1, 'items': [{'produit_id': 1, 'quantite': 1, 'prix_unitaire': 450000}]})
+
+    ok = True
+    with app.app_context():
+        captures = []
+
+        def capturer(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                captures.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capturer)
+        for libelle, url, index_attendus in REQUETES_HTTP:
+            captures.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                reponse = client.get(url)
+            if reponse.status_code != 200:
+                print(f"❌ {libelle} : HTTP {reponse.status_code}")
+                ok = False
+                continue
+            plans = [plan(sql, params) for sql, params in captures]
+            ok = verifier(libelle, plans, index_attendus, args.verbose) and ok
+        event.remove(db.engine, 'before_cursor_execute', capturer)
+
+        for libelle, query, index_attendus in requetes_orm():
+            compile_ = query.statement.compile(db.engine)
+            params = tuple(compile_.params[nom] for nom in compile_.positiontup)
+            ok = verifier(libelle, [plan(str(compile_), params)], index_attendus, args.verbose) and ok
+
+    print("\n" + "=" * 50)
+    print("✅ Plans conformes" if ok else "❌ Régression de plan détectée")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
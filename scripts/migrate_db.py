@@ -0,0 +1,71 @@
+"""Mise à jour du schéma d'une base existante (colonnes et index ajoutés depuis sa création).
+
+Idempotent : les colonnes et index déjà présents sont ignorés. Le même traitement
+est exécuté au démarrage par init_database ; ce script permet de l'appliquer
+à froid sur un fichier SQLite (ou une base PostgreSQL via DATABASE_URL).
+
+Usage (PowerShell):
+    # base configurée (DATABASE_URL ou instance/gestiostock.db)
+    python scripts\\migrate_db.py
+
+    # fichier SQLite explicite -- make a DB backup before running
+    python scripts\\migrate_db.py --db C:\\chemin\\vers\\gestiostock.db
+
+    # rafraîchir ensuite les statistiques du planificateur
+    python scripts\\migrate_db.py --analyze
+"""
+import os
+import sys
+import argparse
+
+# Ensure imports resolve (same approach as reconcile script)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', help='Chemin d\'un fichier SQLite à migrer')
+    parser.add_argument('--analyze', action='store_true', help='Exécuter ANALYZE après la migration')
+    args = parser.parse_args()
+
+    if args.db:
+        if not os.path.exists(args.db):
+            print(f"❌ Fichier introuvable : {args.db}")
+            sys.exit(1)
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.db)
+
+    from gestiostock.app import create_app
+    try:
+        from models import db
+    except ImportError:
+        from gestiostock.models import db
+    from utils.migrations import appliquer_migrations
+    from sqlalchemy import text
+
+    app = create_app()
+    with app.app_context():
+        print(f"Base : {db.engine.url}")
+        db.create_all()
+        resultat = appliquer_migrations()
+
+        for colonne in resultat['colonnes']:
+            print(f"  + colonne {colonne}")
+        for index in resultat['index']:
+            print(f"  + index {index}")
+        if resultat['recherche']:
+            print("  + index de recherche plein texte des produits")
+        if not resultat['colonnes'] and not resultat['index'] and not resultat['recherche']:
+            print("Schéma déjà à jour.")
+
+        if args.analyze:
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+            print("ANALYZE exécuté.")
+
+
+if __name__ == '__main__':
+    main()
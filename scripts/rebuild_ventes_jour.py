@@ -0,0 +1,75 @@
+"""Reconstruction de l'agrégat journalier des ventes (table ventes_jour).
+
+La table ventes_jour est maintenue à chaque création / annulation de vente.
+Ce script la recalcule depuis la table ventes, pour l'historique existant
+ou après une correction manuelle des données.
+
+Usage (PowerShell):
+    # preview (no DB writes) : compare l'agrégat et la table ventes
+    python scripts\\rebuild_ventes_jour.py
+
+    # apply : reconstruit tout l'historique
+    python scripts\\rebuild_ventes_jour.py --apply
+
+    # apply à partir d'une date
+    python scripts\\rebuild_ventes_jour.py --apply --depuis 2024-01-01
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+# Ensure imports resolve (same approach as reconcile script)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+from gestiostock.app import create_app
+try:
+    from models import db, Vente, VenteJour
+except ImportError:
+    from gestiostock.models import db, Vente, VenteJour
+from sqlalchemy import func
+
+
+def preview(app, depuis=None):
+    with app.app_context():
+        q_ventes = db.session.query(func.sum(Vente.montant_total), func.count(Vente.id)).filter(Vente.statut == 'confirmée')
+        q_agregat = db.session.query(func.sum(VenteJour.chiffre_affaires), func.sum(VenteJour.nb_ventes))
+        if depuis:
+            q_ventes = q_ventes.filter(Vente.date_vente >= datetime.combine(depuis, datetime.min.time()))
+            q_agregat = q_agregat.filter(VenteJour.date >= depuis)
+
+        ca_ventes, nb_ventes = q_ventes.first()
+        ca_agregat, nb_agregat = q_agregat.first()
+        print(f"Table ventes   : {nb_ventes or 0} ventes confirmées, CA {float(ca_ventes or 0):,.2f}")
+        print(f"Agrégat actuel : {nb_agregat or 0} ventes, CA {float(ca_agregat or 0):,.2f}")
+
+        ecart = abs(float(ca_ventes or 0) - float(ca_agregat or 0)) > 0.01 or (nb_ventes or 0) != (nb_agregat or 0)
+        print('⚠️ Écart détecté, reconstruction recommandée.' if ecart else '✅ Agrégat cohérent.')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--apply', action='store_true', help='Reconstruire l\'agrégat en base')
+    parser.add_argument('--depuis', help='Date de début YYYY-MM-DD (par défaut : tout l\'historique)')
+    args = parser.parse_args()
+
+    depuis = datetime.strptime(args.depuis, '%Y-%m-%d').date() if args.depuis else None
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+    preview(app, depuis)
+    if args.apply:
+        with app.app_context():
+            nb_lignes = VenteJour.reconstruire(depuis)
+        print(f"Agrégat reconstruit : {nb_lignes} lignes (jour x mode de paiement)")
+        preview(app, depuis)
+
+
+if __name__ == '__main__':
+    main()
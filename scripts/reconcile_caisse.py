@@ -1,7 +1,10 @@
 """Script de réconciliation de la caisse.
 
-Calcule : solde_caisse = sum(Paiement.montant) - sum(Depense.montant)
-et met à jour ParametreSysteme.solde_caisse.
+Compare le solde courant de la caisse (table caisse) :
+ - au solde recalculé depuis le dernier point de contrôle + les mouvements suivants
+ - au solde théorique sum(Paiement.montant) - sum(Depense.montant)
+puis aligne la caisse sur le solde théorique par un mouvement d'ajustement
+(le journal des mouvements n'est jamais réécrit).
 
 Usage (PowerShell):
     python scripts\reconcile_caisse.py
@@ -22,16 +25,18 @@ from gestiostock.app import create_app
 try:
     # app.py imports top-level 'models' (not 'gestiostock.models'), so import the
     # same module to reuse the same SQLAlchemy instance.
-    from models import db, Paiement, Depense, ParametreSysteme
+    from models import db, Paiement, Depense, Caisse
 except ImportError:
     # Fallback to package import if top-level 'models' isn't available
-    from gestiostock.models import db, Paiement, Depense, ParametreSysteme
+    from gestiostock.models import db, Paiement, Depense, Caisse
 from sqlalchemy import func
 
 
 def reconcile():
     app = create_app()
     with app.app_context():
+        Caisse.initialiser()
+
         total_paiements = db.session.query(func.coalesce(func.sum(Paiement.montant), 0)).scalar()
         total_depenses = db.session.query(func.coalesce(func.sum(Depense.montant), 0)).scalar()
 
@@ -39,14 +44,28 @@ def reconcile():
         total_depenses = float(total_depenses or 0)
 
         solde = total_paiements - total_depenses
+        solde_caisse, solde_journal = Caisse.verifier()
 
-        ParametreSysteme.set_value("solde_caisse", solde, type_valeur="number")
-        db.session.commit()
-
-        print("Réconciliation terminée :")
+        print("Réconciliation :")
         print(f"  total paiements : {total_paiements}")
         print(f"  total dépenses  : {total_depenses}")
-        print(f"  solde_caisse mis à jour : {solde}")
+        print(f"  solde caisse    : {solde_caisse}")
+        print(f"  solde journal (dernier point de contrôle + mouvements) : {solde_journal}")
+        if abs(solde_caisse - solde_journal) > 0.005:
+            print("  ⚠️ Le solde courant diffère du journal des mouvements")
+
+        ecart = solde - solde_caisse
+        if abs(ecart) > 0.005:
+            Caisse.mouvement(
+                'encaisse' if ecart > 0 else 'decaisse',
+                abs(ecart),
+                reference='reconciliation',
+                utilisateur='system-reconcile',
+                notes='Ajustement de réconciliation'
+            )
+            db.session.commit()
+            print(f"  ajustement enregistré : {ecart:+}")
+        print(f"  solde caisse mis à jour : {Caisse.solde_actuel()}")
 
 
 if __name__ == '__main__':
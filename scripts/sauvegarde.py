@@ -0,0 +1,73 @@
+"""Sauvegarde en ligne de la base SQLite (API de sauvegarde sqlite3, sans arrêter l'application).
+
+Écrit un instantané horodaté backup_AAAAMMJJ_HHMMSS.db[.gz] dans le dossier des
+sauvegardes (instance/sauvegardes par défaut, ou SAUVEGARDE_DOSSIER), puis ne garde
+que les plus récents. À lancer depuis le Planificateur de tâches, ou avec --boucle.
+
+Usage (PowerShell):
+    python scripts\\sauvegarde.py                          # sauvegarde compressée, 7 conservées
+    python scripts\\sauvegarde.py --dossier D:\\sauvegardes --conserver 30
+    python scripts\\sauvegarde.py --sans-compression
+    python scripts\\sauvegarde.py --boucle 6                # toutes les 6 heures, jusqu'à Ctrl+C
+    python scripts\\sauvegarde.py --liste
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from gestiostock.app import create_app
+from utils.sauvegarde import sauvegarder_dossier, sauvegardes, dossier_sauvegardes, chemin_base
+
+
+def sauvegarder(app, args):
+    with app.app_context():
+        if chemin_base() is None:
+            print("❌ Aucune base SQLite à sauvegarder (vérifier DATABASE_URL)")
+            return False
+        debut = time.perf_counter()
+        chemin = sauvegarder_dossier(args.dossier, compresser=not args.sans_compression, conserver=args.conserver)
+        print(f"✅ {chemin} ({os.path.getsize(chemin) / 1024 / 1024:.1f} Mo, {time.perf_counter() - debut:.1f}s)")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dossier', help='Dossier des sauvegardes (défaut : instance/sauvegardes)')
+    parser.add_argument('--conserver', type=int, default=None, help='Nombre de sauvegardes conservées (défaut : 7)')
+    parser.add_argument('--sans-compression', action='store_true', help='Écrire le fichier .db sans gzip')
+    parser.add_argument('--boucle', type=float, help='Sauvegarder toutes les N heures')
+    parser.add_argument('--liste', action='store_true', help='Lister les sauvegardes existantes')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+
+    if args.liste:
+        with app.app_context():
+            dossier = args.dossier or dossier_sauvegardes()
+        for fichier in sauvegardes(dossier):
+            print(f"{os.path.basename(fichier):32s} {os.path.getsize(fichier) / 1024 / 1024:8.1f} Mo")
+        return
+
+    if not sauvegarder(app, args):
+        sys.exit(1)
+    while args.boucle:
+        time.sleep(args.boucle * 3600)
+        try:
+            sauvegarder(app, args)
+        except Exception as e:
+            print(f"❌ Erreur sauvegarde: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Test de charge de la caisse : écritures concurrentes (ventes payées et dépenses).
+
+Plusieurs threads enregistrent en parallèle des ventes (/api/ventes) et des dépenses
+(/depenses/add) sur une base SQLite temporaire, puis le script vérifie :
+ - solde final = solde initial + encaissements - décaissements réellement commités
+ - chaque mouvement enchaîne sur le précédent (aucune mise à jour perdue)
+ - solde recalculé depuis le dernier point de contrôle = solde courant
+Code retour 1 en cas d'écart.
+
+Usage (PowerShell):
+    python scripts\\stress_caisse.py
+    python scripts\\stress_caisse.py --threads 16 --operations 100
+"""
+import os
+import io
+import sys
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PKG = os.path.join(ROOT, 'gestiostock')
+for p in (ROOT, PKG):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+WORKDIR = tempfile.mkdtemp(prefix='stress_caisse_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'stress.db')
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from gestiostock.app import create_app, init_database
+try:
+    from models import db, Produit, Caisse, PointageCaisse, MouvementCaisse
+except ImportError:
+    from gestiostock.models import db, Produit, Caisse, PointageCaisse, MouvementCaisse
+from sqlalchemy import func
+
+
+def caissier(app, numero, operations, resultats, erreurs):
+    client = app.test_client()
+    aleatoire = random.Random(numero)
+    client.post('/login', json={'username': 'admin', 'password': 'admin123'})
+    for _ in range(operations):
+        if aleatoire.random() < 0.8:
+            prix = aleatoire.randint(1, 50) * 100
+            r = client.post('/api/ventes', json={
+                'client_id': 1,
+                'items': [{'produit_id': aleatoire.choice((1, 2)), 'quantite': 1, 'prix_unitaire': prix}]
+            })
+            cle = 'ventes' if r.status_code == 201 else 'echecs'
+        else:
+            r = client.post('/depenses/add', json={'libelle': f'Dépense {numero}', 'montant': aleatoire.randint(1, 20) * 100},
+                            headers={'X-Requested-With': 'XMLHttpRequest'})
+            cle = 'depenses' if r.status_code == 200 else ('refusees' if r.status_code == 400 else 'echecs')
+        resultats[cle] = resultats.get(cle, 0) + 1
+        if r.status_code >= 500:
+            erreurs.append(r.get_json().get('error', ''))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8, help='Nombre de caisses concurrentes')
+    parser.add_argument('--operations', type=int, default=50, help='Opérations par caisse')
+    parser.add_argument('--intervalle', type=int, default=50, help='Mouvements entre deux points de contrôle')
+    args = parser.parse_args()
+    Caisse.INTERVALLE_POINTAGE = args.intervalle
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+        init_database(app)
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.session.query(Produit).update({Produit.stock_actuel: 1000000})
+        db.session.commit()
+        solde_initial = Caisse.solde_actuel()
+
+    resultats = [{} for _ in range(args.threads)]
+    erreurs = []
+    threads = [threading.Thread(target=caissier, args=(app, i, args.operations, resultats[i], erreurs))
+               for i in range(args.threads)]
+    # Journaux des routes masqués pendant la charge
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    totaux = {}
+    for r in resultats:
+        for cle, nb in r.items():
+            totaux[cle] = totaux.get(cle, 0) + nb
+    print(f"Opérations : {totaux}")
+
+    ok = True
+    with app.app_context():
+        encaisse = db.session.query(func.coalesce(func.sum(MouvementCaisse.montant), 0))\
+            .filter(MouvementCaisse.type == 'encaisse').scalar()
+        decaisse = db.session.query(func.coalesce(func.sum(MouvementCaisse.montant), 0))\
+            .filter(MouvementCaisse.type == 'decaisse').scalar()
+        nb_mouvements = MouvementCaisse.query.count()
+        # Chaînage : chaque solde_avant est le solde initial ou le solde_apres d'un autre mouvement
+        soldes_apres = {round(m.solde_apres, 2) for m in MouvementCaisse.query.all()}
+        orphelins = [m.id for m in MouvementCaisse.query.all()
+                     if round(m.solde_avant, 2) != round(solde_initial, 2) and round(m.solde_avant, 2) not in soldes_apres]
+        solde, solde_journal = Caisse.verifier()
+        attendu = solde_initial + float(encaisse) - float(decaisse)
+
+        print(f"Solde final        : {solde:,.2f}")
+        print(f"Solde attendu      : {attendu:,.2f}")
+        print(f"Solde du journal   : {solde_journal:,.2f}")
+        print(f"Mouvements         : {nb_mouvements} ({PointageCaisse.query.count()} points de contrôle)")
+
+        if abs(solde - attendu) > 0.005 or abs(solde - solde_journal) > 0.005:
+            print("❌ Écart de solde : mise à jour perdue")
+            ok = False
+        if orphelins:
+            print(f"❌ {len(orphelins)} mouvements ne partent d'aucun solde connu : {orphelins[:10]}")
+            ok = False
+        if solde < 0:
+            print("❌ Solde négatif : une dépense a dépassé les fonds disponibles")
+            ok = False
+        if totaux.get('echecs'):
+            print(f"⚠️ {totaux['echecs']} opérations en erreur, par exemple : {erreurs[0].splitlines()[0] if erreurs else '?'}")
+
+    print("✅ Caisse cohérente" if ok else "❌ Caisse incohérente")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()